@@ -16,6 +16,7 @@ from core.config import settings
 from database.db import Base
 from models.user import User
 from models.vehicle import Vehicle
+from models.vehicle_stats import VehicleTypeStats
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,7 +28,8 @@ config.set_main_option("sqlalchemy.url", settings.database_url)
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Sin desactivar los loggers existentes (p. ej. los de gunicorn al migrar al iniciar)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -0,0 +1,35 @@
+"""Add vehicle_type_stats summary table
+
+Revision ID: 3f6c2a9d8e41
+Revises: b10ddb3d69a1
+Create Date: 2026-10-18 09:12:40.512330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3f6c2a9d8e41'
+down_revision: Union[str, None] = 'b10ddb3d69a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('vehicle_type_stats',
+    sa.Column('tipo', sa.String(length=30), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('kilometraje_total', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('tipo')
+    )
+    # Poblar el resumen con los vehículos existentes
+    op.execute(
+        "INSERT INTO vehicle_type_stats (tipo, total, kilometraje_total) "
+        "SELECT tipo, COUNT(*), COALESCE(SUM(kilometraje), 0) FROM vehicles GROUP BY tipo"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('vehicle_type_stats')
@@ -0,0 +1,41 @@
+"""Add trigram search indexes on vehicles (PostgreSQL)
+
+Revision ID: a71e4c0b9d23
+Revises: 3f6c2a9d8e41
+Create Date: 2026-10-18 11:03:17.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a71e4c0b9d23'
+down_revision: Union[str, None] = '3f6c2a9d8e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Solo PostgreSQL: otros motores usan el índice de n-gramas en memoria
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # La expresión debe coincidir con _search_document() en vehicle_controller
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_vehicles_search_trgm ON vehicles "
+        "USING gin ((marca || ' ' || modelo || ' ' || tipo) gin_trgm_ops)"
+    )
+    # Permite usar índice en el filtro ILIKE '%tipo%' del listado
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_vehicles_tipo_trgm ON vehicles "
+        "USING gin (tipo gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_vehicles_tipo_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_vehicles_search_trgm")
@@ -0,0 +1,29 @@
+"""Add version counter to vehicle_type_stats
+
+Revision ID: c4e8f1a2b7d5
+Revises: a71e4c0b9d23
+Create Date: 2026-10-18 14:21:05.318742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4e8f1a2b7d5'
+down_revision: Union[str, None] = 'a71e4c0b9d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Se incrementa en cada escritura de vehículos; la suma es la versión de la tabla
+    op.add_column(
+        'vehicle_type_stats',
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('vehicle_type_stats', 'version')
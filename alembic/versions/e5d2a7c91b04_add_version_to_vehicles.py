@@ -0,0 +1,29 @@
+"""Add version counter to vehicles
+
+Revision ID: e5d2a7c91b04
+Revises: c4e8f1a2b7d5
+Create Date: 2026-10-18 18:02:41.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e5d2a7c91b04'
+down_revision: Union[str, None] = 'c4e8f1a2b7d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Se incrementa en cada UPDATE del vehículo; valida la caché de GET /vehiculos/{id}
+    op.add_column(
+        'vehicles',
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='1')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('vehicles', 'version')
@@ -0,0 +1,30 @@
+"""Add vehicle_change_seq for change feed event IDs
+
+Revision ID: f81c3e6a5d27
+Revises: e5d2a7c91b04
+Create Date: 2026-10-18 19:11:07.482930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'f81c3e6a5d27'
+down_revision: Union[str, None] = 'e5d2a7c91b04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # IDs de eventos del feed de cambios, comunes a todos los workers (solo
+    # PostgreSQL: en otros motores cada worker numera sus propios eventos)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE SEQUENCE IF NOT EXISTS vehicle_change_seq")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP SEQUENCE IF EXISTS vehicle_change_seq")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de vehículos: filas por segundo por fila vs. por lotes.
+
+Compara `create_vehicle` (un INSERT + COMMIT por vehículo) con
+`bulk_insert_vehicles` (INSERT multi-fila o COPY en PostgreSQL) contra la
+base de datos configurada en DATABASE_URL. Las filas insertadas se eliminan
+al finalizar.
+
+Uso:
+    python benchmarks/bench_bulk.py --rows 20000 --chunk-size 5000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from controllers.vehicle_controller import vehicle_controller
+from database.db import SessionLocal, init_db
+from models.vehicle import Vehicle
+from schemas.vehicle import VehicleCreate
+
+BENCH_MARCA = "__bench_bulk__"
+
+def _rows(n: int):
+    return [
+        {
+            "marca": BENCH_MARCA,
+            "modelo": f"Modelo {i % 50}",
+            "año": 1990 + i % 35,
+            "tipo": ("sedán", "SUV", "pickup", "camión")[i % 4],
+            "kilometraje": float(i % 300000),
+            "imagen_url": None,
+        }
+        for i in range(n)
+    ]
+
+def bench_per_row(rows) -> float:
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for row in rows:
+            vehicle_controller.create_vehicle(VehicleCreate(**row), db)
+        return len(rows) / (time.perf_counter() - start)
+    finally:
+        db.close()
+
+def bench_bulk(rows, chunk_size: int) -> float:
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(rows), chunk_size):
+            vehicle_controller.bulk_insert_vehicles(rows[i:i + chunk_size], db)
+        return len(rows) / (time.perf_counter() - start)
+    finally:
+        db.close()
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.query(Vehicle).filter(Vehicle.marca == BENCH_MARCA).delete(synchronize_session=False)
+        vehicle_controller.reconcile_stats(db)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--per-row-rows", type=int, default=1000, help="Filas para el modo fila por fila")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db()
+    try:
+        print(f"fila por fila: {bench_per_row(_rows(args.per_row_rows)):,.0f} filas/s")
+        print(f"por lotes ({args.chunk_size}): {bench_bulk(_rows(args.rows), args.chunk_size):,.0f} filas/s")
+    finally:
+        cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput de login (verificación bcrypt) según el tamaño del pool.
+
+Mide verificaciones por segundo y el retraso máximo del event loop mientras
+hay `--concurrency` logins simultáneos. No requiere base de datos.
+
+Uso:
+    python benchmarks/bench_login.py --pool-sizes 1 2 4 8 --requests 200
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from fastapi import HTTPException
+from core import security
+from core.config import settings
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Retraso máximo observado del event loop (en segundos)."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def _run(pool_size: int, requests: int, concurrency: int, hashed: str) -> dict:
+    settings.PASSWORD_HASH_WORKERS = pool_size
+    security.shutdown_hash_executor()
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            try:
+                await security.verify_and_update_password_async("secreto", hashed)
+            except HTTPException:
+                rejected += 1
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return {
+        "pool_size": pool_size,
+        "logins_por_segundo": round((requests - rejected) / elapsed, 1),
+        "rechazados_503": rejected,
+        "max_lag_event_loop_ms": round(await lag_task * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--executor", choices=["thread", "process"], default=settings.PASSWORD_HASH_EXECUTOR)
+    args = parser.parse_args()
+
+    settings.PASSWORD_HASH_EXECUTOR = args.executor
+    hashed = security.get_password_hash("secreto")
+    print(f"bcrypt rounds={settings.BCRYPT_ROUNDS} executor={args.executor} concurrency={args.concurrency}")
+    for pool_size in args.pool_sizes:
+        print(asyncio.run(_run(pool_size, args.requests, args.concurrency, hashed)))
+    security.shutdown_hash_executor()
+
+if __name__ == "__main__":
+    main()
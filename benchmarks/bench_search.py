@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de búsqueda de vehículos según el tamaño de la tabla.
+
+Compara el índice de n-gramas en memoria (core.search.NgramIndex) con un
+recorrido lineal equivalente a un ILIKE '%q%' sin índice. Con `--db` también
+mide GET /vehiculos/buscar contra la base configurada (pg_trgm en PostgreSQL).
+
+Uso:
+    python benchmarks/bench_search.py --sizes 10000 100000 500000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from core.search import NgramIndex, normalize
+
+MARCAS = ["Toyota", "Ford", "Chevrolet", "Volkswagen", "Renault", "Fiat", "Peugeot", "Honda", "Nissan", "Hyundai"]
+MODELOS = ["Corolla", "Hilux", "Ranger", "Onix", "Gol", "Clio", "Cronos", "208", "Civic", "Frontier", "Tucson"]
+TIPOS = ["sedán", "SUV", "pickup", "hatchback", "camión", "utilitario"]
+QUERIES = ["toyota", "pick", "corola", "208", "hatch", "frontier suv", "volks"]
+
+def _documents(n: int):
+    rnd = random.Random(42)
+    return [
+        (i, f"{rnd.choice(MARCAS)} {rnd.choice(MODELOS)} {rnd.choice(TIPOS)}")
+        for i in range(1, n + 1)
+    ]
+
+def _latency_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+def bench_in_memory(sizes, repeat: int, limit: int):
+    for size in sizes:
+        documents = _documents(size)
+        index = NgramIndex()
+        start = time.perf_counter()
+        index.rebuild(documents)
+        build_s = time.perf_counter() - start
+        normalized = [(doc_id, normalize(text)) for doc_id, text in documents]
+
+        def linear(query):
+            q = normalize(query)
+            return [doc_id for doc_id, text in normalized if q in text][:limit]
+
+        print({
+            "filas": size,
+            "construccion_s": round(build_s, 2),
+            "ngram_p50_ms": _latency_ms(lambda q: index.search(q, limit), repeat),
+            "recorrido_lineal_p50_ms": _latency_ms(linear, repeat),
+        })
+
+def bench_db(repeat: int, limit: int):
+    from controllers.vehicle_controller import vehicle_controller
+    from database.db import SessionLocal
+    from models.vehicle import Vehicle
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Vehicle).count()
+        backend = "trigram" if vehicle_controller._use_trigram_search(db) else "ngram"
+        vehicle_controller.search_vehicles(QUERIES[0], db, limit=limit)  # calentar índice/caché
+        latency = _latency_ms(lambda q: vehicle_controller.search_vehicles(q, db, limit=limit), repeat)
+        print({"filas": rows, "backend": backend, "busqueda_p50_ms": latency})
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--db", action="store_true", help="Medir también contra la base configurada")
+    args = parser.parse_args()
+
+    bench_in_memory(args.sizes, args.repeat, args.limit)
+    if args.db:
+        bench_db(args.repeat, args.limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del costo de serializar listas de vehículos.
+
+Compara, por cada `--rows` vehículos leídos de una base SQLite en memoria:
+
+- orm+response_model: instancias ORM -> VehicleResponse a mano -> validación
+  y serialización de `response_model` -> json estándar (camino anterior)
+- orm+TypeAdapter: instancias ORM -> TypeAdapter(List[VehicleResponse]).dump_json
+  precompilado (alternativa descartada: sigue validando cada instancia)
+- filas+orjson: filas Core proyectadas a dicts -> orjson (camino actual)
+
+Cada modo se mide leyendo y serializando (total) y solo serializando.
+
+Uso:
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pydantic import TypeAdapter
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from controllers.vehicle_controller import _VEHICLE_COLUMNS
+from core.serialization import dumps, orjson
+from models.vehicle import Vehicle
+from schemas.vehicle import VehicleResponse
+
+VehicleResponseList = TypeAdapter(List[VehicleResponse])
+_RESPONSE_FIELD = create_model_field("Response_listar_vehiculos", List[VehicleResponse], mode="serialization")
+
+def _seed(rows: int) -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Vehicle.__table__.create(engine)
+    session = Session(engine)
+    session.execute(insert(Vehicle), [
+        {
+            "marca": f"Marca {i % 40}",
+            "modelo": f"Modelo {i % 300}",
+            "año": 1990 + i % 35,
+            "tipo": ("sedán", "SUV", "pickup", "camión")[i % 4],
+            "kilometraje": float(i * 7 % 400000),
+            "imagen_url": None if i % 3 else f"https://img.example/{i}.jpg",
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+    return session
+
+def _fetch_models(db: Session) -> List[VehicleResponse]:
+    db.expunge_all()
+    return [VehicleResponse(
+        id=v.id,
+        marca=v.marca,
+        modelo=v.modelo,
+        año=v.año,
+        tipo=v.tipo,
+        kilometraje=v.kilometraje,
+        imagen_url=v.imagen_url
+    ) for v in db.query(Vehicle).order_by(Vehicle.id)]
+
+def _fetch_dicts(db: Session) -> List[dict]:
+    return [row._asdict() for row in db.execute(select(*_VEHICLE_COLUMNS).order_by(Vehicle.id))]
+
+def _response_model(models: List[VehicleResponse]) -> bytes:
+    content = asyncio.run(serialize_response(field=_RESPONSE_FIELD, response_content=models))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def _measure_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    db = _seed(args.rows)
+    models = _fetch_models(db)
+    dicts = _fetch_dicts(db)
+    modes = {
+        "orm+response_model": (lambda: _response_model(_fetch_models(db)), lambda: _response_model(models)),
+        "orm+TypeAdapter": (lambda: VehicleResponseList.dump_json(_fetch_models(db)), lambda: VehicleResponseList.dump_json(models)),
+        "filas+orjson": (lambda: dumps(_fetch_dicts(db)), lambda: dumps(dicts)),
+    }
+
+    print(f"{args.rows:,} vehículos, mediana de {args.repeat} repeticiones (orjson {'sí' if orjson else 'no'})")
+    for name, (total, serialize_only) in modes.items():
+        print(
+            f"{name:>20}: total {_measure_ms(total, args.repeat):8.1f} ms"
+            f"   solo serializar {_measure_ms(serialize_only, args.repeat):8.1f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
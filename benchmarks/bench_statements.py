@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del costo en CPU de las consultas de cada petición.
+
+Compara, sobre una base SQLite en memoria, la forma anterior (API legacy
+`db.query(...).filter(...)`, que reconstruye la sentencia y calcula su clave
+de caché en cada llamada) con las sentencias lambda de los controladores:
+
+- usuario por username (get_current_user, login)
+- vehículo por ID (GET /vehiculos/{id} sin caché)
+- resumen de estadísticas (GET /vehiculos/promedio-km)
+
+Se mide tiempo de CPU del proceso por llamada (mediana de `--repeat`
+rondas de `--calls` llamadas). Con `--profile` se imprime además el perfil
+de cProfile de cada camino.
+
+Uso:
+    python benchmarks/bench_statements.py --calls 5000 --repeat 5
+"""
+import argparse
+import cProfile
+import pstats
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from controllers.user_controller import user_controller
+from controllers.vehicle_controller import vehicle_controller
+from models.user import User
+from models.vehicle import Vehicle
+from models.vehicle_stats import VehicleTypeStats
+
+def _seed() -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    for table in (User.__table__, Vehicle.__table__, VehicleTypeStats.__table__):
+        table.create(engine)
+    session = Session(engine)
+    session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+        for i in range(100)
+    ])
+    session.execute(insert(Vehicle), [
+        {
+            "marca": f"Marca {i % 40}",
+            "modelo": f"Modelo {i % 300}",
+            "año": 1990 + i % 35,
+            "tipo": ("sedán", "SUV", "pickup", "camión")[i % 4],
+            "kilometraje": float(i * 7 % 400000),
+        }
+        for i in range(1000)
+    ])
+    session.execute(insert(VehicleTypeStats), [
+        {"tipo": tipo, "total": 250, "kilometraje_total": 1e6}
+        for tipo in ("sedán", "SUV", "pickup", "camión")
+    ])
+    session.commit()
+    return session
+
+def _legacy_user(db: Session, i: int):
+    return db.query(User).filter(User.username == f"user{i % 100}").first()
+
+def _legacy_vehicle(db: Session, i: int):
+    return db.query(Vehicle).filter(Vehicle.id == i % 1000 + 1).first()
+
+def _legacy_stats(db: Session, i: int):
+    return db.query(VehicleTypeStats).filter(
+        VehicleTypeStats.total > 0
+    ).order_by(VehicleTypeStats.tipo).all()
+
+CASES = {
+    "usuario por username": (
+        _legacy_user,
+        lambda db, i: user_controller.get_user_by_username(f"user{i % 100}", db),
+    ),
+    "vehículo por ID": (
+        _legacy_vehicle,
+        lambda db, i: vehicle_controller.get_vehicle_by_id(i % 1000 + 1, db),
+    ),
+    "estadísticas": (
+        _legacy_stats,
+        lambda db, i: vehicle_controller.get_vehicle_stats(db),
+    ),
+}
+
+def _cpu_us_per_call(db: Session, fn, calls: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        for i in range(calls):
+            fn(db, i)
+            # Sin identity map entre llamadas, como una sesión por petición
+            db.expunge_all()
+        timings.append((time.process_time() - start) / calls * 1e6)
+    return statistics.median(timings)
+
+def _profile(db: Session, fn, calls: int) -> None:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for i in range(calls):
+        fn(db, i)
+        db.expunge_all()
+    profiler.disable()
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(12)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--profile", action="store_true", help="Imprimir el perfil de cProfile de cada caso")
+    args = parser.parse_args()
+
+    db = _seed()
+    print(f"CPU por llamada (µs), mediana de {args.repeat} rondas de {args.calls:,} llamadas")
+    for name, (legacy, current) in CASES.items():
+        # Calentamiento: llena las cachés de compilación de ambos caminos
+        for fn in (legacy, current):
+            _cpu_us_per_call(db, fn, 100, 1)
+        before = _cpu_us_per_call(db, legacy, args.calls, args.repeat)
+        after = _cpu_us_per_call(db, current, args.calls, args.repeat)
+        print(f"{name:>22}: legacy {before:7.1f}   lambda {after:7.1f}   ahorro {before - after:6.1f} ({1 - after / before:.0%})")
+        if args.profile:
+            for label, fn in (("legacy", legacy), ("lambda", current)):
+                print(f"--- {name} ({label})")
+                _profile(db, fn, args.calls)
+
+if __name__ == "__main__":
+    main()
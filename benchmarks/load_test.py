@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga reproducible de la API.
+
+Siembra la base configurada en DATABASE_URL con una flota de `--fleet-size`
+vehículos y `--users` usuarios (solo lo que falte, de forma determinista
+según `--seed`) y ejecuta cada escenario con `--concurrency` clientes
+simultáneos durante `--duration` segundos. Reporta throughput y latencias
+p50/p95/p99 en un JSON para comparar entre commits.
+
+Por defecto la API corre en el mismo proceso (httpx + ASGITransport), sin
+red ni servidor; con `--base-url` se mide un servidor ya levantado que use
+la misma base. Usar una base dedicada: los vehículos creados por el
+escenario "write" se eliminan al terminar, la flota sembrada no.
+
+Uso:
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/load_test.py \\
+        --fleet-size 100000 --concurrency 16 --duration 10 --output bench.json
+    python benchmarks/load_test.py --compare bench_anterior.json --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import httpx
+from sqlalchemy import func
+
+from controllers.vehicle_controller import vehicle_controller
+from core.config import settings
+from core.security import get_password_hash
+from database.db import SessionLocal, engine, init_db
+from models.user import User
+from models.vehicle import Vehicle
+
+SCENARIOS = ("login", "list", "get", "stats", "write")
+BENCH_USER = "bench_user_{}"
+BENCH_PASSWORD = "bench-password"
+WRITE_MARCA = "__bench_load__"
+
+MARCAS = {
+    "Toyota": ("Corolla", "Hilux", "RAV4", "Yaris"),
+    "Ford": ("Ranger", "Focus", "F-150", "Transit"),
+    "Chevrolet": ("Onix", "S10", "Tracker", "Cruze"),
+    "Volkswagen": ("Gol", "Amarok", "Polo", "Tiguan"),
+    "Mercedes-Benz": ("Sprinter", "Actros", "Clase C", "Atego"),
+}
+TIPOS = ("sedán", "SUV", "pickup", "camión", "furgón")
+
+def _vehicle_rows(rng: random.Random, n: int):
+    for _ in range(n):
+        marca = rng.choice(tuple(MARCAS))
+        yield {
+            "marca": marca,
+            "modelo": rng.choice(MARCAS[marca]),
+            "año": rng.randint(1995, 2025),
+            "tipo": rng.choice(TIPOS),
+            "kilometraje": round(rng.uniform(0, 400000), 1),
+            "imagen_url": None,
+        }
+
+def seed(fleet_size: int, users: int, rng_seed: int) -> dict:
+    """Completar la flota y los usuarios de benchmark; retorna el rango de IDs."""
+    init_db()
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Vehicle.id)).scalar()
+        missing = max(fleet_size - existing, 0)
+        if missing:
+            rng = random.Random(f"{rng_seed}:{existing}")
+            rows = _vehicle_rows(rng, missing)
+            chunk_size = settings.VEHICLES_BULK_CHUNK_SIZE
+            start = time.perf_counter()
+            for offset in range(0, missing, chunk_size):
+                chunk = [next(rows) for _ in range(min(chunk_size, missing - offset))]
+                vehicle_controller.bulk_insert_vehicles(chunk, db)
+            print(f"sembrados {missing:,} vehículos en {time.perf_counter() - start:.1f}s")
+
+        usernames = [BENCH_USER.format(i) for i in range(users)]
+        known = {name for (name,) in db.query(User.username).filter(User.username.in_(usernames))}
+        new_users = [name for name in usernames if name not in known]
+        if new_users:
+            # Un solo hash para todos: sembrar no debe medir bcrypt
+            hashed = get_password_hash(BENCH_PASSWORD)
+            db.add_all(
+                User(username=name, email=f"{name}@bench.local", hashed_password=hashed)
+                for name in new_users
+            )
+            db.commit()
+            print(f"sembrados {len(new_users)} usuarios")
+
+        min_id, max_id = db.query(func.min(Vehicle.id), func.max(Vehicle.id)).one()
+        return {"min_id": min_id or 0, "max_id": max_id or 0}
+    finally:
+        db.close()
+
+def cleanup_writes() -> None:
+    db = SessionLocal()
+    try:
+        db.query(Vehicle).filter(Vehicle.marca == WRITE_MARCA).delete(synchronize_session=False)
+        vehicle_controller.reconcile_stats(db)
+    finally:
+        db.close()
+
+def percentile(sorted_values, p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+def _request_factory(name: str, rng: random.Random, ids: dict, users: int, tokens: list):
+    """Función que produce (método, ruta, kwargs) para cada petición del escenario."""
+    def headers():
+        return {"Authorization": f"Bearer {rng.choice(tokens)}"}
+
+    if name == "login":
+        return lambda: ("POST", "/auth/token", {
+            "data": {"username": BENCH_USER.format(rng.randrange(users)), "password": BENCH_PASSWORD}
+        })
+    if name == "list":
+        return lambda: ("GET", "/vehiculos", {"params": {"limit": 100}, "headers": headers()})
+    if name == "get":
+        return lambda: ("GET", f"/vehiculos/{rng.randint(ids['min_id'], ids['max_id'])}", {"headers": headers()})
+    if name == "stats":
+        return lambda: ("GET", "/vehiculos/promedio-km", {"headers": headers()})
+    if name == "write":
+        rows = _vehicle_rows(rng, 1 << 62)
+        return lambda: ("POST", "/vehiculos", {
+            "json": {**next(rows), "marca": WRITE_MARCA}, "headers": headers()
+        })
+    raise ValueError(f"Escenario desconocido: {name}")
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, duration: float,
+                       warmup: float, make_request) -> dict:
+    latencies = []
+    errors = {}
+    deadline = None
+    measuring = False
+
+    async def worker():
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            method, path, kwargs = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if not measuring:
+                continue
+            if isinstance(status, int) and status < 400:
+                latencies.append(elapsed)
+            else:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    measuring = True
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "peticiones": len(latencies) + sum(errors.values()),
+        "exitosas": len(latencies),
+        "errores": errors,
+        "segundos": round(elapsed, 3),
+        "peticiones_por_segundo": round(len(latencies) / elapsed, 1),
+        "latencia_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+async def _login(client: httpx.AsyncClient, users: int) -> list:
+    tokens = []
+    for i in range(min(users, 10)):
+        response = await client.post(
+            "/auth/token", data={"username": BENCH_USER.format(i), "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+async def run(args, ids: dict) -> dict:
+    if args.base_url:
+        transport = httpx.AsyncHTTPTransport(retries=0)
+        base_url = args.base_url
+    else:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        tokens = await _login(client, args.users)
+        for name in args.scenarios:
+            rng = random.Random(f"{args.seed}:{name}")
+            make_request = _request_factory(name, rng, ids, args.users, tokens)
+            results[name] = await run_scenario(
+                client, name, args.concurrency, args.duration, args.warmup, make_request
+            )
+            r = results[name]
+            print(
+                f"{name:>6}: {r['peticiones_por_segundo']:>9,.1f} req/s  "
+                f"p50 {r['latencia_ms']['p50']:>8.2f} ms  p95 {r['latencia_ms']['p95']:>8.2f} ms  "
+                f"p99 {r['latencia_ms']['p99']:>8.2f} ms  errores {sum(r['errores'].values())}"
+            )
+    return results
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parents[1], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+def compare(previous: dict, current: dict) -> None:
+    """Imprimir la variación de throughput y p95 respecto de un reporte anterior."""
+    print(f"\ncomparación con {previous['meta'].get('commit', '?')}:")
+    for name, result in current["escenarios"].items():
+        before = previous.get("escenarios", {}).get(name)
+        if not before:
+            continue
+        rps = result["peticiones_por_segundo"] / before["peticiones_por_segundo"] - 1 if before["peticiones_por_segundo"] else 0.0
+        p95 = result["latencia_ms"]["p95"] / before["latencia_ms"]["p95"] - 1 if before["latencia_ms"]["p95"] else 0.0
+        print(f"{name:>6}: throughput {rps:+.1%}  p95 {p95:+.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fleet-size", type=int, default=10000, help="Vehículos en la base (10k–1M)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por escenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de calentamiento por escenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Medir un servidor ya levantado en lugar de la app en proceso")
+    parser.add_argument("--seed-only", action="store_true", help="Solo sembrar la base")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Reporte JSON anterior contra el cual comparar")
+    args = parser.parse_args()
+
+    ids = seed(args.fleet_size, args.users, args.seed)
+    if args.seed_only:
+        return
+
+    try:
+        results = asyncio.run(run(args, ids))
+    finally:
+        if "write" in args.scenarios:
+            cleanup_writes()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "base_de_datos": engine.dialect.name,
+            "modo": "http" if args.base_url else "asgi",
+            "db_async": settings.DB_ASYNC,
+            "python": platform.python_version(),
+            "flota": args.fleet_size,
+            "usuarios": args.users,
+            "concurrencia": args.concurrency,
+            "duracion_s": args.duration,
+            "semilla": args.seed,
+        },
+        "escenarios": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\nreporte guardado en {args.output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), report)
+
+if __name__ == "__main__":
+    main()
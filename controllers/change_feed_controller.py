@@ -0,0 +1,124 @@
+import asyncio
+from typing import Optional
+from fastapi import HTTPException, WebSocket, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from core.changefeed import RELOAD, change_feed
+from core.config import settings
+from controllers.user_controller import user_controller
+from controllers.vehicle_controller import vehicle_controller
+from database.change_notify import ChangeListener, notify_publisher
+from database.db import engine, run_on_primary
+
+class ChangeFeedController:
+    """Controlador del feed de cambios de vehículos (SSE y WebSocket)."""
+    
+    def __init__(self):
+        self._listener: Optional[ChangeListener] = None
+        self._watcher: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """
+        Recibir en este worker las escrituras de los demás: LISTEN en
+        PostgreSQL; en otros motores, vigilar la versión de la tabla.
+        """
+        if engine.dialect.name == "postgresql":
+            self._listener = ChangeListener(engine, change_feed)
+            self._listener.start()
+        else:
+            self._watcher = asyncio.create_task(self._watch_versions())
+    
+    async def shutdown(self) -> None:
+        """Enviar los NOTIFY pendientes y detener el hilo LISTEN o el vigilante de versiones."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        await run_in_threadpool(notify_publisher.close)
+        if self._listener is not None:
+            await run_in_threadpool(self._listener.stop)
+            self._listener = None
+    
+    async def _watch_versions(self) -> None:
+        """
+        Publicar `recargar` cuando la versión de la tabla avanza más de lo que
+        sumaron los commits de este proceso: otro worker escribió y sus
+        eventos no llegan aquí. Una lectura que se solapa con un commit
+        propio se descarta (no se sabe si la versión ya lo incluye).
+        """
+        baseline = None
+        while True:
+            await asyncio.sleep(settings.CHANGE_FEED_POLL_SECONDS)
+            in_flight, own = change_feed.local_writes()
+            try:
+                version = await run_on_primary(vehicle_controller.get_table_version)
+            except SQLAlchemyError:
+                continue
+            if in_flight or change_feed.local_writes() != (0, own):
+                continue
+            if baseline is not None and version - baseline[0] != own - baseline[1]:
+                change_feed.publish(RELOAD, {})
+            baseline = (version, own)
+
+    def sse_response(self, tipo: Optional[str] = None, last_event_id: Optional[str] = None) -> StreamingResponse:
+        """
+        Respuesta text/event-stream con los cambios que afectan a `tipo`.
+
+        Cada evento lleva `id:`, así que EventSource retoma solo con
+        Last-Event-ID al reconectar. Sin cambios se envía un comentario cada
+        CHANGE_FEED_HEARTBEAT_SECONDS para que proxies y balanceadores no
+        cierren la conexión.
+        """
+        async def stream():
+            # Reintento sugerido al cliente si se corta la conexión
+            yield b"retry: 3000\n\n"
+            async for event in change_feed.subscribe(tipo, last_event_id, settings.CHANGE_FEED_HEARTBEAT_SECONDS):
+                yield b": ping\n\n" if event is None else event.sse()
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def serve_websocket(self, websocket: WebSocket, token: Optional[str], tipo: Optional[str], desde: Optional[str]) -> None:
+        """
+        Enviar los cambios por WebSocket, un mensaje JSON por evento (el campo
+        `evento` sirve como `desde` al reconectar). Se cierra con 1008 si el
+        token no es válido.
+        """
+        if token is None:
+            authorization = websocket.headers.get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                token = authorization[len("bearer "):]
+        try:
+            await user_controller.get_websocket_user(token)
+        except HTTPException as e:
+            code = status.WS_1013_TRY_AGAIN_LATER if e.status_code == 429 else status.WS_1008_POLICY_VIOLATION
+            await websocket.close(code=code, reason=e.detail)
+            return
+
+        await websocket.accept()
+
+        async def send_events():
+            async for event in change_feed.subscribe(tipo, desde, settings.CHANGE_FEED_HEARTBEAT_SECONDS):
+                if event is not None:
+                    await websocket.send_text(event.data.decode())
+
+        async def wait_disconnect():
+            # Los mensajes del cliente se ignoran; solo interesa saber si se fue
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        # Termina cuando el cliente se desconecta o falla un envío
+        tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_disconnect())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Instancia global del controlador
+change_feed_controller = ChangeFeedController()
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from core import media
+from core.config import settings
+from core.etag import etag_matches
+from schemas.vehicle import VehiclePatch, VehicleImageUpload
+from controllers.vehicle_controller import vehicle_controller
+
+logger = logging.getLogger(__name__)
+
+class MediaController:
+    """Controlador para imágenes de vehículos (almacenamiento local y miniaturas)."""
+
+    def __init__(self):
+        # Un solo hilo para miniaturas: no compite con las peticiones por CPU
+        self._thumbnail_executor: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule_thumbnail(self, name: str) -> None:
+        """Generar la miniatura en segundo plano (una tarea por imagen a la vez)."""
+        if media.Image is None:
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+            if self._thumbnail_executor is None:
+                self._thumbnail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        future = self._thumbnail_executor.submit(media.make_thumbnail, name)
+        future.add_done_callback(lambda f: self._thumbnail_done(name, f))
+
+    def _thumbnail_done(self, name: str, future) -> None:
+        with self._lock:
+            self._pending.discard(name)
+        if future.exception() is not None:
+            logger.warning("No se pudo generar la miniatura de %s: %s", name, future.exception())
+
+    def shutdown(self) -> None:
+        """Detener el hilo de miniaturas: termina la actual y descarta las pendientes."""
+        with self._lock:
+            executor, self._thumbnail_executor = self._thumbnail_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def reset_after_fork(self) -> None:
+        """Olvidar el hilo de miniaturas heredado del padre: no existe en el hijo."""
+        self._thumbnail_executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    async def upload_vehicle_image_async(self, vehicle_id: int, upload: UploadFile, db) -> VehicleImageUpload:
+        """
+        Guardar la imagen de un vehículo y apuntar su imagen_url a ella.
+
+        La imagen se copia y se hashea fuera del event loop; si ya existía una
+        idéntica se reutiliza. La miniatura se genera después, en segundo plano.
+        """
+        # Validar el vehículo antes de escribir en disco
+        await vehicle_controller.get_vehicle_by_id_async(vehicle_id, db)
+        name, created = await run_in_threadpool(media.store_image, upload.file)
+        self.schedule_thumbnail(name)
+
+        vehicle = await vehicle_controller.patch_vehicle_async(
+            vehicle_id, VehiclePatch(imagen_url=media.media_url(name)), db
+        )
+        return VehicleImageUpload(
+            vehiculo=vehicle,
+            imagen_url=media.media_url(name),
+            miniatura_url=media.media_url(name, thumbnail=True),
+            duplicada=not created
+        )
+
+    async def serve_image_async(
+        self,
+        name: str,
+        thumbnail: bool = False,
+        range_header: Optional[str] = None,
+        if_none_match: Optional[str] = None
+    ) -> Response:
+        """
+        Responder una imagen guardada (o su miniatura) con caché de larga duración.
+
+        El contenido de un nombre no cambia nunca, así que se envía como
+        `immutable` con el hash como ETag. Si la miniatura todavía no existe
+        se sirve la original sin caché y se vuelve a encolar su generación.
+        Un solo stat por archivo, fuera del event loop.
+        """
+        path = media.thumbnail_path(name) if thumbnail else media.original_path(name)
+        if path is None:
+            raise self._not_found_exception()
+
+        # El tipo sale de la extensión validada; nosniff evita que el navegador
+        # interprete como otra cosa un archivo subido por un usuario
+        headers = {
+            "ETag": f'"{name}"',
+            "Cache-Control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable",
+            "X-Content-Type-Options": "nosniff",
+        }
+        try:
+            stat_result = await run_in_threadpool(os.stat, path)
+        except FileNotFoundError:
+            if not thumbnail:
+                raise self._not_found_exception()
+            path = media.original_path(name)
+            headers = {"Cache-Control": "no-cache", "X-Content-Type-Options": "nosniff"}
+            try:
+                stat_result = await run_in_threadpool(os.stat, path)
+            except FileNotFoundError:
+                raise self._not_found_exception()
+            self.schedule_thumbnail(name)
+
+        if "ETag" in headers and etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        media_type = media.MEDIA_TYPES[name.rsplit(".", 1)[1]]
+        return media.MediaFileResponse(
+            path, media_type, stat_result.st_size, range_header=range_header, headers=headers
+        )
+
+    def _not_found_exception(self) -> HTTPException:
+        """Error de imagen inexistente."""
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Imagen no encontrada"
+        )
+
+# Instancia global del controlador
+media_controller = MediaController()
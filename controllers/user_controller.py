@@ -1,35 +1,44 @@
+import time
 from typing import Optional
+import jwt
 from fastapi import HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from core.security import get_password_hash, verify_password, create_access_token, decode_access_token, oauth2_scheme
-from database.db import get_db
+from sqlalchemy import event, inspect, lambda_stmt, select
+from sqlalchemy.orm import Session, object_session
+from core.admission import enforce_rate_limit
+from core.cache import TTLCache
+from core.config import settings
+from core.security import (
+    get_password_hash, get_password_hash_async, verify_and_update_password_async,
+    create_access_token, decode_access_token, oauth2_scheme
+)
+from database.db import get_read_session, is_replica_session, run_db, run_on_primary
+from database.replicas import SharedWriteMarks
 from schemas.user import UserCreate, UserResponse, Token
 from models.user import User
 
+# Usuarios autenticados por `sub` del token, para evitar un SELECT por petición:
+# (usuario, momento en que se cargó)
+_principal_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+# Momento del último cambio de cada usuario, en memoria compartida entre los
+# workers: una entrada cargada antes se descarta en cualquier worker. Los
+# cambios hechos fuera de la aplicación (otro host, SQL directo) se ven al
+# expirar la entrada, como mucho AUTH_CACHE_TTL_SECONDS después
+_principal_changes = SharedWriteMarks(settings.AUTH_CACHE_MAX_ENTRIES)
+
 class UserController:
     """Controlador para operaciones de usuario."""
     
-    def register_user(self, user_data: UserCreate, db: Session) -> UserResponse:
-        """Registrar un nuevo usuario."""
-        # Verificar si el usuario ya existe
-        existing_user = db.query(User).filter(
-            (User.username == user_data.username) | (User.email == user_data.email)
-        ).first()
-        
-        if existing_user:
-            if existing_user.username == user_data.username:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El usuario ya existe"
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El email ya está registrado"
-                )
+    def register_user(self, user_data: UserCreate, db: Session, hashed_password: Optional[str] = None) -> UserResponse:
+        """Registrar un nuevo usuario (`hashed_password` permite calcular el hash fuera)."""
+        self.ensure_not_registered(user_data, db)
         
         # Hash de contraseña
-        hashed_password = get_password_hash(user_data.password)
+        if hashed_password is None:
+            hashed_password = get_password_hash(user_data.password)
         
         # Crear usuario
         user = User(
@@ -45,54 +54,166 @@ class UserController:
         
         return UserResponse(username=user.username, email=user.email)
     
-    def authenticate_user(self, username: str, password: str, db: Session) -> Optional[User]:
-        """Autenticar usuario."""
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            return None
-        if not verify_password(password, user.hashed_password):
-            return None
-        return user
-    
-    def login_user(self, username: str, password: str, db: Session) -> Token:
-        """Login de usuario."""
-        user = self.authenticate_user(username, password, db)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Usuario o contraseña incorrectos",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    def ensure_not_registered(self, user_data: UserCreate, db: Session) -> None:
+        """Rechazar con 400 un username o email ya registrado."""
+        existing_user = db.query(User).filter(
+            (User.username == user_data.username) | (User.email == user_data.email)
+        ).first()
         
-        # Crear token
-        access_token = create_access_token(data={"sub": user.username})
-        return Token(access_token=access_token, token_type="bearer")
+        if existing_user:
+            if existing_user.username == user_data.username:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El usuario ya existe"
+                )
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El email ya está registrado"
+                )
     
-    def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-        """Obtener usuario actual desde token."""
-        credentials_exception = HTTPException(
+    def update_password_hash(self, user: User, new_hash: str, db: Session) -> None:
+        """Guardar un hash regenerado (p. ej. al cambiar BCRYPT_ROUNDS)."""
+        user.hashed_password = new_hash
+        db.commit()
+    
+    def _invalid_login_exception(self) -> HTTPException:
+        """Error de credenciales incorrectas en el login."""
+        return HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No se pudo validar las credenciales",
+            detail="Usuario o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db = Depends(get_read_session)) -> User:
+        """Obtener usuario actual desde token."""
+        username = self._token_username(token)
         
-        try:
-            payload = decode_access_token(token)
-            username: str = payload.get("sub")
-            if username is None:
-                raise credentials_exception
-        except:
-            raise credentials_exception
+        # Cuota por cliente (RATE_LIMIT_PER_SECOND) antes de tocar la base
+        enforce_rate_limit(username)
+        
+        user = self._cached_principal(username)
+        if user is None:
+            loaded_at = time.time()
+            user = await run_db(db, self._load_principal, username)
+            if user is None and is_replica_session(db):
+                # Usuario recién registrado que la réplica aún no recibió
+                user = await run_on_primary(self._load_principal, username)
+            if user is None:
+                raise self._credentials_exception()
+            _principal_cache.set(username, (user, loaded_at))
         
-        user = db.query(User).filter(User.username == username).first()
+        return user
+    
+    async def get_websocket_user(self, token: Optional[str]) -> User:
+        """
+        Obtener el usuario de una conexión WebSocket. Los navegadores no
+        permiten enviar Authorization en el handshake, así que el token llega
+        como parámetro; sin sesión de la petición se consulta el primario.
+        """
+        username = self._token_username(token)
+        enforce_rate_limit(username)
+        
+        user = self._cached_principal(username)
         if user is None:
-            raise credentials_exception
+            loaded_at = time.time()
+            user = await run_on_primary(self._load_principal, username)
+            if user is None:
+                raise self._credentials_exception()
+            _principal_cache.set(username, (user, loaded_at))
         
         return user
     
+    def _token_username(self, token: Optional[str]) -> str:
+        """`sub` de un token válido."""
+        try:
+            payload = decode_access_token(token)
+            username: str = payload.get("sub")
+        except jwt.PyJWTError:
+            raise self._credentials_exception()
+        if username is None:
+            raise self._credentials_exception()
+        return username
+    
+    def _credentials_exception(self) -> HTTPException:
+        """Error de token inválido o usuario inexistente."""
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    def _load_principal(self, username: str, db: Session) -> Optional[User]:
+        """Cargar el usuario autenticado desacoplado de la sesión para cachearlo."""
+        user = self.get_user_by_username(username, db)
+        if user is not None:
+            db.expunge(user)
+        return user
+    
+    def _cached_principal(self, username: str) -> Optional[User]:
+        """Usuario cacheado, si no cambió (en ningún worker) después de cargarlo."""
+        entry = _principal_cache.get(username)
+        if entry is None:
+            return None
+        user, loaded_at = entry
+        if _principal_changes.last_write(username) >= loaded_at:
+            _principal_cache.pop(username)
+            return None
+        return user
+    
+    def invalidate_principal(self, username: str) -> None:
+        """Invalidar el usuario cacheado en todos los workers (llamar cuando cambia o se elimina)."""
+        _principal_cache.pop(username)
+        _principal_changes.mark(username)
+    
     def get_user_by_username(self, username: str, db: Session) -> Optional[User]:
-        """Obtener usuario por username."""
-        return db.query(User).filter(User.username == username).first()
+        """Obtener usuario por username (sentencia lambda, compilada una sola vez)."""
+        return db.execute(
+            lambda_stmt(lambda: select(User).where(User.username == username).limit(1))
+        ).scalars().first()
+    
+    # Versiones asíncronas: no bloquean el event loop (ver database.db.run_db)
+    
+    async def register_user_async(self, user_data: UserCreate, db) -> UserResponse:
+        """Registrar un nuevo usuario (async, hash en el pool de bcrypt)."""
+        # Rechazar duplicados antes de gastar un hash en el pool acotado
+        await run_db(db, self.ensure_not_registered, user_data)
+        hashed_password = await get_password_hash_async(user_data.password)
+        return await run_db(db, self.register_user, user_data, hashed_password=hashed_password)
+    
+    async def login_user_async(self, username: str, password: str, db) -> Token:
+        """Login de usuario (async, verificación en el pool de bcrypt)."""
+        user = await run_db(db, self.get_user_by_username, username)
+        if not user:
+            raise self._invalid_login_exception()
+        
+        verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+        if not verified:
+            raise self._invalid_login_exception()
+        if new_hash:
+            await run_db(db, self.update_password_hash, user, new_hash)
+        
+        access_token = create_access_token(data={"sub": user.username})
+        return Token(access_token=access_token, token_type="bearer")
 
 # Instancia global del controlador
 user_controller = UserController()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target):
+    """
+    Invalidar el usuario cacheado cuando se modifica o elimina. Se repite tras
+    el commit: otro worker pudo volver a cargarlo antes de que se confirmara.
+    """
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    for username in usernames:
+        user_controller.invalidate_principal(username)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    for username in session.info.pop("changed_principals", ()):
+        user_controller.invalidate_principal(username)
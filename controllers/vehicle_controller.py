@@ -1,138 +1,1252 @@
-from typing import List, Optional
+import csv
+import io
+import threading
+import time
+import zlib
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
 from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database.db import get_db
-from schemas.vehicle import VehicleCreate, VehicleUpdate, VehicleResponse, VehicleStats
+from sqlalchemy import (
+    Boolean, Integer, bindparam, case, cast, column, delete, func, insert, lambda_stmt, literal, literal_column,
+    null, or_, select, text, union_all, update, values
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.sql.expression import Grouping
+from core.batching import GroupCommitBatcher
+from core.cache import ByteLRUCache, TTLCache
+from core.changefeed import RELOAD, change_feed
+from core.config import settings
+from core.etag import make_etag
+from core.ingest import iter_records
+from core.media import thumbnail_url
+from core.metrics import registry
+from core.pagination import encode_cursor, decode_cursor
+from core.search import NgramIndex
+from core.serialization import dumps, dumps_lines
+from database.change_notify import notify_changes, notify_publisher, uses_notify
+from database.db import is_replica_session, new_read_session, run_db, run_on_primary
+from database.replicas import mark_recent_write, wrote_recently
+from schemas.vehicle import (
+    VehicleCreate, VehicleUpdate, VehiclePatch, VehicleResponse, VehicleStats, VehicleTypeStat,
+    BulkInsertReport, BulkRowError, VehicleSearchHit, VehicleSearchPage,
+    VehicleBatchItemResult, VehicleBatchResult, VehicleBatchUpdateItem
+)
 from models.vehicle import Vehicle
+from models.vehicle_stats import VehicleTypeStats
+
+# Vehículos serializados (JSON, ETag) por ID para GET /vehiculos/{id}
+_vehicle_payload_cache = TTLCache(
+    maxsize=settings.VEHICLE_CACHE_MAX_ENTRIES,
+    ttl=settings.VEHICLE_CACHE_TTL_SECONDS
+)
+
+# Páginas del listado serializadas: (cuerpo, cursor siguiente, cuerpo en gzip o None)
+# por (versión de la tabla, tipo, limit, after). Las versiones viejas salen por LRU
+_list_body_cache = ByteLRUCache(max_bytes=settings.VEHICLES_LIST_CACHE_MAX_BYTES)
+
+LIST_CACHE_REQUESTS = registry.counter(
+    "vehicle_list_cache_requests_total", "Consultas a la caché de páginas del listado", ("result",)
+)
+registry.callback(
+    "vehicle_list_cache_bytes",
+    "Bytes ocupados por la caché de páginas del listado",
+    "gauge",
+    lambda: [f"vehicle_list_cache_bytes {_list_body_cache.current_bytes}"]
+)
+
+# Conteos por faceta del listado, por filtro (se toleran unos segundos de desfase)
+_facets_cache = TTLCache(
+    maxsize=settings.VEHICLE_FACETS_CACHE_MAX_ENTRIES,
+    ttl=settings.VEHICLE_FACETS_CACHE_TTL_SECONDS
+)
+
+# Índice de búsqueda en memoria para motores sin pg_trgm
+_search_index = NgramIndex()
+_search_index_lock = threading.Lock()
+_search_index_building = False
+# Si cada engine PostgreSQL tiene pg_trgm instalado (búsqueda con VEHICLES_SEARCH_BACKEND=auto)
+_trigram_available = {}
+
+def _search_document():
+    """
+    Expresión "marca modelo tipo" usada en la búsqueda. Debe coincidir con la
+    del índice ix_vehicles_search_trgm, por eso los separadores van literales.
+    """
+    separator = literal_column("' '")
+    return Vehicle.marca.concat(separator).concat(Vehicle.modelo).concat(separator).concat(Vehicle.tipo)
+
+# Columnas en el orden usado por COPY en la carga masiva
+_BULK_COLUMNS = ("marca", "modelo", "año", "tipo", "kilometraje", "imagen_url")
+
+# Columnas de VehicleResponse: RETURNING y lecturas proyectadas sin instancias ORM
+_VEHICLE_COLUMNS = (
+    Vehicle.id, Vehicle.marca, Vehicle.modelo, Vehicle.año,
+    Vehicle.tipo, Vehicle.kilometraje, Vehicle.imagen_url
+)
+
+def _vehicle_dict(row) -> dict:
+    """Campos de VehicleResponse (con miniatura_url) de una fila con _VEHICLE_COLUMNS."""
+    data = {c.key: row._mapping[c.key] for c in _VEHICLE_COLUMNS}
+    data["miniatura_url"] = thumbnail_url(data["imagen_url"])
+    return data
 
 class VehicleController:
     """Controlador para operaciones de vehículos."""
     
-    def create_vehicle(self, vehicle_data: VehicleCreate, db: Session) -> VehicleResponse:
-        """Crear un nuevo vehículo."""
-        # Crear vehículo
-        vehicle = Vehicle(
-            marca=vehicle_data.marca,
-            modelo=vehicle_data.modelo,
-            año=vehicle_data.año,
-            tipo=vehicle_data.tipo,
-            kilometraje=vehicle_data.kilometraje,
-            imagen_url=vehicle_data.imagen_url
+    def __init__(self):
+        # El resumen vacío se verifica una vez por proceso (ver backfill_stats_if_empty)
+        self._stats_backfill_checked = False
+        # Altas agrupadas en lotes (solo con VEHICLES_GROUP_COMMIT)
+        self._create_batcher = GroupCommitBatcher(
+            "vehicle_create",
+            self._flush_create_batch,
+            max_delay=settings.VEHICLES_GROUP_COMMIT_DELAY_MS / 1000,
+            max_size=settings.VEHICLES_GROUP_COMMIT_MAX_BATCH
         )
+    
+    def create_vehicle(self, vehicle_data: VehicleCreate, db: Session) -> VehicleResponse:
+        """Crear un nuevo vehículo (INSERT ... RETURNING, sin SELECT posterior)."""
+        vehicle = db.execute(
+            insert(Vehicle).values(vehicle_data.model_dump()).returning(*_VEHICLE_COLUMNS, Vehicle.version)
+        ).one()
         
-        # Guardar en BD
-        db.add(vehicle)
-        db.commit()
-        db.refresh(vehicle)
-        
-        return VehicleResponse(
-            id=vehicle.id,
-            marca=vehicle.marca,
-            modelo=vehicle.modelo,
-            año=vehicle.año,
-            tipo=vehicle.tipo,
-            kilometraje=vehicle.kilometraje,
-            imagen_url=vehicle.imagen_url
-        )
+        # Resumen de estadísticas en la misma transacción
+        self._apply_stats_deltas(db, {vehicle.tipo: (1, vehicle.kilometraje)})
+        self._commit_changes(db, [self._change_event(vehicle, created=True)], 1)
+        self._vehicle_changed(vehicle)
+        
+        return VehicleResponse(**vehicle._mapping)
     
-    def get_all_vehicles(self, db: Session, tipo: Optional[str] = None) -> List[VehicleResponse]:
-        """Obtener todos los vehículos, opcionalmente filtrados por tipo."""
-        query = db.query(Vehicle)
+    def create_vehicles_batch(
+        self,
+        vehicles: List[VehicleCreate],
+        db: Session
+    ) -> List[Union[VehicleResponse, Exception]]:
+        """
+        Crear varios vehículos con un INSERT multi-fila y un solo COMMIT.
+        
+        Retorna un resultado por vehículo, en orden. Si el lote falla se
+        reintenta fila por fila para que el error quede aislado en la fila
+        que lo causa.
+        """
+        try:
+            rows = db.execute(
+                insert(Vehicle).returning(*_VEHICLE_COLUMNS, Vehicle.version, sort_by_parameter_order=True),
+                [vehicle.model_dump() for vehicle in vehicles]
+            ).all()
+            deltas = {}
+            for row in rows:
+                self._add_stats_delta(deltas, row.tipo, 1, row.kilometraje)
+            self._apply_stats_deltas(db, deltas)
+            self._commit_changes(db, [self._change_event(row, created=True) for row in rows], len(deltas))
+        except SQLAlchemyError:
+            db.rollback()
+            return [self._create_vehicle_isolated(vehicle, db) for vehicle in vehicles]
+        
+        for row in rows:
+            self._vehicle_changed(row)
+        return [VehicleResponse(**row._mapping) for row in rows]
+    
+    def _create_vehicle_isolated(self, vehicle_data: VehicleCreate, db: Session) -> Union[VehicleResponse, Exception]:
+        """Crear un vehículo en su propia transacción, retornando el error en lugar de lanzarlo."""
+        try:
+            return self.create_vehicle(vehicle_data, db)
+        except SQLAlchemyError as e:
+            db.rollback()
+            return e
+    
+    def get_vehicles_page(
+        self,
+        db: Session,
+        tipo: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Obtener una página de vehículos ordenada por ID (paginación keyset).
+        
+        Retorna los vehículos de la página como dicts con los campos de
+        VehicleResponse (proyectados desde las filas, sin instancias ORM ni
+        modelos Pydantic) y el cursor para la siguiente, o None si no hay más.
+        """
+        limit = limit or settings.VEHICLES_PAGE_SIZE
+        stmt = select(*_VEHICLE_COLUMNS)
         
         # Filtrar por tipo si se proporciona
         if tipo:
-            query = query.filter(Vehicle.tipo.ilike(f"%{tipo}%"))
+            stmt = stmt.where(Vehicle.tipo.ilike(f"%{tipo}%"))
         
-        vehicles = query.all()
+        # Continuar a partir del último ID de la página anterior
+        if after:
+            stmt = stmt.where(Vehicle.id > decode_cursor(after))
         
-        return [VehicleResponse(
-            id=v.id,
-            marca=v.marca,
-            modelo=v.modelo,
-            año=v.año,
-            tipo=v.tipo,
-            kilometraje=v.kilometraje,
-            imagen_url=v.imagen_url
-        ) for v in vehicles]
+        # Se pide un registro extra para saber si existe otra página
+        rows = db.execute(stmt.order_by(Vehicle.id).limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].id)
+        
+        return [_vehicle_dict(row) for row in rows], next_cursor
+    
+    def get_table_version(self, db: Session) -> int:
+        """Versión de la tabla vehicles: suma de las versiones del resumen por tipo."""
+        return db.execute(
+            lambda_stmt(lambda: select(func.coalesce(func.sum(VehicleTypeStats.version), 0)))
+        ).scalar_one()
+    
+    def get_vehicles_page_body(
+        self,
+        db: Session,
+        tipo: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        accept_gzip: bool = False
+    ) -> Tuple[bytes, Optional[str], bool]:
+        """
+        Obtener una página del listado ya serializada.
+        
+        Retorna el cuerpo JSON (en gzip si `accept_gzip` y supera
+        VEHICLES_LIST_GZIP_MIN_BYTES), el cursor siguiente y si el cuerpo va
+        comprimido. Los cuerpos se cachean por filtro, página y versión de la
+        tabla: entre dos escrituras las llamadas repetidas cuestan una consulta
+        a la versión. La versión se lee antes que las filas, así que una
+        entrada nunca tiene datos anteriores a su versión.
+        """
+        limit = limit or settings.VEHICLES_PAGE_SIZE
+        key = None
+        entry = None
+        if settings.VEHICLES_LIST_CACHE_MAX_BYTES > 0:
+            key = (self.get_table_version(db), (tipo or "").lower(), limit, after)
+            entry = _list_body_cache.get(key)
+            LIST_CACHE_REQUESTS.inc("hit" if entry is not None else "miss")
+        
+        if entry is None:
+            vehicles, next_cursor = self.get_vehicles_page(db, tipo=tipo, limit=limit, after=after)
+            entry = (dumps(vehicles), next_cursor, None)
+            if key is not None:
+                _list_body_cache.set(key, entry, len(entry[0]))
+        
+        body, next_cursor, gzip_body = entry
+        if not accept_gzip or len(body) < settings.VEHICLES_LIST_GZIP_MIN_BYTES:
+            return body, next_cursor, False
+        if gzip_body is None:
+            gzip_body = b"".join(self._gzip_chunks([body]))
+            if key is not None:
+                _list_body_cache.set(key, (body, next_cursor, gzip_body), len(body) + len(gzip_body))
+        return gzip_body, next_cursor, True
+    
+    def get_vehicle_facets(self, db: Session, tipo: Optional[str] = None) -> dict:
+        """
+        Conteos por tipo, marca y rango de años de los vehículos que cumplen
+        el filtro del listado, en una sola consulta agrupada.
+        
+        En PostgreSQL se usa GROUPING SETS (un solo recorrido de la tabla); en
+        otros motores, UNION ALL de los tres GROUP BY. El resultado se guarda
+        VEHICLE_FACETS_CACHE_TTL_SECONDS por filtro.
+        """
+        key = (tipo or "").lower()
+        cached = _facets_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        where = [Vehicle.tipo.ilike(f"%{tipo}%")] if tipo else []
+        # Tamaño del rango literal: un parámetro distinto en SELECT y GROUP BY
+        # impediría a PostgreSQL reconocer la misma expresión
+        size = literal_column(str(int(settings.VEHICLE_FACETS_YEAR_BUCKET)))
+        bucket = ((Vehicle.año // size) * size).label("año_desde")
+        
+        if db.get_bind().dialect.name == "postgresql":
+            faceta = case(
+                (func.grouping(Vehicle.tipo) == 0, literal_column("'tipo'")),
+                (func.grouping(Vehicle.marca) == 0, literal_column("'marca'")),
+                else_=literal_column("'año'")
+            ).label("faceta")
+            stmt = (
+                select(faceta, Vehicle.tipo, Vehicle.marca, bucket, func.count().label("total"))
+                .where(*where)
+                .group_by(func.grouping_sets(Vehicle.tipo, Vehicle.marca, bucket))
+            )
+        else:
+            stmt = union_all(
+                select(
+                    literal_column("'tipo'").label("faceta"), Vehicle.tipo,
+                    null().label("marca"), null().label("año_desde"), func.count().label("total")
+                ).where(*where).group_by(Vehicle.tipo),
+                select(
+                    literal_column("'marca'"), null(), Vehicle.marca, null(), func.count()
+                ).where(*where).group_by(Vehicle.marca),
+                select(
+                    literal_column("'año'"), null(), null(), bucket, func.count()
+                ).where(*where).group_by(bucket),
+            )
+        
+        facets = {"tipo": [], "marca": [], "año": []}
+        for row in db.execute(stmt):
+            if row.faceta == "año":
+                desde = int(row.año_desde)
+                facets["año"].append({
+                    "desde": desde,
+                    "hasta": desde + settings.VEHICLE_FACETS_YEAR_BUCKET - 1,
+                    "total": row.total
+                })
+            else:
+                facets[row.faceta].append({"valor": getattr(row, row.faceta), "total": row.total})
+        
+        # Todo vehículo tiene tipo: la suma por tipo es el total del filtro
+        result = {"total": sum(f["total"] for f in facets["tipo"])}
+        limit = settings.VEHICLE_FACETS_MAX_VALUES
+        for name in ("tipo", "marca"):
+            result[name] = sorted(facets[name], key=lambda f: (-f["total"], f["valor"]))[:limit]
+        result["año"] = sorted(facets["año"], key=lambda f: f["desde"])
+        _facets_cache.set(key, result)
+        return result
+    
+    def stream_vehicles(
+        self,
+        tipo: Optional[str] = None,
+        after: Optional[str] = None,
+        batch_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Transmitir vehículos como NDJSON leyendo de un cursor del servidor.
+        
+        Usa su propia sesión porque la respuesta se envía después de que
+        FastAPI cierra las dependencias de la petición.
+        """
+        batch_size = batch_size or settings.VEHICLES_STREAM_BATCH_SIZE
+        stmt = select(*Vehicle.__table__.columns).order_by(Vehicle.id)
+        if tipo:
+            stmt = stmt.where(Vehicle.tipo.ilike(f"%{tipo}%"))
+        if after:
+            # El cursor se valida antes de empezar a transmitir la respuesta
+            stmt = stmt.where(Vehicle.id > decode_cursor(after))
+        return self._encode_ndjson(self._iter_partitions(stmt, batch_size))
+    
+    def export_vehicles(
+        self,
+        formato: str = "csv",
+        tipo: Optional[str] = None,
+        año: Optional[int] = None,
+        compress: bool = False,
+        batch_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Exportar la tabla de vehículos como CSV o NDJSON en streaming.
+        
+        Lee filas Core (sin instancias ORM ni identity map) desde un cursor del
+        servidor, de modo que la memoria usada no depende del tamaño de la tabla.
+        """
+        batch_size = batch_size or settings.VEHICLES_STREAM_BATCH_SIZE
+        stmt = select(*Vehicle.__table__.columns).order_by(Vehicle.id)
+        if tipo:
+            stmt = stmt.where(Vehicle.tipo.ilike(f"%{tipo}%"))
+        if año is not None:
+            stmt = stmt.where(Vehicle.año == año)
+        
+        partitions = self._iter_partitions(stmt, batch_size)
+        if formato == "csv":
+            chunks = self._encode_csv(partitions)
+        else:
+            chunks = self._encode_ndjson(partitions)
+        return self._gzip_chunks(chunks) if compress else chunks
+    
+    def _iter_partitions(self, stmt, batch_size: int) -> Iterator[list]:
+        """Ejecutar la consulta en un cursor del servidor y producir lotes de filas."""
+        db = new_read_session()
+        try:
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            yield from result.partitions()
+        finally:
+            db.close()
+    
+    def _encode_ndjson(self, partitions: Iterator[list]) -> Iterator[bytes]:
+        """Serializar lotes de filas como NDJSON (un bloque por lote)."""
+        for partition in partitions:
+            yield dumps_lines(row._asdict() for row in partition)
+    
+    def _encode_csv(self, partitions: Iterator[list]) -> Iterator[bytes]:
+        """Serializar lotes de filas como CSV con encabezado."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(Vehicle.__table__.columns.keys())
+        for partition in partitions:
+            writer.writerows(partition)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    
+    def _gzip_chunks(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Comprimir un stream de bytes con gzip a medida que se genera."""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
     
     def get_vehicle_by_id(self, vehicle_id: int, db: Session) -> VehicleResponse:
         """Obtener un vehículo por ID."""
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-        if not vehicle:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Vehículo no encontrado"
+        vehicle = self._select_vehicle(vehicle_id, db)
+        if vehicle is None:
+            raise self._not_found_exception()
+        return VehicleResponse(**vehicle._mapping)
+    
+    def _select_vehicle(self, vehicle_id: int, db: Session):
+        """
+        Fila proyectada de un vehículo, o None.
+        
+        Sentencia lambda: se construye y compila una sola vez; en cada llamada
+        solo cambia el parámetro `vehicle_id`.
+        """
+        return db.execute(
+            lambda_stmt(lambda: select(*_VEHICLE_COLUMNS).where(Vehicle.id == vehicle_id))
+        ).first()
+    
+    def get_vehicle_payload(self, vehicle_id: int, db: Session) -> Tuple[bytes, str]:
+        """
+        Obtener un vehículo serializado en JSON junto con su ETag.
+        
+        Caché en memoria por vehículo. Las escrituras de este worker la
+        invalidan al momento; las de otros workers se detectan por la
+        `version` del propio vehículo, que cada UPDATE incrementa. Durante
+        VEHICLE_CACHE_REVALIDATE_SECONDS desde la última validación un
+        acierto no consulta la base (ese es el desfase máximo frente a otro
+        worker); después se revalida leyendo solo `version` por clave primaria.
+        """
+        fresh = self._fresh_vehicle_payload(vehicle_id, db.info.get("principal"))
+        if fresh is not None:
+            return fresh
+        cached = _vehicle_payload_cache.get(vehicle_id)
+        if cached is not None:
+            version, _, entry = cached
+            current = self._select_vehicle_version(vehicle_id, db)
+            if current is None:
+                self._invalidate_vehicle_payload(vehicle_id)
+                raise self._not_found_exception()
+            if current == version:
+                _vehicle_payload_cache.set(vehicle_id, (version, time.monotonic(), entry))
+                return entry
+        
+        vehicle = db.execute(lambda_stmt(lambda: (
+            select(*_VEHICLE_COLUMNS, Vehicle.version).where(Vehicle.id == vehicle_id)
+        ))).first()
+        if vehicle is None:
+            raise self._not_found_exception()
+        body = dumps(_vehicle_dict(vehicle))
+        entry = (body, make_etag(body))
+        # Solo se cachea lo leído del primario: una réplica atrasada guardaría
+        # una versión vieja que otra petición, validando en la réplica, aceptaría
+        if not is_replica_session(db):
+            _vehicle_payload_cache.set(vehicle_id, (vehicle.version, time.monotonic(), entry))
+        return entry
+    
+    def _fresh_vehicle_payload(self, vehicle_id: int, principal: Optional[str]) -> Optional[Tuple[bytes, str]]:
+        """Entrada en caché validada hace menos de VEHICLE_CACHE_REVALIDATE_SECONDS, o None."""
+        cached = _vehicle_payload_cache.get(vehicle_id)
+        if cached is None:
+            return None
+        _, checked_at, entry = cached
+        # Un cliente que acaba de escribir (en cualquier worker) valida siempre
+        if time.monotonic() - checked_at >= settings.VEHICLE_CACHE_REVALIDATE_SECONDS or wrote_recently(principal):
+            return None
+        return entry
+    
+    def _select_vehicle_version(self, vehicle_id: int, db: Session) -> Optional[int]:
+        """Versión actual de un vehículo (None si no existe)."""
+        return db.execute(lambda_stmt(lambda: (
+            select(Vehicle.version).where(Vehicle.id == vehicle_id)
+        ))).scalar()
+    
+    def _invalidate_vehicle_payload(self, vehicle_id: int) -> None:
+        """Invalidar el vehículo serializado en caché."""
+        _vehicle_payload_cache.pop(vehicle_id)
+    
+    def update_vehicle(self, vehicle_id: int, vehicle_data: VehicleUpdate, db: Session) -> VehicleResponse:
+        """Actualizar un vehículo existente (reemplazo completo)."""
+        return self._update_vehicle_fields(vehicle_id, vehicle_data.model_dump(), db)
+    
+    def patch_vehicle(self, vehicle_id: int, vehicle_data: VehiclePatch, db: Session) -> VehicleResponse:
+        """Actualizar solo los campos enviados."""
+        values = vehicle_data.model_dump(exclude_unset=True)
+        if not values:
+            return self.get_vehicle_by_id(vehicle_id, db)
+        return self._update_vehicle_fields(vehicle_id, values, db)
+    
+    def _update_vehicle_fields(self, vehicle_id: int, values: dict, db: Session) -> VehicleResponse:
+        """
+        Actualizar columnas con UPDATE ... RETURNING.
+        
+        Si cambian tipo o kilometraje, las estadísticas necesitan los valores
+        anteriores: en PostgreSQL se obtienen en la misma sentencia con
+        UPDATE ... FROM sobre la fila bloqueada; en otros motores (SQLite no
+        permite columnas del FROM en RETURNING) con un SELECT ... FOR UPDATE previo.
+        """
+        stmt = (
+            update(Vehicle)
+            .where(Vehicle.id == vehicle_id)
+            .values({**values, "version": Vehicle.version + 1})
+            .execution_options(synchronize_session=False)
+        )
+        returning = [*_VEHICLE_COLUMNS, Vehicle.version]
+        previous = None
+        affects_stats = "tipo" in values or "kilometraje" in values
+        
+        if affects_stats and db.get_bind().dialect.name == "postgresql":
+            old = (
+                select(Vehicle.id, Vehicle.tipo, Vehicle.kilometraje)
+                .where(Vehicle.id == vehicle_id)
+                .with_for_update()
+                .subquery("old")
             )
-        return VehicleResponse(
-            id=vehicle.id,
-            marca=vehicle.marca,
-            modelo=vehicle.modelo,
-            año=vehicle.año,
-            tipo=vehicle.tipo,
-            kilometraje=vehicle.kilometraje,
-            imagen_url=vehicle.imagen_url
+            stmt = stmt.where(Vehicle.id == old.c.id)
+            returning += [old.c.tipo.label("old_tipo"), old.c.kilometraje.label("old_kilometraje")]
+        elif affects_stats:
+            previous = db.execute(
+                select(Vehicle.tipo, Vehicle.kilometraje)
+                .where(Vehicle.id == vehicle_id)
+                .with_for_update()
+            ).first()
+            if previous is None:
+                raise self._not_found_exception()
+        
+        vehicle = db.execute(stmt.returning(*returning)).first()
+        if vehicle is None:
+            raise self._not_found_exception()
+        if "old_tipo" in vehicle._fields:
+            previous = (vehicle.old_tipo, vehicle.old_kilometraje)
+        
+        # Revertir el aporte anterior a las estadísticas y sumar el nuevo; la
+        # fila del tipo se toca siempre para incrementar la versión de la tabla
+        deltas = {}
+        if previous is not None:
+            old_tipo, old_km = previous
+            self._add_stats_delta(deltas, old_tipo, -1, -old_km)
+            self._add_stats_delta(deltas, vehicle.tipo, 1, vehicle.kilometraje)
+        else:
+            self._add_stats_delta(deltas, vehicle.tipo, 0, 0.0)
+        self._apply_stats_deltas(db, deltas)
+        
+        event = self._change_event(vehicle, previous_tipo=previous[0] if previous is not None else None)
+        self._commit_changes(db, [event], len(deltas))
+        self._vehicle_changed(vehicle)
+        
+        return VehicleResponse(**{c.key: vehicle._mapping[c.key] for c in _VEHICLE_COLUMNS})
+    
+    def delete_vehicle(self, vehicle_id: int, db: Session) -> dict:
+        """Eliminar un vehículo (DELETE ... RETURNING, sin cargarlo antes)."""
+        vehicle = db.execute(
+            delete(Vehicle)
+            .where(Vehicle.id == vehicle_id)
+            .returning(Vehicle.tipo, Vehicle.kilometraje, Vehicle.version)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if vehicle is None:
+            raise self._not_found_exception()
+        
+        self._apply_stats_deltas(db, {vehicle.tipo: (-1, -vehicle.kilometraje)})
+        self._commit_changes(db, [self._delete_event(vehicle_id, vehicle.tipo, vehicle.version)], 1)
+        self._vehicle_deleted(vehicle_id)
+        
+        return {"message": "Vehículo eliminado correctamente"}
+    
+    def batch_get_vehicles(self, ids: List[int], db: Session) -> VehicleBatchResult:
+        """Obtener varios vehículos con un solo SELECT ... WHERE id IN (...)."""
+        ids = list(dict.fromkeys(ids))
+        found = {
+            row.id: VehicleResponse(**row._mapping)
+            for row in db.execute(select(*_VEHICLE_COLUMNS).where(Vehicle.id.in_(ids)))
+        }
+        return self._batch_result(ids, found)
+    
+    def batch_update_vehicles(self, items: List[VehicleBatchUpdateItem], db: Session) -> VehicleBatchResult:
+        """
+        Aplicar cambios parciales a varios vehículos en una sola transacción.
+        
+        En PostgreSQL es un único UPDATE ... FROM (VALUES ...) que toma, con
+        FOR UPDATE, el tipo y kilometraje anteriores para las estadísticas. En
+        otros motores: un SELECT ... FOR UPDATE de los valores anteriores y el
+        mismo UPDATE por ID ejecutado con executemany.
+        """
+        changes = [(item.id, item.model_dump(exclude_unset=True, exclude={"id"})) for item in items]
+        if db.get_bind().dialect.name == "postgresql":
+            updated = self._batch_update_from_values(changes, db)
+        else:
+            updated = self._batch_update_executemany(changes, db)
+        
+        deltas = {}
+        for row, old_tipo, old_km in updated:
+            self._add_stats_delta(deltas, old_tipo, -1, -old_km)
+            self._add_stats_delta(deltas, row.tipo, 1, row.kilometraje)
+        self._apply_stats_deltas(db, deltas)
+        events = [self._change_event(row, previous_tipo=old_tipo) for row, old_tipo, _ in updated]
+        self._commit_changes(db, events, len(deltas))
+        
+        found = {}
+        for row, _, _ in updated:
+            self._vehicle_changed(row)
+            found[row.id] = VehicleResponse(**{c.key: row._mapping[c.key] for c in _VEHICLE_COLUMNS})
+        return self._batch_result([vehicle_id for vehicle_id, _ in changes], found)
+    
+    def _batch_update_set_clause(self, source) -> dict:
+        """
+        SET del UPDATE por lote: cada columna toma el valor enviado o conserva
+        el actual (NULL = no enviado); imagen_url usa un indicador aparte
+        porque admite null. `source(nombre)` da la expresión del valor enviado.
+        """
+        set_clause = {
+            name: func.coalesce(cast(source(name), Vehicle.__table__.c[name].type), Vehicle.__table__.c[name])
+            for name in _BULK_COLUMNS
+            if name != "imagen_url"
+        }
+        set_clause["imagen_url"] = case(
+            (source("set_imagen_url"), cast(source("imagen_url"), Vehicle.__table__.c.imagen_url.type)),
+            else_=Vehicle.__table__.c.imagen_url
         )
+        set_clause["version"] = Vehicle.__table__.c.version + 1
+        return set_clause
     
-    def update_vehicle(self, vehicle_id: int, vehicle_data: VehicleUpdate, db: Session) -> VehicleResponse:
-        """Actualizar un vehículo existente."""
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-        if not vehicle:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Vehículo no encontrado"
+    def _batch_update_from_values(self, changes: List[Tuple[int, dict]], db: Session) -> list:
+        """UPDATE ... FROM (VALUES ...) con los valores anteriores en RETURNING (PostgreSQL)."""
+        ids = [vehicle_id for vehicle_id, _ in changes]
+        data = values(
+            column("id", Integer),
+            *[column(name, Vehicle.__table__.c[name].type) for name in _BULK_COLUMNS],
+            column("set_imagen_url", Boolean),
+            name="v"
+        ).data([
+            (vehicle_id, *[fields.get(name) for name in _BULK_COLUMNS], "imagen_url" in fields)
+            for vehicle_id, fields in changes
+        ])
+        # Filas bloqueadas en orden de ID para no generar deadlocks entre lotes
+        old = (
+            select(Vehicle.id, Vehicle.tipo, Vehicle.kilometraje)
+            .where(Vehicle.id.in_(ids))
+            .order_by(Vehicle.id)
+            .with_for_update()
+            .subquery("old")
+        )
+        rows = db.execute(
+            update(Vehicle.__table__)
+            .where(Vehicle.id == data.c.id, Vehicle.id == old.c.id)
+            .values(self._batch_update_set_clause(lambda name: data.c[name]))
+            .returning(
+                *_VEHICLE_COLUMNS, Vehicle.__table__.c.version,
+                old.c.tipo.label("old_tipo"), old.c.kilometraje.label("old_kilometraje")
+            )
+        ).all()
+        return [(row, row.old_tipo, row.old_kilometraje) for row in rows]
+    
+    def _batch_update_executemany(self, changes: List[Tuple[int, dict]], db: Session) -> list:
+        """SELECT ... FOR UPDATE de los valores anteriores y UPDATE por ID con executemany."""
+        ids = [vehicle_id for vehicle_id, _ in changes]
+        previous = {
+            row.id: row
+            for row in db.execute(
+                select(Vehicle.id, Vehicle.tipo, Vehicle.kilometraje)
+                .where(Vehicle.id.in_(ids))
+                .order_by(Vehicle.id)
+                .with_for_update()
             )
+        }
+        if not previous:
+            return []
         
-        # Actualizar campos
-        vehicle.marca = vehicle_data.marca
-        vehicle.modelo = vehicle_data.modelo
-        vehicle.año = vehicle_data.año
-        vehicle.tipo = vehicle_data.tipo
-        vehicle.kilometraje = vehicle_data.kilometraje
-        vehicle.imagen_url = vehicle_data.imagen_url
-        
-        db.commit()
-        db.refresh(vehicle)
-        
-        return VehicleResponse(
-            id=vehicle.id,
-            marca=vehicle.marca,
-            modelo=vehicle.modelo,
-            año=vehicle.año,
-            tipo=vehicle.tipo,
-            kilometraje=vehicle.kilometraje,
-            imagen_url=vehicle.imagen_url
+        params = {name: f"p{index}" for index, name in enumerate((*_BULK_COLUMNS, "set_imagen_url"))}
+        stmt = (
+            update(Vehicle.__table__)
+            .where(Vehicle.__table__.c.id == bindparam("p_id"))
+            .values(self._batch_update_set_clause(lambda name: bindparam(params[name])))
         )
+        db.execute(stmt, [
+            {
+                "p_id": vehicle_id,
+                **{params[name]: fields.get(name) for name in _BULK_COLUMNS},
+                params["set_imagen_url"]: "imagen_url" in fields,
+            }
+            for vehicle_id, fields in changes
+            if vehicle_id in previous
+        ])
+        rows = db.execute(select(*_VEHICLE_COLUMNS, Vehicle.version).where(Vehicle.id.in_(list(previous)))).all()
+        return [(row, previous[row.id].tipo, previous[row.id].kilometraje) for row in rows]
     
-    def delete_vehicle(self, vehicle_id: int, db: Session) -> dict:
-        """Eliminar un vehículo."""
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-        if not vehicle:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Vehículo no encontrado"
+    def batch_delete_vehicles(self, ids: List[int], db: Session) -> VehicleBatchResult:
+        """Eliminar varios vehículos con un solo DELETE ... WHERE id IN (...) RETURNING."""
+        ids = list(dict.fromkeys(ids))
+        rows = db.execute(
+            delete(Vehicle)
+            .where(Vehicle.id.in_(ids))
+            .returning(Vehicle.id, Vehicle.tipo, Vehicle.kilometraje, Vehicle.version)
+            .execution_options(synchronize_session=False)
+        ).all()
+        
+        deltas = {}
+        for row in rows:
+            self._add_stats_delta(deltas, row.tipo, -1, -row.kilometraje)
+        self._apply_stats_deltas(db, deltas)
+        self._commit_changes(db, [self._delete_event(row.id, row.tipo, row.version) for row in rows], len(deltas))
+        
+        for row in rows:
+            self._vehicle_deleted(row.id)
+        return self._batch_result(ids, {row.id: None for row in rows})
+    
+    def _batch_result(self, ids: List[int], found: dict) -> VehicleBatchResult:
+        """Resultado por ítem en el orden pedido: 200 si el ID está en `found`, 404 si no."""
+        return VehicleBatchResult(items=[
+            VehicleBatchItemResult(id=vehicle_id, status=200, vehiculo=found[vehicle_id])
+            if vehicle_id in found else
+            VehicleBatchItemResult(id=vehicle_id, status=404, error="Vehículo no encontrado")
+            for vehicle_id in ids
+        ])
+    
+    def _not_found_exception(self) -> HTTPException:
+        """Error de vehículo inexistente."""
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehículo no encontrado"
+        )
+    
+    def search_vehicles(
+        self,
+        q: str,
+        db: Session,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> VehicleSearchPage:
+        """
+        Buscar vehículos por subcadena en marca, modelo y tipo.
+        
+        En PostgreSQL usa el índice de trigramas (pg_trgm); en otros motores,
+        un índice de n-gramas en memoria. Resultados ordenados por relevancia.
+        """
+        limit = limit or settings.VEHICLES_PAGE_SIZE
+        if self._use_trigram_search(db):
+            hits = self._search_trigram(q, limit + 1, offset, db)
+        else:
+            hits = self._search_ngram(q, limit + 1, offset, db)
+        
+        return VehicleSearchPage(
+            items=hits[:limit],
+            limit=limit,
+            offset=offset,
+            next_offset=offset + limit if len(hits) > limit else None
+        )
+    
+    def _use_trigram_search(self, db: Session) -> bool:
+        """
+        Indica si la búsqueda se resuelve con pg_trgm. En modo "auto" se
+        verifica una vez por engine que la extensión esté instalada; si no,
+        se usa el índice de n-gramas en memoria.
+        """
+        backend = settings.VEHICLES_SEARCH_BACKEND
+        if backend != "auto":
+            return backend == "trigram"
+        bind = db.get_bind()
+        if bind.dialect.name != "postgresql":
+            return False
+        available = _trigram_available.get(bind.engine)
+        if available is None:
+            available = db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+            _trigram_available[bind.engine] = available
+        return available
+    
+    def _search_trigram(self, q: str, limit: int, offset: int, db: Session) -> List[VehicleSearchHit]:
+        """Búsqueda con los índices GIN de trigramas (ver migración de búsqueda)."""
+        document = _search_document()
+        escaped = q.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        score = func.word_similarity(q, document)
+        stmt = (
+            select(*Vehicle.__table__.columns, score.label("score"))
+            .where(or_(
+                document.ilike(f"%{escaped}%", escape="!"),
+                literal(q).op("<%")(Grouping(document))
+            ))
+            .order_by(score.desc(), Vehicle.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return [
+            VehicleSearchHit(**{**row._asdict(), "score": round(float(row.score), 4)})
+            for row in db.execute(stmt)
+        ]
+    
+    def _search_ngram(self, q: str, limit: int, offset: int, db: Session) -> List[VehicleSearchHit]:
+        """Búsqueda con el índice de n-gramas en memoria."""
+        self._ensure_search_index(db)
+        hits = _search_index.search(q, limit, offset)
+        if not hits:
+            return []
+        
+        rows = {
+            row.id: row
+            for row in db.execute(
+                select(*Vehicle.__table__.columns).where(Vehicle.id.in_([doc_id for doc_id, _ in hits]))
+            )
+        }
+        return [
+            VehicleSearchHit(**rows[doc_id]._asdict(), score=score)
+            for doc_id, score in hits
+            if doc_id in rows
+        ]
+    
+    def _ensure_search_index(self, db: Session) -> None:
+        """
+        Construir el índice en memoria si no existe o si superó su antigüedad
+        máxima (así se incorporan escrituras hechas por otros workers).
+        """
+        def is_fresh() -> bool:
+            return (
+                _search_index.is_built
+                and time.monotonic() - _search_index.built_at < settings.VEHICLES_SEARCH_INDEX_MAX_AGE_SECONDS
             )
         
-        db.delete(vehicle)
-        db.commit()
+        if is_fresh():
+            return
+        # Ningún lock de hilo se sostiene durante la lectura: con DB_ASYNC esto
+        # corre en el hilo del event loop (run_sync) y la consulta le cede el
+        # control. Si ya hay una reconstrucción en curso y existe un índice
+        # anterior, se sirve el anterior en vez de leer la tabla otra vez.
+        global _search_index_building
+        with _search_index_lock:
+            if _search_index_building and _search_index.is_built:
+                return
+            _search_index_building = True
+        try:
+            stmt = select(Vehicle.id, Vehicle.marca, Vehicle.modelo, Vehicle.tipo)
+            result = db.execute(stmt.execution_options(yield_per=settings.VEHICLES_STREAM_BATCH_SIZE))
+            documents = [(row.id, f"{row.marca} {row.modelo} {row.tipo}") for row in result]
+            # rebuild arma las estructuras y las reemplaza bajo su propio lock, sin I/O
+            _search_index.rebuild(documents)
+        finally:
+            with _search_index_lock:
+                _search_index_building = False
+    
+    def _vehicle_changed(self, vehicle) -> None:
+        """Actualizar cachés e índices en memoria tras crear o modificar un vehículo."""
+        self._invalidate_vehicle_payload(vehicle.id)
+        if _search_index.is_built:
+            _search_index.add(vehicle.id, f"{vehicle.marca} {vehicle.modelo} {vehicle.tipo}")
+    
+    def _vehicle_deleted(self, vehicle_id: int) -> None:
+        """Actualizar cachés e índices en memoria tras eliminar un vehículo."""
+        self._invalidate_vehicle_payload(vehicle_id)
+        _search_index.remove(vehicle_id)
+    
+    def _change_event(self, vehicle, previous_tipo: Optional[str] = None, created: bool = False) -> tuple:
+        """
+        Evento del feed (op, data, tipos) por crear o modificar un vehículo.
+        `previous_tipo` (si el tipo cambió) avisa también a los suscriptores
+        del tipo anterior.
+        """
+        data = {"id": vehicle.id, "tipo": vehicle.tipo, "version": vehicle.version}
+        if previous_tipo is not None and previous_tipo != vehicle.tipo:
+            data["tipo_anterior"] = previous_tipo
+        data["vehiculo"] = _vehicle_dict(vehicle)
+        return ("creado" if created else "actualizado", data, (vehicle.tipo, previous_tipo))
+    
+    def _delete_event(self, vehicle_id: int, tipo: str, version: int) -> tuple:
+        """Evento del feed por eliminar un vehículo (`version`: la última que tuvo)."""
+        return ("eliminado", {"id": vehicle_id, "tipo": tipo, "version": version}, (tipo,))
+    
+    def _commit_changes(self, db: Session, events: List[tuple], version_bumps: int) -> None:
+        """
+        Confirmar la transacción de una escritura y publicar sus eventos.
         
-        return {"message": "Vehículo eliminado correctamente"}
+        En PostgreSQL los eventos van por NOTIFY a todos los workers (ver
+        database/change_notify.py): por defecto los envía después del commit
+        el publicador del worker, agrupando escrituras; con
+        CHANGE_FEED_NOTIFY_IN_TRANSACTION salen dentro de la transacción. En
+        otros motores se publican en este proceso tras el commit;
+        `version_bumps` (tipos tocados en el resumen) le permite al vigilante
+        de versiones reconocer las escrituras propias.
+        """
+        if uses_notify(db):
+            if settings.CHANGE_FEED_NOTIFY_IN_TRANSACTION:
+                notify_changes(db, events)
+                db.commit()
+            else:
+                db.commit()
+                notify_publisher.submit(events)
+            return
+        change_feed.publish_committed(
+            db.commit, events, version_bumps, ordered=not db.get_bind().dialect.is_async
+        )
+    
+    def announce_reload(self, db: Session) -> None:
+        """Pedir a todos los suscriptores del feed que recarguen el listado."""
+        self._commit_changes(db, [(RELOAD, {}, ())], 0)
     
     def get_vehicle_stats(self, db: Session) -> VehicleStats:
-        """Obtener estadísticas de vehículos."""
-        # Contar total de vehículos
-        total = db.query(Vehicle).count()
+        """Obtener estadísticas de vehículos desde el resumen por tipo."""
+        rows = db.execute(lambda_stmt(lambda: (
+            select(VehicleTypeStats.tipo, VehicleTypeStats.total, VehicleTypeStats.kilometraje_total)
+            .where(VehicleTypeStats.total > 0)
+            .order_by(VehicleTypeStats.tipo)
+        ))).all()
         
+        total = sum(r.total for r in rows)
         if total == 0:
             return VehicleStats(promedio_kilometraje=0.0, total_vehiculos=0)
         
-        # Calcular promedio de kilometraje
-        avg_km = db.query(func.avg(Vehicle.kilometraje)).scalar()
-        
+        km_total = sum(r.kilometraje_total for r in rows)
         return VehicleStats(
-            promedio_kilometraje=round(float(avg_km), 2),
-            total_vehiculos=total
+            promedio_kilometraje=round(km_total / total, 2),
+            total_vehiculos=total,
+            por_tipo=[VehicleTypeStat(
+                tipo=r.tipo,
+                promedio_kilometraje=round(r.kilometraje_total / r.total, 2),
+                total_vehiculos=r.total
+            ) for r in rows]
+        )
+    
+    def backfill_stats_if_empty(self, db: Session) -> bool:
+        """
+        Reconstruir el resumen si está vacío pero hay vehículos: una base
+        creada con create_all y marcada con `alembic stamp head` se saltó la
+        migración que lo llena. Retorna si se reconstruyó.
+        """
+        if db.execute(select(VehicleTypeStats.tipo).limit(1)).first() is not None:
+            return False
+        if db.execute(select(Vehicle.id).limit(1)).first() is None:
+            return False
+        self.reconcile_stats(db)
+        return True
+    
+    def reconcile_stats(self, db: Session, apply: bool = True) -> List[dict]:
+        """
+        Comparar el resumen de estadísticas con la tabla de vehículos.
+        
+        Retorna las diferencias encontradas; con `apply=True` reconstruye el
+        resumen completo a partir de `vehicles` en una sola transacción.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            # Bloquea escrituras concurrentes al resumen mientras se recalcula
+            db.execute(text("LOCK TABLE vehicle_type_stats IN EXCLUSIVE MODE"))
+        
+        actual = {
+            tipo: (total, float(km or 0.0))
+            for tipo, total, km in db.query(
+                Vehicle.tipo, func.count(Vehicle.id), func.sum(Vehicle.kilometraje)
+            ).group_by(Vehicle.tipo)
+        }
+        stored = {}
+        versions = {}
+        for r in db.execute(select(
+            VehicleTypeStats.tipo, VehicleTypeStats.total, VehicleTypeStats.kilometraje_total, VehicleTypeStats.version
+        )):
+            stored[r.tipo] = (r.total, r.kilometraje_total)
+            versions[r.tipo] = r.version
+        
+        differences = []
+        for tipo in sorted(set(actual) | set(stored)):
+            expected = actual.get(tipo, (0, 0.0))
+            current = stored.get(tipo, (0, 0.0))
+            if expected[0] != current[0] or abs(expected[1] - current[1]) > 1e-6:
+                differences.append({
+                    "tipo": tipo,
+                    "esperado": {"total": expected[0], "kilometraje_total": expected[1]},
+                    "actual": {"total": current[0], "kilometraje_total": current[1]},
+                })
+        
+        if apply:
+            # Las versiones se conservan (y avanzan) para invalidar los listados cacheados
+            db.query(VehicleTypeStats).delete(synchronize_session=False)
+            db.add_all([
+                VehicleTypeStats(
+                    tipo=tipo,
+                    total=actual.get(tipo, (0, 0.0))[0],
+                    kilometraje_total=actual.get(tipo, (0, 0.0))[1],
+                    version=versions.get(tipo, 0) + 1
+                )
+                for tipo in set(actual) | set(versions)
+            ])
+            db.commit()
+        
+        return differences
+    
+    def bulk_insert_vehicles(self, rows: List[dict], db: Session) -> int:
+        """
+        Insertar un lote de vehículos ya validados en una sola transacción.
+        
+        Usa COPY en PostgreSQL con psycopg2 (si VEHICLES_BULK_USE_COPY está
+        activo) y un INSERT multi-fila en el resto de los casos.
+        """
+        deltas = {}
+        for row in rows:
+            self._add_stats_delta(deltas, row["tipo"], 1, row["kilometraje"])
+        
+        try:
+            if self._can_copy(db):
+                self._copy_vehicles(rows, db)
+            else:
+                db.execute(insert(Vehicle), rows)
+            self._apply_stats_deltas(db, deltas)
+            # Sin eventos por fila: bulk_ingest_async anuncia `recargar` al terminar
+            self._commit_changes(db, [], len(deltas))
+        except Exception:
+            db.rollback()
+            raise
+        
+        # Los IDs asignados no se conocen: el índice en memoria se reconstruye
+        _search_index.invalidate()
+        return len(rows)
+    
+    def _can_copy(self, db: Session) -> bool:
+        """Indica si el lote puede cargarse con COPY."""
+        dialect = db.get_bind().dialect
+        return (
+            settings.VEHICLES_BULK_USE_COPY
+            and dialect.name == "postgresql"
+            and dialect.driver == "psycopg2"
         )
+    
+    def _copy_vehicles(self, rows: List[dict], db: Session) -> None:
+        """Cargar filas con COPY ... FROM STDIN dentro de la transacción de la sesión."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                "\\N" if row[column] is None else row[column]
+                for column in _BULK_COLUMNS
+            ])
+        buffer.seek(0)
+        
+        copy_sql = (
+            "COPY vehicles (marca, modelo, \"año\", tipo, kilometraje, imagen_url) "
+            "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        dbapi_error = db.get_bind().dialect.dbapi.Error
+        raw_connection = db.connection().connection
+        cursor = raw_connection.cursor()
+        try:
+            cursor.copy_expert(copy_sql, buffer)
+        except dbapi_error as e:
+            raise DBAPIError.instance(copy_sql, None, e, dbapi_error)
+        finally:
+            cursor.close()
+    
+    def _add_stats_delta(self, deltas: dict, tipo: str, count: int, km: float) -> None:
+        """Acumular un cambio de estadísticas para un tipo."""
+        prev_count, prev_km = deltas.get(tipo, (0, 0.0))
+        deltas[tipo] = (prev_count + count, prev_km + km)
+    
+    def _apply_stats_deltas(self, db: Session, deltas: dict) -> None:
+        """
+        Aplicar cambios (cantidad, kilometraje) al resumen por tipo dentro de la
+        transacción actual. Los tipos se procesan ordenados para evitar deadlocks.
+        
+        Cada tipo tocado incrementa su `version`, aunque el cambio sea (0, 0.0):
+        así la suma de versiones cambia con toda escritura de vehículos.
+        """
+        dialect = db.get_bind().dialect.name
+        for tipo in sorted(deltas):
+            count, km = deltas[tipo]
+            if dialect in ("postgresql", "sqlite"):
+                insert_stmt = (pg_insert if dialect == "postgresql" else sqlite_insert)(VehicleTypeStats)
+                stmt = insert_stmt.values(tipo=tipo, total=count, kilometraje_total=km, version=1)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[VehicleTypeStats.tipo],
+                    set_={
+                        "total": VehicleTypeStats.total + stmt.excluded.total,
+                        "kilometraje_total": VehicleTypeStats.kilometraje_total + stmt.excluded.kilometraje_total,
+                        "version": VehicleTypeStats.version + 1,
+                    }
+                )
+                db.execute(stmt)
+                continue
+            
+            updated = db.execute(
+                update(VehicleTypeStats)
+                .where(VehicleTypeStats.tipo == tipo)
+                .values(
+                    total=VehicleTypeStats.total + count,
+                    kilometraje_total=VehicleTypeStats.kilometraje_total + km,
+                    version=VehicleTypeStats.version + 1
+                )
+            ).rowcount
+            if not updated:
+                db.execute(insert(VehicleTypeStats).values(tipo=tipo, total=count, kilometraje_total=km, version=1))
+    
+    # Versiones asíncronas: no bloquean el event loop (ver database.db.run_db)
+    
+    async def create_vehicle_async(self, vehicle_data: VehicleCreate, db) -> VehicleResponse:
+        """Crear un nuevo vehículo (async; con VEHICLES_GROUP_COMMIT se agrupa con otras altas)."""
+        if settings.VEHICLES_GROUP_COMMIT:
+            # Devolver al pool la conexión que el request pudo tomar al autenticar:
+            # el lote usa su propia sesión y no debe esperar conexiones retenidas
+            principal = db.info.get("principal")
+            if isinstance(db, AsyncSession):
+                await db.close()
+            else:
+                db.close()
+            vehicle = await self._create_batcher.submit(vehicle_data)
+            mark_recent_write(principal)
+            return vehicle
+        return await run_db(db, self.create_vehicle, vehicle_data)
+    
+    async def _flush_create_batch(self, vehicles: List[VehicleCreate]) -> List[Union[VehicleResponse, Exception]]:
+        """Insertar un lote de altas con una sesión propia (la del request puede cerrarse antes)."""
+        return await run_on_primary(self.create_vehicles_batch, vehicles)
+    
+    async def shutdown_async(self) -> None:
+        """Insertar las altas agrupadas pendientes antes de apagar."""
+        await self._create_batcher.close()
+    
+    async def bulk_ingest_async(self, chunks: AsyncIterator[bytes], formato: str, db) -> BulkInsertReport:
+        """
+        Cargar vehículos desde un cuerpo CSV/NDJSON recibido en streaming.
+        
+        Valida cada fila con VehicleCreate, inserta en lotes de
+        VEHICLES_BULK_CHUNK_SIZE y reporta los errores por número de línea.
+        """
+        start = time.perf_counter()
+        inserted = 0
+        rejected = 0
+        errors: List[BulkRowError] = []
+        batch: List[dict] = []
+        batch_lines: List[int] = []
+        
+        def add_error(line_no: int, message: str) -> None:
+            nonlocal rejected
+            rejected += 1
+            if len(errors) < settings.VEHICLES_BULK_MAX_ERRORS:
+                errors.append(BulkRowError(fila=line_no, error=message))
+        
+        async def flush() -> None:
+            nonlocal inserted
+            try:
+                inserted += await run_db(db, self.bulk_insert_vehicles, list(batch))
+            except SQLAlchemyError as e:
+                message = str(getattr(e, "orig", None) or e).splitlines()[0]
+                for line_no in batch_lines:
+                    add_error(line_no, f"Error de base de datos: {message}")
+            batch.clear()
+            batch_lines.clear()
+        
+        async for line_no, record, error in iter_records(chunks, formato):
+            if error is None:
+                try:
+                    vehicle = VehicleCreate.model_validate(record)
+                except ValidationError as e:
+                    error = "; ".join(
+                        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                        for err in e.errors()
+                    )
+            if error is not None:
+                add_error(line_no, error)
+                continue
+            
+            batch.append(vehicle.model_dump())
+            batch_lines.append(line_no)
+            if len(batch) >= settings.VEHICLES_BULK_CHUNK_SIZE:
+                await flush()
+        
+        if batch:
+            await flush()
+        if inserted:
+            # Sin un evento por fila: los suscriptores recargan el listado
+            await run_db(db, self.announce_reload)
+        
+        elapsed = time.perf_counter() - start
+        return BulkInsertReport(
+            insertados=inserted,
+            rechazados=rejected,
+            errores=errors,
+            segundos=round(elapsed, 3),
+            filas_por_segundo=round(inserted / elapsed, 1) if elapsed > 0 else 0.0
+        )
+    
+    async def get_vehicles_page_async(
+        self,
+        db,
+        tipo: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Obtener una página de vehículos (async)."""
+        return await run_db(db, self.get_vehicles_page, tipo=tipo, limit=limit, after=after)
+    
+    async def get_vehicles_page_body_async(
+        self,
+        db,
+        tipo: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        accept_gzip: bool = False
+    ) -> Tuple[bytes, Optional[str], bool]:
+        """Obtener una página del listado ya serializada (async)."""
+        return await run_db(
+            db, self.get_vehicles_page_body, tipo=tipo, limit=limit, after=after, accept_gzip=accept_gzip
+        )
+    
+    async def get_vehicle_facets_async(self, db, tipo: Optional[str] = None) -> dict:
+        """Obtener los conteos por faceta (async, sin E/S si están en caché)."""
+        cached = _facets_cache.get((tipo or "").lower())
+        if cached is not None:
+            return cached
+        return await run_db(db, self.get_vehicle_facets, tipo=tipo)
+    
+    async def search_vehicles_async(
+        self,
+        q: str,
+        db,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> VehicleSearchPage:
+        """Buscar vehículos (async)."""
+        return await run_db(db, self.search_vehicles, q, limit=limit, offset=offset)
+    
+    async def get_vehicle_by_id_async(self, vehicle_id: int, db) -> VehicleResponse:
+        """Obtener un vehículo por ID (async)."""
+        return await run_db(db, self.get_vehicle_by_id, vehicle_id)
+    
+    async def get_vehicle_payload_async(self, vehicle_id: int, db) -> Tuple[bytes, str]:
+        """Obtener un vehículo serializado y su ETag (async; un acierto reciente no sale del loop)."""
+        fresh = self._fresh_vehicle_payload(vehicle_id, db.info.get("principal"))
+        if fresh is not None:
+            return fresh
+        return await run_db(db, self.get_vehicle_payload, vehicle_id)
+    
+    async def update_vehicle_async(self, vehicle_id: int, vehicle_data: VehicleUpdate, db) -> VehicleResponse:
+        """Actualizar un vehículo existente (async)."""
+        return await run_db(db, self.update_vehicle, vehicle_id, vehicle_data)
+    
+    async def patch_vehicle_async(self, vehicle_id: int, vehicle_data: VehiclePatch, db) -> VehicleResponse:
+        """Actualizar solo los campos enviados (async)."""
+        return await run_db(db, self.patch_vehicle, vehicle_id, vehicle_data)
+    
+    async def delete_vehicle_async(self, vehicle_id: int, db) -> dict:
+        """Eliminar un vehículo (async)."""
+        return await run_db(db, self.delete_vehicle, vehicle_id)
+    
+    async def batch_get_vehicles_async(self, ids: List[int], db) -> VehicleBatchResult:
+        """Obtener varios vehículos (async)."""
+        return await run_db(db, self.batch_get_vehicles, ids)
+    
+    async def batch_update_vehicles_async(self, items: List[VehicleBatchUpdateItem], db) -> VehicleBatchResult:
+        """Actualizar varios vehículos (async)."""
+        return await run_db(db, self.batch_update_vehicles, items)
+    
+    async def batch_delete_vehicles_async(self, ids: List[int], db) -> VehicleBatchResult:
+        """Eliminar varios vehículos (async)."""
+        return await run_db(db, self.batch_delete_vehicles, ids)
+    
+    async def get_vehicle_stats_async(self, db) -> VehicleStats:
+        """Obtener estadísticas de vehículos (async)."""
+        if not self._stats_backfill_checked:
+            self._stats_backfill_checked = True
+            if await run_on_primary(self.backfill_stats_if_empty):
+                # Una réplica todavía no tiene el resumen recién llenado
+                return await run_on_primary(self.get_vehicle_stats)
+        return await run_db(db, self.get_vehicle_stats)
 
 # Instancia global del controlador
 vehicle_controller = VehicleController()
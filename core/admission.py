@@ -0,0 +1,148 @@
+import hashlib
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+from typing import Optional
+from fastapi import HTTPException, status
+from database.pool_stats import pool_wait_pressure
+from .config import settings
+from .metrics import registry
+from .serialization import FastJSONResponse
+
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Peticiones rechazadas por el control de admisión", ("reason",)
+)
+
+class TokenBucketLimiter:
+    """
+    Límite de peticiones por cliente con token bucket: `rate` tokens por
+    segundo y hasta `burst` acumulados.
+
+    Los buckets viven en memoria compartida entre los workers (un mmap
+    anónimo y un lock creados al importar en el maestro, con preload_app, que
+    los workers heredan al hacer fork): el límite es por cliente y no por
+    worker. Cada ranura guarda el hash de 64 bits de su cliente; un cliente
+    busca la suya entre `_PROBES` ranuras consecutivas (open addressing) y, si
+    no está, toma una vacía o cuyo bucket ya se rellenó (equivale a uno
+    nuevo). Si todas están ocupadas reinicia la de actualización más vieja:
+    dos clientes nunca comparten cuota, y un cliente desalojado solo puede
+    recibir una ráfaga de más cuando hay más clientes activos que ranuras
+    (RATE_LIMIT_SLOTS).
+    """
+
+    _SLOT = struct.Struct("Qdd")  # (hash del cliente, tokens, momento de la última actualización)
+    _PROBES = 8
+
+    def __init__(self, rate: float, burst: int, slots: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.slots = max(slots, 1)
+        self._map = mmap.mmap(-1, self.slots * self._SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Consumir un token: retorna 0 si se admite o los segundos hasta el próximo token."""
+        if self.rate <= 0:
+            return 0.0
+        # 0 marca una ranura vacía
+        fingerprint = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big") or 1
+        now = time.time()
+        with self._lock:
+            offset = self._find_slot(fingerprint, now)
+            owner, tokens, updated = self._SLOT.unpack_from(self._map, offset)
+            if owner != fingerprint:
+                tokens, updated = float(self.burst), now
+            tokens = min(float(self.burst), tokens + max(now - updated, 0.0) * self.rate)
+            if tokens >= 1:
+                self._SLOT.pack_into(self._map, offset, fingerprint, tokens - 1, now)
+                return 0.0
+            self._SLOT.pack_into(self._map, offset, fingerprint, tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _find_slot(self, fingerprint: int, now: float) -> int:
+        """Offset de la ranura del cliente, o de la que pasa a ocupar (llamar con el lock tomado)."""
+        start = fingerprint % self.slots
+        free = oldest = None
+        oldest_updated = math.inf
+        for probe in range(min(self._PROBES, self.slots)):
+            offset = ((start + probe) % self.slots) * self._SLOT.size
+            owner, tokens, updated = self._SLOT.unpack_from(self._map, offset)
+            if owner == fingerprint:
+                return offset
+            if free is None and (owner == 0 or tokens + (now - updated) * self.rate >= self.burst):
+                free = offset
+            if updated < oldest_updated:
+                oldest, oldest_updated = offset, updated
+        return free if free is not None else oldest
+
+rate_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_PER_SECOND,
+    settings.RATE_LIMIT_BURST,
+    settings.RATE_LIMIT_SLOTS
+)
+
+def enforce_rate_limit(subject: str) -> None:
+    """Responder 429 con Retry-After si el cliente agotó su cuota."""
+    wait = rate_limiter.acquire(subject)
+    if wait > 0:
+        ADMISSION_REJECTED.inc("rate_limit")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas peticiones, intente más tarde",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+# Peticiones no prioritarias en curso en este proceso
+_in_flight = 0
+
+registry.callback(
+    "admission_in_flight",
+    "Peticiones no prioritarias en curso",
+    "gauge",
+    lambda: [f"admission_in_flight {_in_flight}"]
+)
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que rechaza con 503 y Retry-After las peticiones que
+    llegan cuando el servicio está saturado, en lugar de encolarlas a la
+    espera de una conexión: con más de ADMISSION_MAX_IN_FLIGHT peticiones en
+    curso o cuando la espera por el pool supera ADMISSION_POOL_WAIT_MS.
+    Las rutas prioritarias (ADMISSION_PRIORITY_PATHS) siempre se atienden.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.priority_paths = settings.admission_priority_paths
+
+    def _rejection_reason(self) -> Optional[str]:
+        if settings.ADMISSION_MAX_IN_FLIGHT and _in_flight >= settings.ADMISSION_MAX_IN_FLIGHT:
+            return "in_flight"
+        if settings.ADMISSION_POOL_WAIT_MS and pool_wait_pressure() * 1000 >= settings.ADMISSION_POOL_WAIT_MS:
+            return "pool_wait"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.priority_paths:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._rejection_reason()
+        if reason is not None:
+            ADMISSION_REJECTED.inc(reason)
+            response = FastJSONResponse(
+                {"detail": "Servidor ocupado, intente nuevamente"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        global _in_flight
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
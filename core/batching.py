@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+from .metrics import registry
+
+BATCH_SIZE = registry.histogram(
+    "group_commit_batch_size", "Elementos procesados por lote de group commit", ("batcher",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+class GroupCommitBatcher:
+    """
+    Agrupa llamadas concurrentes en lotes (group commit).
+
+    Cada `submit` encola un elemento y espera su resultado. El lote se procesa
+    cuando pasan `max_delay` segundos desde el primer elemento encolado o al
+    llegar a `max_size` elementos. `flush` recibe la lista de elementos y debe
+    retornar un resultado por elemento, en el mismo orden; si un resultado es
+    una excepción, se lanza solo en la llamada correspondiente.
+
+    Vive en el event loop del worker: no coordina entre procesos.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_delay: float,
+        max_size: int
+    ):
+        self.name = name
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self._flush = flush
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Encolar un elemento y esperar su resultado."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        # Si el llamador se cancela, el elemento se procesa igual con su lote
+        return await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        # Mantener la referencia hasta que termine (el loop solo guarda referencias débiles)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Procesar lo que quede encolado y esperar los lotes en curso (al apagar)."""
+        self._start_flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        BATCH_SIZE.observe(self.name, value=len(batch))
+        try:
+            results = await self._flush([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,280 @@
+"""
+Feed de cambios en memoria del proceso.
+
+Cada escritura de vehículos produce un evento compacto y los suscriptores
+(SSE o WebSocket) lo reciben sin volver a consultar la base. Los últimos
+CHANGE_FEED_BUFFER_SIZE eventos se conservan para que un cliente que se
+reconecta retome desde el último que vio; un ID que ya no se puede
+reconstruir se responde con un evento `recargar` (el cliente debe volver a
+pedir el listado completo).
+
+Con PostgreSQL los eventos llegan a todos los workers por LISTEN/NOTIFY
+(database/change_notify.py) numerados con una secuencia de la base: el ID es
+el mismo en todos los workers y un cliente retoma en cualquiera. Con otros
+motores cada proceso publica sus propias escrituras con `publish_committed`,
+con IDs `<época>-<secuencia>` propios del proceso, y un vigilante de la
+versión de la tabla publica `recargar` cuando la base avanza por escrituras
+ajenas.
+"""
+import asyncio
+import secrets
+import threading
+from collections import deque
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Iterable, Optional, Set, Tuple
+from .config import settings
+from .metrics import registry
+from .serialization import dumps
+
+CHANGE_FEED_EVENTS = registry.counter(
+    "change_feed_events_total", "Eventos publicados en el feed de cambios", ("op",)
+)
+CHANGE_FEED_RELOADS = registry.counter(
+    "change_feed_reloads_total", "Eventos recargar enviados a suscriptores", ("reason",)
+)
+
+RELOAD = "recargar"
+
+class ChangeEvent:
+    """Evento publicado, serializado una sola vez para todos los suscriptores."""
+
+    __slots__ = ("seq", "id", "op", "tipos", "data")
+
+    def __init__(self, seq: int, id: str, op: str, tipos: tuple, data: bytes):
+        self.seq = seq
+        self.id = id
+        self.op = op
+        # Tipos afectados en minúsculas (vacío = afecta a todos)
+        self.tipos = tipos
+        self.data = data
+
+    def sse(self) -> bytes:
+        """Evento en formato text/event-stream."""
+        return b"id: %s\nevent: %s\ndata: %s\n\n" % (self.id.encode(), self.op.encode(), self.data)
+
+class _Subscriber:
+    """Cola de un suscriptor, atada al event loop donde se suscribió."""
+
+    __slots__ = ("loop", "queue", "tipo", "lagged")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int, tipo: Optional[str]):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.tipo = tipo.lower() if tipo else None
+        self.lagged = False
+
+    def matches(self, event: ChangeEvent) -> bool:
+        """Mismo criterio que el filtro `tipo` del listado (contiene, sin distinguir mayúsculas)."""
+        if self.tipo is None or not event.tipos:
+            return True
+        return any(self.tipo in tipo for tipo in event.tipos)
+
+    def deliver(self, event: ChangeEvent) -> None:
+        """Encolar un evento (en el loop del suscriptor); si la cola está llena queda atrasado."""
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+class ChangeBroadcaster:
+    """
+    Difusor de eventos a suscriptores asíncronos.
+
+    `publish` se puede llamar desde cualquier hilo (los controladores corren
+    en el threadpool); cada evento se entrega en el loop del suscriptor con
+    call_soon_threadsafe. Un suscriptor que acumula más de `queue_size`
+    eventos sin consumir recibe `recargar` en lugar de bloquear a los demás.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.reset_after_fork()
+
+    def reset_after_fork(self) -> None:
+        """Época, secuencia y suscriptores propios del proceso (el buffer del padre no aplica)."""
+        self.epoch = secrets.token_hex(4)
+        # IDs compartidos entre workers (secuencia de la base), desde reset_stream
+        self.shared_ids = False
+        self._seq = 0
+        # El buffer tiene todos los eventos posteriores a esta secuencia
+        self._complete_after = 0
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._subscribers: Set[_Subscriber] = set()
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._commits_in_flight = 0
+        self._own_versions = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _event_id(self, seq: int) -> str:
+        return str(seq) if self.shared_ids else f"{self.epoch}-{seq}"
+
+    def publish(self, op: str, data: dict, tipos: Iterable[Optional[str]] = (), seq: Optional[int] = None) -> None:
+        """
+        Publicar un evento que afecta a los `tipos` dados (vacío = a todos).
+        `seq` es el ID común a todos los workers de un evento recibido por
+        NOTIFY; sin él, el evento se numera en el proceso.
+        """
+        tipos = tuple({tipo.lower() for tipo in tipos if tipo})
+        with self._lock:
+            self._seq = self._seq + 1 if seq is None else seq
+            event_id = self._event_id(self._seq)
+            event = ChangeEvent(self._seq, event_id, op, tipos, dumps({"evento": event_id, "op": op, **data}))
+            if len(self._buffer) == self._buffer.maxlen:
+                self._complete_after = self._buffer[0].seq
+            self._buffer.append(event)
+            self._deliver(event)
+        CHANGE_FEED_EVENTS.inc(op)
+
+    def reset_stream(self, seq: int, reason: str) -> None:
+        """
+        Retomar con IDs compartidos después de `seq` (el último ID asignado
+        en la base), descartando el buffer: faltan eventos anteriores
+        (arranque, reconexión de LISTEN o un hueco en la secuencia). Los
+        suscriptores conectados reciben `recargar`.
+        """
+        with self._lock:
+            self.shared_ids = True
+            self._seq = seq
+            self._complete_after = seq
+            self._buffer.clear()
+            if self._subscribers:
+                self._deliver(self._reload_event(seq, reason))
+
+    def _deliver(self, event: ChangeEvent) -> None:
+        """Entregar un evento a los suscriptores interesados (con self._lock tomado)."""
+        for subscriber in list(self._subscribers):
+            if not subscriber.matches(event):
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+            except RuntimeError:
+                # Loop cerrado: el suscriptor ya no existe
+                self._subscribers.discard(subscriber)
+
+    def publish_committed(
+        self,
+        commit: Callable[[], None],
+        events: Iterable[tuple],
+        version_bumps: int,
+        ordered: bool = True
+    ) -> None:
+        """
+        Confirmar una escritura del proceso con `commit` y publicar sus
+        eventos (op, data, tipos), para motores sin NOTIFY.
+
+        Con `ordered`, commit y publicación se hacen bajo un mismo lock y los
+        eventos salen en el orden de los commits (no usar si `commit` cede el
+        event loop: con sesiones asíncronas corre en el hilo del loop).
+        `version_bumps` es cuánto avanzó la versión de la tabla en la
+        transacción; ver `local_writes`.
+        """
+        with self._commit_lock if ordered else nullcontext():
+            with self._lock:
+                self._commits_in_flight += 1
+            try:
+                commit()
+                with self._lock:
+                    self._own_versions += version_bumps
+            finally:
+                with self._lock:
+                    self._commits_in_flight -= 1
+            for op, data, tipos in events:
+                self.publish(op, data, tipos)
+
+    def local_writes(self) -> Tuple[int, int]:
+        """Commits en curso y versiones de la tabla sumadas por las escrituras de este proceso."""
+        with self._lock:
+            return self._commits_in_flight, self._own_versions
+
+    def _reload_event(self, seq: int, reason: str) -> ChangeEvent:
+        """Evento `recargar` con el ID desde el que retomar después de recargar."""
+        CHANGE_FEED_RELOADS.inc(reason)
+        event_id = self._event_id(seq)
+        return ChangeEvent(seq, event_id, RELOAD, (), dumps({"evento": event_id, "op": RELOAD}))
+
+    def _backlog(self, last_event_id: str) -> Optional[Tuple[list, int]]:
+        """
+        Eventos posteriores a `last_event_id` y la secuencia desde la que
+        sigue el suscriptor, o None si no se pueden reconstruir.
+        """
+        if self.shared_ids:
+            seq = last_event_id
+        else:
+            epoch, _, seq = last_event_id.partition("-")
+            if epoch != self.epoch:
+                return None
+        if not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self._seq:
+            # Con IDs compartidos el cliente pudo venir de un worker que
+            # recibió el aviso unos milisegundos antes que este
+            return ([], seq) if self.shared_ids else None
+        if seq < self._complete_after:
+            return None
+        return [event for event in self._buffer if event.seq > seq], self._seq
+
+    async def subscribe(
+        self,
+        tipo: Optional[str] = None,
+        last_event_id: Optional[str] = None,
+        heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[ChangeEvent]]:
+        """
+        Iterar los eventos que afectan a `tipo`, empezando después de
+        `last_event_id` si se indica. Produce None cada `heartbeat` segundos
+        sin eventos, para que el transporte envíe un latido.
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop(), self.queue_size, tipo)
+        with self._lock:
+            # Registrar y copiar el buffer juntos: ningún evento queda entre ambos
+            self._subscribers.add(subscriber)
+            last_seq = self._seq
+            backlog = self._backlog(last_event_id) if last_event_id else ([], last_seq)
+        try:
+            if backlog is None:
+                yield self._reload_event(last_seq, "resume")
+            else:
+                events, last_seq = backlog
+                for event in events:
+                    if subscriber.matches(event):
+                        yield event
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if subscriber.lagged:
+                    # Descartar lo pendiente: el cliente recarga y sigue desde aquí
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    last_seq = self._seq
+                    subscriber.lagged = False
+                    yield self._reload_event(last_seq, "lagged")
+                    continue
+                # `recargar` de reset_stream siempre pasa: la secuencia pudo retroceder
+                if event.seq <= last_seq and event.op != RELOAD:
+                    continue
+                last_seq = event.seq
+                yield event
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+change_feed = ChangeBroadcaster(settings.CHANGE_FEED_BUFFER_SIZE, settings.CHANGE_FEED_QUEUE_SIZE)
+
+registry.callback(
+    "change_feed_subscribers",
+    "Suscriptores conectados al feed de cambios",
+    "gauge",
+    lambda: [f"change_feed_subscribers {change_feed.subscriber_count}"]
+)
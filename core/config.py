@@ -7,6 +7,47 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Hashing de contraseñas (bcrypt) fuera del event loop
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" o "process"
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # None = número de CPUs
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    
+    # Caché de autenticación (claims del JWT y usuario autenticado)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Control de admisión: límite por cliente (`sub` del JWT, token bucket de
+    # RATE_LIMIT_PER_SECOND con ráfagas de RATE_LIMIT_BURST, compartido entre
+    # los workers de gunicorn en RATE_LIMIT_SLOTS ranuras de 24 bytes; 0
+    # desactiva) y
+    # rechazo rápido con 503 cuando hay demasiadas peticiones en curso o la
+    # espera por una conexión del pool supera ADMISSION_POOL_WAIT_MS.
+    # Las rutas de ADMISSION_PRIORITY_PATHS nunca se rechazan por carga ni
+    # cuentan como en curso (el feed de cambios mantiene conexiones abiertas).
+    RATE_LIMIT_PER_SECOND: float = 0.0
+    RATE_LIMIT_BURST: int = 50
+    RATE_LIMIT_SLOTS: int = 65536
+    ADMISSION_MAX_IN_FLIGHT: int = 0  # 0 = sin límite
+    ADMISSION_POOL_WAIT_MS: float = 1000.0  # 0 = no mirar el pool
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    ADMISSION_PRIORITY_PATHS: str = "/,/auth/me,/metrics,/internal/pool,/internal/replicas,/vehiculos/cambios"
+    
+    # Métricas Prometheus en /metrics (METRICS_TOKEN exige "Authorization: Bearer <token>")
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+    # Directorio donde cada worker de gunicorn escribe sus métricas para que
+    # /metrics sume las de todos (gunicorn.conf.py usa uno temporal si falta)
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    
+    # Modo multiproceso (gunicorn.conf.py): WEB_CONCURRENCY=None calcula los
+    # workers según los CPUs y DB_MAX_CONNECTIONS (conexiones que admite la base)
+    WEB_CONCURRENCY: Optional[int] = None
+    SCHEMA_CHECK_ON_STARTUP: bool = True  # verificar/migrar el esquema antes de crear los workers
+    WORKER_MAX_REQUESTS: int = 10000
+    WORKER_MAX_REQUESTS_JITTER: int = 1000
+    DB_MAX_CONNECTIONS: Optional[int] = None
+    
     # Configuración CORS (será parseado desde string separado por comas)
     CORS_ORIGINS: str = "*"
     
@@ -30,10 +71,130 @@ class Settings(BaseSettings):
     @property
     def database_url(self) -> str:
         """Construir URL de base de datos desde componentes o usar DATABASE_URL directamente."""
-        if self.DATABASE_URL and "postgresql" in self.DATABASE_URL:
+        # SQLite se acepta para desarrollo local y benchmarks
+        if self.DATABASE_URL and ("postgresql" in self.DATABASE_URL or self.DATABASE_URL.startswith("sqlite")):
             return self.DATABASE_URL
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
     
+    # Paginación del listado de vehículos
+    VEHICLES_PAGE_SIZE: int = 100
+    VEHICLES_MAX_PAGE_SIZE: int = 1000
+    VEHICLES_STREAM_BATCH_SIZE: int = 1000
+    
+    # Respuestas serializadas del listado (GET /vehiculos) por filtro, página y
+    # versión de la tabla; acotadas en bytes (0 desactiva). Los cuerpos de al
+    # menos VEHICLES_LIST_GZIP_MIN_BYTES se envían en gzip si el cliente lo acepta
+    VEHICLES_LIST_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    VEHICLES_LIST_GZIP_MIN_BYTES: int = 1024
+    
+    # Conteos por faceta del listado (GET /vehiculos?facetas=true)
+    VEHICLE_FACETS_CACHE_TTL_SECONDS: float = 10.0
+    VEHICLE_FACETS_CACHE_MAX_ENTRIES: int = 256
+    VEHICLE_FACETS_YEAR_BUCKET: int = 5
+    VEHICLE_FACETS_MAX_VALUES: int = 50
+    
+    # Caché de lectura de vehículos individuales (GET /vehiculos/{id}): un
+    # acierto no consulta la base durante REVALIDATE_SECONDS (desfase máximo
+    # frente a escrituras de otros workers); luego se valida la versión de la fila
+    VEHICLE_CACHE_MAX_ENTRIES: int = 10000
+    VEHICLE_CACHE_TTL_SECONDS: int = 300
+    VEHICLE_CACHE_REVALIDATE_SECONDS: float = 2.0
+    
+    # Búsqueda de vehículos: "auto" usa pg_trgm en PostgreSQL y el índice
+    # de n-gramas en memoria en otros motores; "trigram" o "ngram" lo fuerzan
+    VEHICLES_SEARCH_BACKEND: str = "auto"
+    VEHICLES_SEARCH_INDEX_MAX_AGE_SECONDS: int = 300
+    
+    # Carga masiva de vehículos (POST /vehiculos/bulk)
+    VEHICLES_BULK_CHUNK_SIZE: int = 5000
+    VEHICLES_BULK_USE_COPY: bool = True
+    VEHICLES_BULK_MAX_ERRORS: int = 1000
+    
+    # Operaciones por lote (POST /vehiculos/batch-get, batch-update, batch-delete)
+    VEHICLES_BATCH_MAX_ITEMS: int = 1000
+    
+    # Group commit de altas (POST /vehiculos): las altas concurrentes de un
+    # worker se agrupan hasta DELAY_MS y se insertan en una sola transacción
+    VEHICLES_GROUP_COMMIT: bool = False
+    VEHICLES_GROUP_COMMIT_DELAY_MS: float = 5.0
+    VEHICLES_GROUP_COMMIT_MAX_BATCH: int = 500
+    
+    # Imágenes subidas (POST /vehiculos/{id}/imagen), servidas en /media.
+    # MEDIA_BASE_URL antepone un origen a imagen_url (vacío = URL relativa)
+    MEDIA_ROOT: str = "media"
+    MEDIA_BASE_URL: str = ""
+    MEDIA_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    MEDIA_THUMBNAIL_SIZE: int = 320
+    MEDIA_CACHE_MAX_AGE: int = 31536000  # un año: los nombres cambian si cambia el contenido
+    
+    # Feed de cambios (GET /vehiculos/cambios por SSE, /vehiculos/cambios/ws):
+    # eventos recientes guardados para retomar tras reconectar, eventos
+    # pendientes por suscriptor antes de pedirle recargar y latido de SSE.
+    # Sin PostgreSQL (LISTEN/NOTIFY), cada worker revisa la versión de la
+    # tabla cada POLL_SECONDS para avisar `recargar` ante escrituras ajenas.
+    # NOTIFY_IN_TRANSACTION emite el NOTIFY dentro de cada escritura: orden
+    # exacto de commits, pero serializa los commits de toda la base
+    CHANGE_FEED_BUFFER_SIZE: int = 1000
+    CHANGE_FEED_QUEUE_SIZE: int = 256
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = 15.0
+    CHANGE_FEED_POLL_SECONDS: float = 2.0
+    CHANGE_FEED_NOTIFY_IN_TRANSACTION: bool = False
+    
+    # Pool de conexiones (aplica a cada engine)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # segundos; -1 para no reciclar
+    DB_POOL_PRE_PING: bool = True  # False: sin ida y vuelta extra por checkout
+    
+    # Sentencias compiladas en caché por engine (SQLAlchemy) y sentencias
+    # preparadas en el servidor por conexión (solo asyncpg; 0 las desactiva,
+    # necesario detrás de pgbouncer en modo transaction)
+    DB_QUERY_CACHE_SIZE: int = 500
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    
+    # Réplicas de lectura (URLs separadas por comas). Las rutas de solo lectura
+    # usan una réplica (round-robin) salvo que el cliente haya escrito hace
+    # menos de READ_YOUR_WRITES_SECONDS (en cualquier worker: la marca vive en
+    # memoria compartida heredada del maestro); una réplica con errores de conexión
+    # queda fuera de la rotación durante REPLICA_EJECT_SECONDS.
+    # READ_YOUR_WRITES_SLOTS: ranuras de esa memoria (8 bytes cada una); dos
+    # clientes en la misma ranura solo leen del primario de más
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_EJECT_SECONDS: float = 30.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    READ_YOUR_WRITES_SLOTS: int = 65536
+    
+    # Modo asíncrono: usar AsyncSession (asyncpg) en lugar de Session síncrona
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    @property
+    def async_database_url(self) -> str:
+        """URL para el engine asíncrono (usa el driver async equivalente)."""
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        return self.to_async_url(self.database_url)
+    
+    @property
+    def admission_priority_paths(self) -> set:
+        """Convertir string de ADMISSION_PRIORITY_PATHS a conjunto."""
+        return {path.strip() for path in self.ADMISSION_PRIORITY_PATHS.split(",") if path.strip()}
+    
+    @property
+    def replica_urls(self) -> list:
+        """Convertir string de DATABASE_REPLICA_URLS a lista."""
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    
+    def to_async_url(self, url: str) -> str:
+        """Usar el driver async equivalente (asyncpg, aiosqlite) en una URL."""
+        for prefix in ("postgresql+psycopg2://", "postgresql://"):
+            if url.startswith(prefix):
+                return "postgresql+asyncpg://" + url[len(prefix):]
+        if url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+        return url
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
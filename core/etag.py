@@ -0,0 +1,15 @@
+import hashlib
+from typing import Optional
+
+def make_etag(body: bytes) -> str:
+    """ETag fuerte calculado a partir del contenido serializado."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Indica si el header If-None-Match coincide con el ETag (comparación débil)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
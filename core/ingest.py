@@ -0,0 +1,124 @@
+import codecs
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, Optional, Tuple
+
+# Content-Types aceptados por la carga masiva
+BULK_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+def detect_bulk_format(content_type: Optional[str]) -> Optional[str]:
+    """Obtener el formato ("csv" o "ndjson") a partir del Content-Type."""
+    if not content_type:
+        return None
+    return BULK_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+async def iter_lines(chunks: AsyncIterator[bytes], keepends: bool = False) -> AsyncIterator[str]:
+    """
+    Separar en líneas un cuerpo recibido en streaming, sin cargarlo entero.
+    Con `keepends` cada línea conserva su fin de línea (como un archivo de texto).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n" if keepends else line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending if keepends else pending.rstrip("\r")
+
+class _LineFeed:
+    """
+    Fuente de líneas para csv.reader que se rellena desde el stream: el
+    reader queda abierto entre registros y un campo entre comillas puede
+    abarcar varias líneas.
+    """
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, list]]:
+    """
+    Leer filas CSV desde un cuerpo en streaming, con el número de la línea
+    donde empieza cada una. Las líneas se acumulan hasta que las comillas
+    quedan balanceadas (el registro está completo) y se parsean con csv.reader.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    record_lines = []
+    quotes = 0
+    line_no = 0
+    async for line in iter_lines(chunks, keepends=True):
+        line_no += 1
+        record_lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        start = line_no - len(record_lines) + 1
+        feed.lines.extend(record_lines)
+        record_lines, quotes = [], 0
+        values = next(reader, None)
+        if values:
+            yield start, values
+    if record_lines:
+        # Comillas sin cerrar al final: csv.reader entrega lo leído
+        feed.lines.extend(record_lines)
+        values = next(reader, None)
+        if values:
+            yield line_no - len(record_lines) + 1, values
+
+async def iter_records(
+    chunks: AsyncIterator[bytes],
+    formato: str
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Leer registros CSV (con encabezado) o NDJSON desde un cuerpo en streaming.
+
+    Produce tuplas (número de línea, registro, error); exactamente uno de
+    registro o error es None. Los campos CSV vacíos se interpretan como nulos.
+    """
+    if formato == "csv":
+        header = None
+        async for line_no, values in iter_csv_rows(chunks):
+            if not any(value.strip() for value in values):
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, None, f"Se esperaban {len(header)} columnas y hay {len(values)}"
+                continue
+            yield line_no, {k: (v if v != "" else None) for k, v in zip(header, values)}, None
+        return
+
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Se esperaba un objeto JSON"
+            continue
+        yield line_no, record, None
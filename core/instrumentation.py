@@ -0,0 +1,130 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .metrics import registry
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route")
+)
+REQUEST_DB_STATEMENTS = registry.histogram(
+    "http_request_db_statements", "Sentencias SQL ejecutadas por petición", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+REQUEST_DB_TIME = registry.histogram(
+    "http_request_db_seconds", "Tiempo total en la base de datos por petición", ("route",)
+)
+DB_STATEMENT_LATENCY = registry.histogram(
+    "db_statement_duration_seconds", "Latencia de cada sentencia SQL"
+)
+
+def process_start_time() -> float:
+    """
+    Momento (epoch) en que arrancó este proceso, con precisión de centésimas
+    en Linux (/proc). En otros sistemas se usa el momento de esta importación.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # El nombre del proceso puede contener espacios: los campos siguen al último ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started_after_boot = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - (uptime - started_after_boot)
+    except (OSError, ValueError, IndexError):
+        return _IMPORTED_AT
+
+_IMPORTED_AT = time.time()
+
+# Tiempos de arranque del proceso (segundos desde que inició)
+startup_timings: Dict[str, float] = {}
+
+def record_startup(stage: str) -> float:
+    """Registrar cuánto tardó el proceso en llegar a una etapa del arranque."""
+    elapsed = time.time() - process_start_time()
+    startup_timings[stage] = elapsed
+    return elapsed
+
+registry.callback(
+    "app_startup_seconds",
+    "Segundos desde el inicio del proceso hasta cada etapa del arranque",
+    "gauge",
+    lambda: [f'app_startup_seconds{{stage="{stage}"}} {value}' for stage, value in startup_timings.items()]
+)
+
+class RequestStats:
+    """Contadores de base de datos de la petición en curso."""
+    __slots__ = ("sql_count", "sql_seconds")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+# Se propaga al threadpool y a AsyncSession.run_sync junto con el contexto
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DB_STATEMENT_LATENCY.observe(value=elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra latencia, código de estado y uso de la base
+    de datos por ruta. Usa la plantilla de la ruta (p. ej. /vehiculos/{vehiculo_id})
+    para acotar la cardinalidad de los labels.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_LATENCY.observe(method, route, value=elapsed)
+            REQUEST_DB_STATEMENTS.observe(route, value=stats.sql_count)
+            REQUEST_DB_TIME.observe(route, value=stats.sql_seconds)
+            if "first_request" not in startup_timings:
+                logging.getLogger("uvicorn.error").info(
+                    "Primera petición atendida a %.2fs del inicio del proceso",
+                    record_startup("first_request")
+                )
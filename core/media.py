@@ -0,0 +1,236 @@
+"""
+Almacenamiento local de imágenes direccionado por contenido.
+
+Cada imagen se guarda una sola vez con el SHA-256 de sus bytes como nombre
+(`<sha256>.<ext>`): subir el mismo archivo dos veces reutiliza el existente.
+Las originales van en MEDIA_ROOT/originales y las miniaturas, con el mismo
+nombre, en MEDIA_ROOT/miniaturas (repartidas en subdirectorios por los dos
+primeros caracteres del hash).
+"""
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+import anyio
+from fastapi import HTTPException, status
+from starlette.responses import Response
+from .config import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow no hay miniaturas: se sirve la imagen original
+    Image = None
+
+# Firma de los primeros bytes -> extensión
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+_PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp)$")
+_CHUNK_SIZE = 64 * 1024
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """Extensión según la firma del archivo, o None si no es una imagen soportada."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+def _media_path(kind: str, name: str) -> Optional[Path]:
+    """Ruta de un archivo por nombre; None si el nombre no es `<sha256>.<ext>` (evita rutas arbitrarias)."""
+    if not _NAME_RE.match(name):
+        return None
+    return Path(settings.MEDIA_ROOT) / kind / name[:2] / name
+
+def original_path(name: str) -> Optional[Path]:
+    """Ruta de la imagen original."""
+    return _media_path("originales", name)
+
+def thumbnail_path(name: str) -> Optional[Path]:
+    """Ruta de la miniatura."""
+    return _media_path("miniaturas", name)
+
+def media_url(name: str, thumbnail: bool = False) -> str:
+    """URL pública de una imagen (o de su miniatura)."""
+    prefix = "/media/miniaturas" if thumbnail else "/media"
+    return f"{settings.MEDIA_BASE_URL.rstrip('/')}{prefix}/{name}"
+
+def thumbnail_url(image_url: Optional[str]) -> Optional[str]:
+    """URL de la miniatura de una imagen subida a la API; None sin imagen o si es una URL externa."""
+    if not image_url:
+        return None
+    prefix = media_url("")
+    name = image_url[len(prefix):] if image_url.startswith(prefix) else ""
+    return media_url(name, thumbnail=True) if _NAME_RE.match(name) else None
+
+def store_image(source: BinaryIO) -> Tuple[str, bool]:
+    """
+    Copiar una imagen al almacenamiento calculando su hash en el camino.
+
+    Retorna el nombre (`<sha256>.<ext>`) y si el archivo es nuevo (False si
+    ya existía una copia idéntica). El archivo se escribe a un temporal y se
+    mueve con os.replace, así que nunca se sirve una imagen a medio escribir.
+    """
+    head = source.read(_CHUNK_SIZE)
+    ext = detect_image_type(head)
+    if ext is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Formato de imagen no soportado (JPEG, PNG, GIF o WebP)"
+        )
+
+    tmp_dir = Path(settings.MEDIA_ROOT) / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > settings.MEDIA_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"La imagen supera {settings.MEDIA_MAX_UPLOAD_BYTES} bytes"
+                    )
+                digest.update(chunk)
+                tmp.write(chunk)
+                chunk = source.read(_CHUNK_SIZE)
+
+        name = f"{digest.hexdigest()}.{ext}"
+        target = original_path(name)
+        if target.exists():
+            return name, False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, target)
+        return name, True
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+def make_thumbnail(name: str) -> bool:
+    """Generar la miniatura de una imagen guardada (si no existe). False si falta Pillow o la original."""
+    source, target = original_path(name), thumbnail_path(name)
+    if Image is None or source is None or not source.exists():
+        return False
+    if target.exists():
+        return True
+
+    ext = name.rsplit(".", 1)[1]
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_name = f"{target}.{os.getpid()}.tmp"
+    try:
+        with Image.open(source) as image:
+            image.thumbnail((settings.MEDIA_THUMBNAIL_SIZE, settings.MEDIA_THUMBNAIL_SIZE))
+            if ext == "jpg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(tmp_name, format=_PIL_FORMATS[ext])
+        os.replace(tmp_name, target)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+    return True
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Rango `bytes=inicio-fin` (un solo rango) como (inicio, fin inclusive).
+    None si no hay Range o tiene varios rangos (se envía el archivo completo);
+    ValueError si el rango no se puede satisfacer.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            # Sufijo: los últimos N bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        raise ValueError(header)
+    return first, last
+
+class MediaFileResponse(Response):
+    """
+    Respuesta de archivo con soporte de Range (206/416), HEAD y envío sin
+    copia (`http.response.zerocopysend`) cuando el servidor ASGI lo ofrece;
+    si no, el archivo se lee por bloques fuera del event loop.
+
+    `size` viene del stat hecho por quien la crea. El archivo se abre antes de
+    enviar los encabezados: si se borró entretanto, la respuesta es un 404.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        media_type: str,
+        size: int,
+        range_header: Optional[str] = None,
+        headers: Optional[dict] = None
+    ):
+        super().__init__(content=None, media_type=media_type, headers=headers)
+        self.path = path
+        self.headers["accept-ranges"] = "bytes"
+        self.start, self.end = 0, size - 1
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            self.status_code = status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            self.start, self.end = 0, -1
+            return
+        if byte_range is not None:
+            self.start, self.end = byte_range
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope, receive, send):
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        try:
+            f = await anyio.open_file(self.path, "rb")
+        except FileNotFoundError:
+            # Todavía no se envió nada: el manejador de excepciones responde 404
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagen no encontrada")
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            async with f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.wrapped.fileno(),
+                    "offset": self.start,
+                    "count": count,
+                })
+            return
+
+        async with f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
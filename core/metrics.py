@@ -0,0 +1,481 @@
+"""
+Métricas en formato de texto de Prometheus.
+
+Con METRICS_MULTIPROC_DIR (gunicorn.conf.py lo define si no está) los
+contadores e histogramas de cada proceso se escriben en un archivo mapeado
+en memoria dentro de ese directorio, y /metrics suma los de todos los
+workers, incluidos los ya reciclados: el scrape no depende de qué worker
+atiende. Las métricas calculadas al exponerlas (gauges del pool, del feed,
+etc.) son propias de cada proceso: cada worker publica las suyas cada
+GAUGE_SNAPSHOT_SECONDS y se exponen con el label `worker` (su pid).
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .config import settings
+
+# Buckets por defecto (segundos) para latencias
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cada cuánto publica un worker sus gauges en modo multiproceso
+GAUGE_SNAPSHOT_SECONDS = 5.0
+
+class Histogram:
+    """Histograma acumulativo de valores (p. ej. latencias), seguro entre hilos."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Registrar una observación."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def cumulative_counts(self) -> List[int]:
+        """Conteos acumulados por bucket (incluye +Inf al final)."""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        cumulative = []
+        for count in counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    @classmethod
+    def from_counts(cls, buckets: Sequence[float], counts: Sequence[int], total: float) -> "Histogram":
+        """Histograma con conteos por bucket (no acumulados, +Inf al final) y suma ya calculados."""
+        histogram = cls(buckets)
+        histogram._counts = [int(count) for count in counts]
+        histogram._sum = total
+        histogram._count = sum(histogram._counts)
+        return histogram
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Cuantil aproximado (límite superior del bucket que lo contiene)."""
+        cumulative = self.cumulative_counts()
+        if not cumulative[-1]:
+            return None
+        target = q * cumulative[-1]
+        for bound, count in zip(self.buckets, cumulative):
+            if count >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        """Resumen serializable del histograma."""
+        cumulative = self.cumulative_counts()
+        return {
+            "count": cumulative[-1],
+            "sum": round(self._sum, 6),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+class SharedValues:
+    """
+    Valores de las métricas de este proceso en `<directorio>/metrics_<pid>.db`,
+    un archivo mapeado en memoria que los demás procesos leen al exponer
+    /metrics. Cada registro es el largo de la clave (4 bytes), la clave JSON
+    (alineada a 8 bytes) y el valor (double); los primeros 8 bytes del archivo
+    indican hasta dónde hay registros completos. Tras un fork el proceso hijo
+    abre su propio archivo.
+    """
+
+    _HEADER = struct.Struct("Q")
+    _LENGTH = struct.Struct("I")
+    _VALUE = struct.Struct("d")
+    _INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._offsets: Dict[str, int] = {}
+        self._used = 0
+
+    def inc_many(self, increments: Sequence[Tuple[str, float]]) -> None:
+        """Sumar a varias claves de una vez."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            for key, amount in increments:
+                offset = self._offsets.get(key)
+                if offset is None:
+                    offset = self._add(key)
+                value = self._VALUE.unpack_from(self._map, offset)[0]
+                self._VALUE.pack_into(self._map, offset, value + amount)
+
+    def inc(self, key: str, amount: float = 1) -> None:
+        self.inc_many(((key, amount),))
+
+    def _open(self) -> None:
+        if self._map is not None:
+            # Mapeo heredado del padre: el hijo no escribe en ese archivo
+            self._map.close()
+            os.close(self._fd)
+        pid = os.getpid()
+        self._fd = os.open(os.path.join(self.directory, f"metrics_{pid}.db"), os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < self._INITIAL_SIZE:
+            os.ftruncate(self._fd, self._INITIAL_SIZE)
+            size = self._INITIAL_SIZE
+        self._map = mmap.mmap(self._fd, size)
+        # Un pid reutilizado continúa el archivo del proceso anterior
+        self._used = self._HEADER.unpack_from(self._map, 0)[0] or self._HEADER.size
+        self._offsets = dict(self._records(self._map, self._used))
+        self._pid = pid
+
+    def _add(self, key: str) -> int:
+        encoded = key.encode()
+        offset = self._used + self._aligned(self._LENGTH.size + len(encoded))
+        end = offset + self._VALUE.size
+        if end > len(self._map):
+            self._map.resize(max(len(self._map) * 2, end))
+        self._LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + self._LENGTH.size:self._used + self._LENGTH.size + len(encoded)] = encoded
+        self._VALUE.pack_into(self._map, offset, 0.0)
+        # El encabezado se actualiza al final: un lector nunca ve un registro a medias
+        self._HEADER.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = offset
+        return offset
+
+    @staticmethod
+    def _aligned(size: int) -> int:
+        return (size + 7) // 8 * 8
+
+    @classmethod
+    def _records(cls, data, used: int) -> Iterator[Tuple[str, int]]:
+        """(clave, offset del valor) de cada registro."""
+        position = cls._HEADER.size
+        while position < used:
+            length = cls._LENGTH.unpack_from(data, position)[0]
+            key = bytes(data[position + cls._LENGTH.size:position + cls._LENGTH.size + length]).decode()
+            offset = position + cls._aligned(cls._LENGTH.size + length)
+            yield key, offset
+            position = offset + cls._VALUE.size
+
+    @classmethod
+    def read_all(cls, directory: str) -> Dict[str, float]:
+        """Suma de cada clave entre los archivos de todos los procesos."""
+        totals: Dict[str, float] = {}
+        for path in glob.glob(os.path.join(directory, "metrics_*.db")):
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+            except FileNotFoundError:
+                continue
+            if len(data) < cls._HEADER.size:
+                continue
+            used = min(cls._HEADER.unpack_from(data, 0)[0], len(data))
+            for key, offset in cls._records(data, used):
+                totals[key] = totals.get(key, 0.0) + cls._VALUE.unpack_from(data, offset)[0]
+        return totals
+
+def _shared_key(name: str, labelvalues: Sequence[str], part: str = "") -> str:
+    """Clave de un valor en SharedValues: métrica, labels y parte (bucket o suma)."""
+    return json.dumps([name, [str(value) for value in labelvalues], part], ensure_ascii=False)
+
+class SharedHistogram(Histogram):
+    """Histogram que además suma cada observación en el archivo compartido del proceso."""
+
+    def __init__(self, buckets: Sequence[float], shared: SharedValues, name: str, labelvalues: Sequence[str]):
+        super().__init__(buckets)
+        self._shared = shared
+        self._bucket_keys = [_shared_key(name, labelvalues, str(index)) for index in range(len(self.buckets) + 1)]
+        self._sum_key = _shared_key(name, labelvalues, "sum")
+
+    def observe(self, value: float) -> None:
+        super().observe(value)
+        index = bisect.bisect_left(self.buckets, value)
+        self._shared.inc_many(((self._bucket_keys[index], 1), (self._sum_key, value)))
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """Formatear labels en el formato de texto de Prometheus."""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class CounterFamily:
+    """Contador con labels (monótono creciente)."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), shared: Optional[SharedValues] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._shared = shared
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        if self._shared is not None:
+            self._shared.inc(_shared_key(self.name, labelvalues), amount)
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._format(values)
+
+    def shared_samples(self, values: Dict[Tuple[tuple, str], float]) -> List[str]:
+        """Líneas a partir de los valores sumados entre procesos."""
+        return self._format({labels: value for (labels, _), value in values.items()})
+
+    def _format(self, values: Dict[tuple, float]) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+class HistogramFamily:
+    """Histograma con labels (un Histogram por combinación de valores)."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        shared: Optional[SharedValues] = None
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+        self._shared = shared
+
+    def labels(self, *labelvalues: str) -> Histogram:
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.get(labelvalues)
+                if child is None:
+                    child = self._children[labelvalues] = (
+                        Histogram(self.buckets) if self._shared is None
+                        else SharedHistogram(self.buckets, self._shared, self.name, labelvalues)
+                    )
+        return child
+
+    def observe(self, *labelvalues: str, value: float) -> None:
+        self.labels(*labelvalues).observe(value)
+
+    def samples(self) -> List[str]:
+        return histogram_samples(self.name, self.labelnames, sorted(self._children.items()))
+
+    def shared_samples(self, values: Dict[Tuple[tuple, str], float]) -> List[str]:
+        """Líneas a partir de los conteos y sumas acumulados entre procesos."""
+        size = len(self.buckets) + 1
+        parts: Dict[tuple, Dict[str, float]] = {}
+        for (labels, part), value in values.items():
+            parts.setdefault(labels, {})[part] = value
+        children = [
+            (labels, Histogram.from_counts(
+                self.buckets, [found.get(str(index), 0) for index in range(size)], found.get("sum", 0.0)
+            ))
+            for labels, found in sorted(parts.items())
+        ]
+        return histogram_samples(self.name, self.labelnames, children)
+
+def histogram_samples(name: str, labelnames: Sequence[str], children) -> List[str]:
+    """Líneas _bucket/_sum/_count de uno o más histogramas."""
+    lines = []
+    for labels, histogram in children:
+        cumulative = histogram.cumulative_counts()
+        for bound, count in zip(histogram.buckets + [float("inf")], cumulative):
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative[-1]}")
+    return lines
+
+class CallbackFamily:
+    """Métrica calculada al momento de exponerla (gauges o histogramas externos)."""
+
+    def __init__(self, name: str, help: str, type: str, collect):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return self.collect()
+
+def _with_label(line: str, pair: str) -> str:
+    """Agregar un label (`nombre="valor"`) a una línea de muestra."""
+    end = line.index(" ")
+    brace = line.find("{", 0, end)
+    if brace == -1:
+        return f"{line[:end]}{{{pair}}}{line[end:]}"
+    separator = "" if line[brace + 1] == "}" else ","
+    return f"{line[:brace + 1]}{pair}{separator}{line[brace + 1:]}"
+
+class MetricsRegistry:
+    """
+    Registro de métricas expuesto en formato de texto de Prometheus. Con
+    `multiprocess_dir` los contadores e histogramas se suman entre procesos y
+    las métricas calculadas llevan el label `worker` (ver el docstring del
+    módulo).
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        self._families: Dict[str, object] = {}
+        self.multiprocess_dir = multiprocess_dir
+        self._shared = None
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+            self._shared = SharedValues(multiprocess_dir)
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_pid: Optional[int] = None
+
+    def _register(self, family):
+        return self._families.setdefault(family.name, family)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> CounterFamily:
+        return self._register(CounterFamily(name, help, labelnames, self._shared))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily(name, help, labelnames, buckets, self._shared))
+
+    def callback(self, name: str, help: str, type: str, collect) -> CallbackFamily:
+        return self._register(CallbackFamily(name, help, type, collect))
+
+    def render(self) -> str:
+        """Serializar todas las métricas (text/plain; version=0.0.4)."""
+        if self._shared is not None:
+            return self._render_multiprocess()
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            lines.extend(family.samples())
+        return "\n".join(lines) + "\n"
+
+    def _render_multiprocess(self) -> str:
+        totals: Dict[str, Dict[Tuple[tuple, str], float]] = {}
+        for key, value in SharedValues.read_all(self.multiprocess_dir).items():
+            name, labelvalues, part = json.loads(key)
+            totals.setdefault(name, {})[(tuple(labelvalues), part)] = value
+        gauges = self._worker_samples()
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            if isinstance(family, CallbackFamily):
+                lines.extend(gauges.get(family.name, ()))
+            else:
+                lines.extend(family.shared_samples(totals.get(family.name, {})))
+        return "\n".join(lines) + "\n"
+
+    def _local_samples(self) -> Dict[str, List[str]]:
+        """Métricas calculadas de este proceso, con su label `worker`."""
+        pair = f'worker="{os.getpid()}"'
+        return {
+            family.name: [_with_label(line, pair) for line in family.samples()]
+            for family in self._families.values()
+            if isinstance(family, CallbackFamily)
+        }
+
+    def _worker_samples(self) -> Dict[str, List[str]]:
+        """Métricas calculadas de este proceso y la última publicación de los demás workers vivos."""
+        samples = self._local_samples()
+        own = os.path.join(self.multiprocess_dir, f"gauges_{os.getpid()}.json")
+        oldest = time.time() - 3 * GAUGE_SNAPSHOT_SECONDS
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "gauges_*.json")):
+            try:
+                if path == own or os.path.getmtime(path) < oldest:
+                    continue
+                with open(path) as file:
+                    published = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, lines in published.items():
+                samples.setdefault(name, []).extend(lines)
+        return samples
+
+    def write_worker_snapshot(self) -> None:
+        """Publicar las métricas calculadas de este proceso para los demás workers."""
+        path = os.path.join(self.multiprocess_dir, f"gauges_{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self._local_samples(), file)
+        os.replace(f"{path}.tmp", path)
+
+    def reset_after_fork(self) -> None:
+        """En cada worker: publicar sus métricas calculadas cada GAUGE_SNAPSHOT_SECONDS."""
+        if self._shared is None or self._snapshot_pid == os.getpid():
+            return
+        self._snapshot_pid = os.getpid()
+        self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="metrics-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def _snapshot_loop(self) -> None:
+        while True:
+            try:
+                self.write_worker_snapshot()
+            except Exception:
+                pass
+            time.sleep(GAUGE_SNAPSHOT_SECONDS)
+
+    def mark_process_dead(self, pid: int) -> None:
+        """Descartar las métricas calculadas de un worker que terminó (sus contadores se conservan)."""
+        if self.multiprocess_dir:
+            try:
+                os.remove(os.path.join(self.multiprocess_dir, f"gauges_{pid}.json"))
+            except FileNotFoundError:
+                pass
+
+    def clear_multiprocess_dir(self) -> None:
+        """Borrar los archivos de una ejecución anterior (en el maestro, antes de crear los workers)."""
+        if self.multiprocess_dir:
+            for pattern in ("metrics_*.db", "gauges_*.json*"):
+                for path in glob.glob(os.path.join(self.multiprocess_dir, pattern)):
+                    if path != os.path.join(self.multiprocess_dir, f"metrics_{os.getpid()}.db"):
+                        os.remove(path)
+
+# Registro global de la aplicación
+registry = MetricsRegistry(settings.METRICS_MULTIPROC_DIR)
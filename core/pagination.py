@@ -0,0 +1,24 @@
+import base64
+import binascii
+from fastapi import HTTPException, status
+
+CURSOR_PREFIX = "v1:"
+
+def encode_cursor(last_id: int) -> str:
+    """Codificar el último ID de una página como cursor opaco."""
+    raw = f"{CURSOR_PREFIX}{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Decodificar un cursor opaco y obtener el ID a partir del cual continuar."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if not raw.startswith(CURSOR_PREFIX):
+            raise ValueError(raw)
+        return int(raw[len(CURSOR_PREFIX):])
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+def normalize(text: str) -> str:
+    """Normalizar texto para búsqueda (minúsculas y espacios simples)."""
+    return " ".join(text.lower().split())
+
+def ngrams(text: str, n: int = 3) -> Set[str]:
+    """Conjunto de n-gramas de un texto normalizado."""
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+class NgramIndex:
+    """
+    Índice invertido de n-gramas en memoria para búsqueda por subcadena.
+
+    Alternativa a pg_trgm para bases de datos sin índices de trigramas. Los
+    n-gramas se indexan por texto distinto (una flota repite mucho las
+    combinaciones marca/modelo/tipo) y cada texto apunta a sus documentos.
+    Las coincidencias exactas se ordenan por calidad (palabra completa >
+    prefijo > interior); si no llenan la página se agregan resultados
+    aproximados según la proporción de n-gramas compartidos.
+    """
+
+    def __init__(self, n: int = 3, similarity_threshold: float = 0.3):
+        self.n = n
+        self.similarity_threshold = similarity_threshold
+        self.built_at: Optional[float] = None
+        self._docs: Dict[int, str] = {}
+        self._texts: Dict[str, Set[int]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def is_built(self) -> bool:
+        return self.built_at is not None
+
+    def rebuild(self, documents: Iterable[Tuple[int, str]]) -> None:
+        """Reconstruir el índice completo a partir de pares (id, texto)."""
+        docs: Dict[int, str] = {}
+        texts: Dict[str, Set[int]] = {}
+        for doc_id, text in documents:
+            text = normalize(text)
+            docs[doc_id] = text
+            texts.setdefault(text, set()).add(doc_id)
+        postings: Dict[str, Set[str]] = {}
+        for text in texts:
+            for gram in ngrams(text, self.n):
+                postings.setdefault(gram, set()).add(text)
+        with self._lock:
+            self._docs = docs
+            self._texts = texts
+            self._postings = postings
+            self.built_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Marcar el índice como desactualizado (se reconstruye en el próximo uso)."""
+        with self._lock:
+            self.built_at = None
+
+    def add(self, doc_id: int, text: str) -> None:
+        """Agregar o reemplazar un documento."""
+        text = normalize(text)
+        with self._lock:
+            self._remove(doc_id)
+            self._docs[doc_id] = text
+            ids = self._texts.get(text)
+            if ids is None:
+                ids = self._texts[text] = set()
+                for gram in ngrams(text, self.n):
+                    self._postings.setdefault(gram, set()).add(text)
+            ids.add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        """Eliminar un documento."""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: int) -> None:
+        text = self._docs.pop(doc_id, None)
+        if text is None:
+            return
+        ids = self._texts[text]
+        ids.discard(doc_id)
+        if ids:
+            return
+        del self._texts[text]
+        for gram in ngrams(text, self.n):
+            texts = self._postings.get(gram)
+            if texts is not None:
+                texts.discard(text)
+                if not texts:
+                    del self._postings[gram]
+
+    def search(self, query: str, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+        """Buscar documentos y retornar pares (id, score) ordenados por relevancia."""
+        query = normalize(query)
+        if not query:
+            return []
+        grams = ngrams(query, self.n)
+        wanted = offset + limit
+
+        with self._lock:
+            if len(query) < self.n:
+                # Consultas cortas: no hay n-gramas completos, se recorren los textos
+                exact = [text for text in self._texts if query in text]
+            else:
+                # Coincidencias exactas: intersección de postings, de la más chica a la más grande
+                postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+                candidates = set(postings[0])
+                for texts in postings[1:]:
+                    candidates &= texts
+                    if not candidates:
+                        break
+                exact = [text for text in candidates if query in text]
+
+            scored = {text: self._substring_score(query, text) for text in exact}
+
+            # Resultados aproximados solo si las coincidencias exactas no llenan la página
+            if sum(len(self._texts[text]) for text in exact) < wanted and len(query) >= self.n:
+                shared = Counter()
+                for gram in grams:
+                    shared.update(self._postings.get(gram, ()))
+                for text, count in shared.items():
+                    similarity = count / len(grams)
+                    if text not in scored and similarity >= self.similarity_threshold:
+                        scored[text] = round(similarity * 0.5, 4)
+
+            # Expandir textos a documentos por nivel de score (desempate por ID)
+            by_score: Dict[float, List[str]] = {}
+            for text, score in scored.items():
+                by_score.setdefault(score, []).append(text)
+
+            results: List[Tuple[int, float]] = []
+            for score in sorted(by_score, reverse=True):
+                ids = heapq.nsmallest(
+                    wanted - len(results),
+                    itertools.chain.from_iterable(self._texts[text] for text in by_score[score])
+                )
+                results.extend((doc_id, score) for doc_id in ids)
+                if len(results) >= wanted:
+                    break
+        return results[offset:wanted]
+
+    def _substring_score(self, query: str, text: str) -> float:
+        """Score de una coincidencia exacta de subcadena."""
+        padded = f" {text} "
+        if f" {query} " in padded:
+            return 1.0
+        if f" {query}" in padded:
+            return 0.9
+        return 0.75
+
+    def __len__(self) -> int:
+        return len(self._docs)
@@ -1,13 +1,30 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from .cache import TTLCache
 from .config import settings
+from .metrics import registry
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Los hashes con un costo distinto a BCRYPT_ROUNDS se regeneran al hacer login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
+
+# Claims ya verificados por token, válidos hasta su `exp`
+_claims_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña."""
@@ -17,6 +34,82 @@ def get_password_hash(password: str) -> str:
     """Hash de contraseña."""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar contraseña y devolver un hash nuevo si el actual está desactualizado."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+PASSWORD_HASH_SECONDS = registry.histogram(
+    "password_hash_duration_seconds", "Duración de hash/verificación bcrypt (incluye espera en el pool)", ("operation",)
+)
+PASSWORD_HASH_REJECTED = registry.counter(
+    "password_hash_rejected_total", "Operaciones bcrypt rechazadas por cola llena"
+)
+
+# Pool acotado para bcrypt: evita congelar el event loop durante el hashing
+_hash_executor: Optional[Executor] = None
+_hash_in_flight = 0
+
+def _get_hash_executor() -> Executor:
+    """Crear (una vez) el pool de workers para hashing."""
+    global _hash_executor
+    if _hash_executor is None:
+        workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    """Cerrar el pool de hashing (se recrea en el próximo uso)."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+def reset_hash_executor_after_fork() -> None:
+    """Olvidar el pool heredado del padre: sus hilos o procesos no existen en el hijo."""
+    global _hash_executor, _hash_in_flight
+    _hash_executor = None
+    _hash_in_flight = 0
+
+async def _run_in_hash_executor(operation: str, fn, *args):
+    """Ejecutar fn en el pool; responde 503 si la cola de espera está llena."""
+    global _hash_in_flight
+    capacity = (settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1) + settings.PASSWORD_HASH_QUEUE_SIZE
+    if _hash_in_flight >= capacity:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, intente nuevamente",
+            headers={"Retry-After": "1"},
+        )
+    _hash_in_flight += 1
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        _hash_in_flight -= 1
+        PASSWORD_HASH_SECONDS.observe(operation, value=time.perf_counter() - start)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash de contraseña en el pool de hashing."""
+    return await _run_in_hash_executor("hash", get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar contraseña (y obtener rehash si corresponde) en el pool de hashing."""
+    return await _run_in_hash_executor("verify", verify_and_update_password, plain_password, hashed_password)
+
+async def get_token_subject(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[str]:
+    """`sub` del token de la petición, o None si no hay un token válido (no exige autenticación)."""
+    if not token:
+        return None
+    try:
+        return decode_access_token(token).get("sub")
+    except HTTPException:
+        return None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crear token JWT."""
     to_encode = data.copy()
@@ -31,8 +124,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def decode_access_token(token: str) -> dict:
     """Decodificar token JWT."""
+    payload = _claims_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        exp = payload.get("exp")
+        if exp is not None:
+            _claims_cache.set(token, payload, ttl=exp - time.time())
         return payload
     except jwt.PyJWTError:
         raise HTTPException(
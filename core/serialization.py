@@ -0,0 +1,31 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Serializar a JSON (UTF-8, compacto) con orjson si está instalado."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+def dumps_lines(rows) -> bytes:
+    """Serializar una secuencia de objetos como NDJSON (un objeto por línea)."""
+    if orjson is not None:
+        return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode()
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada con orjson.
+
+    Devolverla directamente desde una ruta (con dicts ya proyectados desde la
+    base de datos) evita la validación y serialización de `response_model`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
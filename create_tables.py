@@ -6,6 +6,7 @@ import sys
 from database.db import Base, engine
 from models.user import User
 from models.vehicle import Vehicle
+from models.vehicle_stats import VehicleTypeStats
 
 def create_tables():
     """Crear todas las tablas en la base de datos."""
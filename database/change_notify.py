@@ -0,0 +1,301 @@
+"""
+Difusión del feed de cambios entre workers con LISTEN/NOTIFY de PostgreSQL.
+
+Cada evento se numera con la secuencia `vehicle_change_seq` en la misma
+transacción que lo notifica, bajo un advisory lock que dura hasta el commit:
+los IDs crecen en el mismo orden en que los avisos entran a la cola de
+PostgreSQL, que los entrega en ese orden a todas las conexiones que escuchan.
+Así todos los workers ven la misma secuencia con los mismos IDs, un cliente
+puede retomar en cualquiera y un hueco en la numeración delata avisos
+perdidos.
+
+Por defecto los avisos salen después del commit de la escritura, desde un
+hilo publicador por worker que agrupa los eventos de varias escrituras en una
+transacción corta: las escrituras no toman el lock global de la cola de
+NOTIFY al confirmar. Dos escrituras concurrentes pueden entonces avisarse en
+otro orden que sus commits; cada evento lleva la `version` del vehículo y el
+listener descarta los que llegan atrasados, así que el estado final que ve
+un suscriptor es el correcto. Con CHANGE_FEED_NOTIFY_IN_TRANSACTION el NOTIFY
+va dentro de la transacción de la escritura: orden exacto de commits, a costa
+de serializar los commits de todas las escrituras.
+
+Cada worker escucha en una conexión dedicada (fuera del pool), en un hilo que
+republica lo recibido en su `change_feed`.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from core.changefeed import RELOAD, ChangeBroadcaster
+from core.serialization import dumps
+from database.db import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "vehiculos_cambios"
+
+# Advisory lock que ordena la numeración y el NOTIFY entre workers
+LOCK_KEY = zlib.crc32(CHANNEL.encode())
+
+# PostgreSQL rechaza payloads de 8000 bytes o más
+MAX_PAYLOAD_BYTES = 7900
+
+# Segundos sin avisos tras los que se comprueba la conexión LISTEN
+KEEPALIVE_SECONDS = 30
+
+# Eventos como máximo por transacción del publicador
+PUBLISH_BATCH_SIZE = 500
+
+# Vehículos recientes cuya última versión recuerda el listener
+VERSION_WINDOW = 10000
+
+_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:key)")
+_NOTIFY_SQL = text(
+    "SELECT pg_notify(:channel, nextval('vehicle_change_seq')::text || ' ' || payload) "
+    "FROM unnest(CAST(:payloads AS text[])) AS payload"
+)
+
+def uses_notify(db: Session) -> bool:
+    """Indica si los eventos de esta sesión se difunden con NOTIFY."""
+    return db.get_bind().dialect.name == "postgresql"
+
+def encode_change(op: str, data: dict, tipos: Iterable[Optional[str]] = ()) -> str:
+    """Payload JSON de un evento; si no entra en un NOTIFY se reemplaza por `recargar`."""
+    payload = dumps({"op": op, "tipos": [tipo for tipo in tipos if tipo], "data": data}).decode()
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        return dumps({"op": RELOAD, "tipos": [], "data": {}}).decode()
+    return payload
+
+def notify_changes(db, events: list) -> None:
+    """
+    Emitir un NOTIFY por evento (op, data, tipos) en la transacción actual
+    de `db` (Session o Connection), numerados con vehicle_change_seq.
+    """
+    if events:
+        db.execute(_LOCK_SQL, {"key": LOCK_KEY})
+        db.execute(_NOTIFY_SQL, {
+            "channel": CHANNEL,
+            "payloads": [encode_change(*event) for event in events],
+        })
+
+class NotifyPublisher:
+    """
+    Hilo que envía los NOTIFY de las escrituras ya confirmadas en este
+    worker, agrupando en cada transacción lo que se acumuló mientras se
+    enviaba la anterior. Si la base no responde reintenta con los mismos
+    eventos; los de un worker que termina abruptamente entre el commit y el
+    envío se pierden sin aviso (usar CHANGE_FEED_NOTIFY_IN_TRANSACTION si eso
+    no es aceptable).
+    """
+
+    def __init__(self, engine, batch_size: int = PUBLISH_BATCH_SIZE, retry_seconds: float = 1.0):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closing = threading.Event()
+
+    def submit(self, events: list) -> None:
+        """Encolar los eventos de una escritura confirmada."""
+        if events:
+            self._ensure_started().put(list(events))
+
+    def _ensure_started(self) -> queue.Queue:
+        with self._lock:
+            # Tras un fork el hilo del padre no existe en el hijo
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._closing.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="change-feed-publisher", daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def close(self) -> None:
+        """Enviar lo pendiente y detener el hilo."""
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            self._thread = None
+        if thread is not None and self._pid == os.getpid():
+            pending.put(None)
+            thread.join(timeout=5)
+            self._closing.set()
+
+    def _run(self) -> None:
+        pending = self._queue
+        while True:
+            batch = pending.get()
+            if batch is None:
+                return
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    more = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+            self._send(batch)
+            if stop:
+                return
+
+    def _send(self, events: list) -> None:
+        while True:
+            try:
+                with self.engine.begin() as connection:
+                    notify_changes(connection, events)
+                return
+            except Exception as e:
+                if self._closing.is_set():
+                    logger.error("Feed de cambios: se descartaron %d eventos sin notificar (%s)", len(events), e)
+                    return
+                logger.warning("Feed de cambios: no se pudo enviar NOTIFY (%s); reintentando", e)
+                self._closing.wait(self.retry_seconds)
+
+class ChangeListener:
+    """
+    Hilo que escucha el canal del feed y publica cada NOTIFY en `broadcaster`
+    con su ID compartido.
+
+    Al conectar (o reconectar) lee el último ID asignado: si avanzó desde el
+    último aviso recibido, se perdieron eventos y los suscriptores reciben
+    `recargar`. Lo mismo ocurre si llega un ID que no es el siguiente.
+    """
+
+    def __init__(self, engine, broadcaster: ChangeBroadcaster, retry_seconds: float = 1.0):
+        self.engine = engine
+        self.broadcaster = broadcaster
+        self.retry_seconds = retry_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_seq: Optional[int] = None
+        # Última (versión, es_baja) vista por vehículo, para descartar eventos atrasados
+        self._versions: OrderedDict = OrderedDict()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _connect(self):
+        """Conexión DBAPI propia (no ocupa un slot del pool) en autocommit, escuchando el canal."""
+        dialect = self.engine.dialect
+        cargs, cparams = dialect.create_connect_args(self.engine.url)
+        connection = dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute(f"LISTEN {CHANNEL}")
+        cursor.close()
+        return connection
+
+    def _current_seq(self, connection) -> int:
+        """Último ID asignado, leído bajo el advisory lock: ningún aviso numerado queda sin confirmar."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+            try:
+                cursor.execute("SELECT last_value, is_called FROM vehicle_change_seq")
+                last_value, is_called = cursor.fetchone()
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        finally:
+            cursor.close()
+        return last_value if is_called else last_value - 1
+
+    def _sync(self, connection) -> None:
+        """Alinear el stream con la base al empezar a escuchar."""
+        current = self._current_seq(connection)
+        if current != self._last_seq:
+            # Arranque, o avisos perdidos mientras no se escuchaba. Los avisos ya
+            # en cola con ID <= current se ignoran: la recarga los incluye
+            self.broadcaster.reset_stream(current, "listener")
+            self._last_seq = current
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                self._sync(connection)
+                idle = 0
+                while not self._stop.is_set():
+                    if not select.select([connection], [], [], 1.0)[0]:
+                        idle += 1
+                        if idle >= KEEPALIVE_SECONDS:
+                            # Una conexión caída sin aviso solo se detecta al usarla
+                            idle = 0
+                            cursor = connection.cursor()
+                            cursor.execute("SELECT 1")
+                            cursor.close()
+                        continue
+                    idle = 0
+                    connection.poll()
+                    while connection.notifies:
+                        self._handle(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning("Feed de cambios: se perdió la conexión LISTEN (%s); reintentando", e)
+                self._stop.wait(self.retry_seconds)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _handle(self, payload: str) -> None:
+        """Publicar un aviso `<id> <json>`, detectando huecos y eventos atrasados."""
+        try:
+            seq, _, body = payload.partition(" ")
+            seq = int(seq)
+            event = json.loads(body)
+            op, data, tipos = event["op"], event["data"], event["tipos"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Feed de cambios: payload inválido en %s: %.200s", CHANNEL, payload)
+            return
+        if self._last_seq is not None:
+            if seq <= self._last_seq:
+                return
+            if seq != self._last_seq + 1:
+                self.broadcaster.reset_stream(seq - 1, "gap")
+        self._last_seq = seq
+        if not self._is_stale(op, data):
+            self.broadcaster.publish(op, data, tipos, seq=seq)
+
+    def _is_stale(self, op: str, data: dict) -> bool:
+        """
+        Si el evento es más viejo que uno ya publicado del mismo vehículo
+        (avisos enviados después del commit pueden llegar desordenados). Una
+        baja va después de cualquier cambio con su misma versión.
+        """
+        vehicle_id, version = data.get("id"), data.get("version")
+        if vehicle_id is None or version is None:
+            return False
+        key = (version, op == "eliminado")
+        last = self._versions.get(vehicle_id)
+        if last is not None and key <= last:
+            return True
+        self._versions[vehicle_id] = key
+        self._versions.move_to_end(vehicle_id)
+        if len(self._versions) > VERSION_WINDOW:
+            self._versions.popitem(last=False)
+        return False
+
+notify_publisher = NotifyPublisher(engine)
@@ -1,32 +1,197 @@
-from sqlalchemy import create_engine
+from typing import Optional
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from starlette.concurrency import run_in_threadpool
 from core.config import settings
+from core.security import get_token_subject
+from database.pool_stats import InstrumentedAsyncQueuePool, InstrumentedQueuePool, monitor_engine
+from database.replicas import ReplicaSet, mark_recent_write, wrote_recently
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Opciones de create_engine con el pool configurado en Settings."""
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # Verificar conexiones antes de usarlas
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "echo": False,  # Cambiar a True para debug SQL
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+    # SQLite en memoria usa un pool propio de una sola conexión
+    if ":memory:" in url:
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
 
 # Crear engine de SQLAlchemy
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,  # Verificar conexiones antes de usarlas
-    echo=False  # Cambiar a True para debug SQL
-)
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+monitor_engine("primary", engine)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine y session factory asíncronos (solo si DB_ASYNC está activo)
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    async_engine = create_async_engine(
+        settings.async_database_url,
+        **engine_options(settings.async_database_url, is_async=True)
+    )
+    monitor_engine("primary_async", async_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+# Réplicas de lectura (solo si DATABASE_REPLICA_URLS está definido)
+replicas: Optional[ReplicaSet] = None
+async_replicas: Optional[ReplicaSet] = None
+if settings.replica_urls:
+    replica_engines = [create_engine(url, **engine_options(url)) for url in settings.replica_urls]
+    for index, replica_engine in enumerate(replica_engines):
+        monitor_engine(f"replica_{index}", replica_engine)
+    replicas = ReplicaSet(replica_engines, settings.REPLICA_EJECT_SECONDS)
+    
+    if settings.DB_ASYNC:
+        async_replica_engines = []
+        for index, url in enumerate(settings.replica_urls):
+            url = settings.to_async_url(url)
+            async_replica_engines.append(create_async_engine(url, **engine_options(url, is_async=True)))
+            monitor_engine(f"replica_{index}_async", async_replica_engines[-1])
+        async_replicas = ReplicaSet(async_replica_engines, settings.REPLICA_EJECT_SECONDS)
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_write(session):
+    """
+    Tras un commit, las próximas peticiones del mismo cliente leen del
+    primario y validan la caché de vehículos (read-your-writes en cualquier worker).
+    """
+    mark_recent_write(session.info.get("principal"))
+
+def dispose_engines_after_fork() -> None:
+    """
+    Descartar las conexiones heredadas del proceso padre (llamar en cada worker
+    tras el fork). close=False no las cierra: siguen siendo del padre.
+    """
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+    for replica_set in (replicas, async_replicas):
+        for replica_engine in replica_set.engines if replica_set else ():
+            getattr(replica_engine, "sync_engine", replica_engine).dispose(close=False)
+
+async def dispose_engines() -> None:
+    """Cerrar las conexiones de todos los engines (al apagar el proceso)."""
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for replica_set in (replicas, async_replicas):
+        for replica_engine in replica_set.engines if replica_set else ():
+            if hasattr(replica_engine, "sync_engine"):
+                await replica_engine.dispose()
+            else:
+                replica_engine.dispose()
+
 # Base para modelos ORM
 Base = declarative_base()
 
-def get_db():
+def get_db(principal: Optional[str] = Depends(get_token_subject)):
     """
     Dependency para obtener sesión de base de datos.
     Se usa con Depends() en FastAPI.
     """
     db = SessionLocal()
+    db.info["principal"] = principal
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db(principal: Optional[str] = Depends(get_token_subject)):
+    """
+    Dependency para obtener una AsyncSession.
+    Solo disponible con DB_ASYNC activo.
+    """
+    async with AsyncSessionLocal() as db:
+        db.info["principal"] = principal
+        yield db
+
+def _choose_replica(replica_set: Optional[ReplicaSet], principal: Optional[str]):
+    """Réplica para una lectura, o None si hay que leer del primario."""
+    if replica_set is None or wrote_recently(principal):
+        return None
+    return replica_set.choose()
+
+def get_read_db(principal: Optional[str] = Depends(get_token_subject)):
+    """
+    Dependency de solo lectura: sesión en una réplica, o en el primario si no
+    hay réplicas disponibles o el cliente escribió hace poco (read-your-writes).
+    """
+    replica = _choose_replica(replicas, principal)
+    db = SessionLocal(bind=replica) if replica is not None else SessionLocal()
+    db.info.update(principal=principal, replica=replica is not None)
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_read_db(principal: Optional[str] = Depends(get_token_subject)):
+    """Versión AsyncSession de get_read_db."""
+    replica = _choose_replica(async_replicas, principal)
+    async with (AsyncSessionLocal(bind=replica) if replica is not None else AsyncSessionLocal()) as db:
+        db.info.update(principal=principal, replica=replica is not None)
+        yield db
+
+def new_read_session() -> Session:
+    """Sesión de lectura propia (p. ej. para respuestas en streaming), en una réplica si hay."""
+    replica = _choose_replica(replicas, None)
+    return SessionLocal(bind=replica) if replica is not None else SessionLocal()
+
+def is_replica_session(db) -> bool:
+    """Si la sesión lee de una réplica (sus datos pueden estar levemente atrasados)."""
+    return db.info.get("replica", False)
+
+# Dependencies usadas por las rutas: AsyncSession o Session según la configuración.
+# get_read_session solo difiere de get_session si hay réplicas configuradas.
+get_session = get_async_db if settings.DB_ASYNC else get_db
+if replicas is None:
+    get_read_session = get_session
+else:
+    get_read_session = get_async_read_db if settings.DB_ASYNC else get_read_db
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Ejecutar una función síncrona de acceso a datos sin bloquear el event loop.
+    
+    Con AsyncSession la función corre vía run_sync, de modo que la E/S con la
+    base de datos es asíncrona; con Session se ejecuta en el threadpool.
+    La función recibe la sesión en el argumento `db`.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: fn(*args, db=session, **kwargs))
+    return await run_in_threadpool(fn, *args, db=db, **kwargs)
+
+async def run_on_primary(fn, *args, **kwargs):
+    """Ejecutar una función de acceso a datos con una sesión propia en el primario."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await run_db(db, fn, *args, **kwargs)
+    
+    def run():
+        with SessionLocal() as db:
+            return fn(*args, db=db, **kwargs)
+    return await run_in_threadpool(run)
+
 def init_db():
     """
     Inicializar base de datos creando todas las tablas.
@@ -35,5 +200,6 @@ def init_db():
     # Importar todos los modelos para que Base los conozca
     from models.user import User
     from models.vehicle import Vehicle
+    from models.vehicle_stats import VehicleTypeStats
     
     Base.metadata.create_all(bind=engine)
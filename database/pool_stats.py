@@ -0,0 +1,136 @@
+import itertools
+import threading
+import time
+from typing import Dict
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from core.metrics import Histogram, histogram_samples, registry
+
+class _WaitTimeMixin:
+    """Mide cuánto espera cada checkout por una conexión del pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = Histogram()
+        # Checkouts esperando ahora (ticket -> inicio) y el último completado (espera, momento)
+        self._waiting_since: Dict[int, float] = {}
+        self._tickets = itertools.count()
+        self._last_wait = (0.0, 0.0)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        ticket = next(self._tickets)
+        self._waiting_since[ticket] = start
+        try:
+            return super()._do_get()
+        finally:
+            del self._waiting_since[ticket]
+            end = time.perf_counter()
+            self._last_wait = (end - start, end)
+            self.wait_histogram.observe(end - start)
+
+    def wait_pressure(self, window: float = 1.0) -> float:
+        """
+        Espera actual por una conexión (segundos): la del checkout que lleva
+        más tiempo esperando o, si no hay ninguno, la del último completado
+        hace menos de `window`. Cero cuando el pool tiene conexiones libres.
+        """
+        now = time.perf_counter()
+        oldest = min(list(self._waiting_since.values()), default=now)
+        last_wait, finished_at = self._last_wait
+        recent = last_wait if now - finished_at <= window else 0.0
+        return max(now - oldest, recent)
+
+class InstrumentedQueuePool(_WaitTimeMixin, QueuePool):
+    """QueuePool con histograma de tiempo de espera."""
+
+class InstrumentedAsyncQueuePool(_WaitTimeMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool con histograma de tiempo de espera."""
+
+class PoolMonitor:
+    """Contadores de eventos de un pool de conexiones."""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        for event_name, counter in (
+            ("connect", "connects"),
+            ("checkout", "checkouts"),
+            ("checkin", "checkins"),
+            ("invalidate", "invalidations"),
+        ):
+            event.listen(engine, event_name, self._counter_listener(counter))
+
+    def _counter_listener(self, counter: str):
+        def listener(*args):
+            with self._lock:
+                self.counters[counter] += 1
+        return listener
+
+    def snapshot(self) -> Dict:
+        """Estado actual del pool: conexiones en uso, libres, overflow y esperas."""
+        pool = self.engine.pool
+        data = {"pool": pool.__class__.__name__, **self.counters}
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+            })
+        wait_histogram = getattr(pool, "wait_histogram", None)
+        if wait_histogram is not None:
+            data["wait_seconds"] = wait_histogram.snapshot()
+        return data
+
+_monitors: Dict[str, PoolMonitor] = {}
+
+def monitor_engine(name: str, engine) -> PoolMonitor:
+    """Registrar un engine para reportar el estado de su pool."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    monitor = _monitors[name] = PoolMonitor(name, sync_engine)
+    return monitor
+
+def pool_status() -> Dict[str, Dict]:
+    """Estado de todos los pools registrados."""
+    return {name: monitor.snapshot() for name, monitor in _monitors.items()}
+
+def pool_wait_pressure() -> float:
+    """Mayor espera actual por una conexión entre todos los pools (ver wait_pressure)."""
+    return max(
+        (
+            monitor.engine.pool.wait_pressure()
+            for monitor in _monitors.values()
+            if hasattr(monitor.engine.pool, "wait_pressure")
+        ),
+        default=0.0
+    )
+
+def _pool_gauge(name: str, help: str, key: str):
+    """Exponer un valor de pool_status() como gauge por engine."""
+    def collect():
+        return [
+            f'{name}{{engine="{engine_name}"}} {data[key]}'
+            for engine_name, data in pool_status().items()
+            if key in data
+        ]
+    registry.callback(name, help, "gauge", collect)
+
+_pool_gauge("db_pool_checked_out", "Conexiones en uso", "checked_out")
+_pool_gauge("db_pool_idle", "Conexiones libres en el pool", "idle")
+_pool_gauge("db_pool_overflow", "Conexiones abiertas por encima de pool_size", "overflow")
+_pool_gauge("db_pool_size", "Tamaño configurado del pool", "size")
+registry.callback(
+    "db_pool_wait_seconds",
+    "Espera por una conexión del pool",
+    "histogram",
+    lambda: histogram_samples("db_pool_wait_seconds", ("engine",), [
+        ((name,), monitor.engine.pool.wait_histogram)
+        for name, monitor in _monitors.items()
+        if hasattr(monitor.engine.pool, "wait_histogram")
+    ])
+)
@@ -0,0 +1,95 @@
+import itertools
+import mmap
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from core.config import settings
+
+class ReplicaSet:
+    """
+    Engines de réplicas de lectura elegidos en round-robin.
+
+    Una réplica cuya conexión falla (no se puede conectar o se detecta una
+    desconexión) queda fuera de la rotación durante `eject_seconds`; si no
+    queda ninguna disponible, `choose` retorna None y se lee del primario.
+    """
+
+    def __init__(self, engines: List, eject_seconds: float):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._next = itertools.count()
+        self._ejected_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        for index, engine in enumerate(engines):
+            event.listen(getattr(engine, "sync_engine", engine), "handle_error", self._error_listener(index))
+
+    def _error_listener(self, index: int):
+        def listener(context):
+            if context.is_disconnect or context.connection is None:
+                self.eject(index)
+        return listener
+
+    def choose(self):
+        """Siguiente réplica disponible, o None si todas están excluidas."""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._next) % len(self.engines)
+            if self._ejected_until.get(index, 0.0) <= now:
+                return self.engines[index]
+        return None
+
+    def eject(self, index: int) -> None:
+        """Excluir una réplica de la rotación por `eject_seconds`."""
+        with self._lock:
+            self._ejected_until[index] = time.monotonic() + self.eject_seconds
+
+    def status(self) -> List[Dict]:
+        """Estado de cada réplica (URL sin contraseña y segundos restantes de exclusión)."""
+        now = time.monotonic()
+        return [
+            {
+                "url": getattr(engine, "url").render_as_string(hide_password=True),
+                "disponible": self._ejected_until.get(index, 0.0) <= now,
+                "excluida_por_segundos": round(max(self._ejected_until.get(index, 0.0) - now, 0.0), 1),
+            }
+            for index, engine in enumerate(self.engines)
+        ]
+
+class SharedWriteMarks:
+    """
+    Momento de la última escritura de cada cliente, en memoria compartida
+    entre los workers: un mmap anónimo creado al importar (en el maestro, con
+    preload_app) que los workers heredan al hacer fork. Cada cliente ocupa
+    una ranura por hash; una colisión solo puede enviar lecturas de más al
+    primario, nunca de menos.
+    """
+
+    _SLOT = struct.Struct("d")
+
+    def __init__(self, slots: int):
+        self.slots = max(slots, 1)
+        self._map = mmap.mmap(-1, self.slots * self._SLOT.size)
+
+    def _offset(self, principal: str) -> int:
+        return (zlib.crc32(principal.encode()) % self.slots) * self._SLOT.size
+
+    def mark(self, principal: str) -> None:
+        self._SLOT.pack_into(self._map, self._offset(principal), time.time())
+
+    def last_write(self, principal: str) -> float:
+        return self._SLOT.unpack_from(self._map, self._offset(principal))[0]
+
+# Clientes (`sub` del token) que escribieron hace menos de READ_YOUR_WRITES_SECONDS
+_recent_writers = SharedWriteMarks(settings.READ_YOUR_WRITES_SLOTS)
+
+def mark_recent_write(principal: Optional[str]) -> None:
+    """Leer del primario las próximas peticiones de este cliente (read-your-writes)."""
+    if principal:
+        _recent_writers.mark(principal)
+
+def wrote_recently(principal: Optional[str]) -> bool:
+    """Si el cliente escribió dentro de la ventana de read-your-writes (en cualquier worker)."""
+    return bool(principal) and time.time() - _recent_writers.last_write(principal) < settings.READ_YOUR_WRITES_SECONDS
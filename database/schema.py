@@ -0,0 +1,95 @@
+"""
+Verificación rápida del esquema al iniciar.
+
+Compara la revisión guardada en alembic_version (una sola consulta) con la
+última migración del repositorio. Si coinciden no se hace nada más; Alembic y
+los modelos solo se importan cuando hay que crear o migrar el esquema.
+"""
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Set
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+VERSIONS_DIR = ROOT_DIR / "alembic" / "versions"
+
+_REVISION_RE = re.compile(r"^revision(?:\s*:\s*[^=]+)?\s*=\s*['\"]([0-9a-f]+)['\"]", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision(?:\s*:\s*[^=]+)?\s*=\s*(.+)$", re.MULTILINE)
+
+@lru_cache(maxsize=1)
+def head_revision() -> str:
+    """
+    Última revisión de alembic/versions, leída del texto de los archivos (sin
+    importar los módulos de migración). Falla si hay más de una cabeza.
+    """
+    revisions: Set[str] = set()
+    parents: Set[str] = set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION_RE.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down = _DOWN_REVISION_RE.search(source)
+        if down is not None:
+            parents.update(re.findall(r"['\"]([0-9a-f]+)['\"]", down.group(1)))
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Se esperaba una sola cabeza de migraciones y hay {sorted(heads)}")
+    return heads.pop()
+
+def current_revision(engine) -> Optional[str]:
+    """Revisión aplicada en la base, o None si no existe alembic_version."""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None
+
+def _alembic_config():
+    from alembic.config import Config
+
+    return Config(str(ROOT_DIR / "alembic.ini"))
+
+def ensure_schema(engine) -> str:
+    """
+    Dejar el esquema en la última revisión y retornar qué se hizo:
+    "al día" (nada), "creado" (alembic upgrade head en una base vacía: corre
+    también las migraciones de datos y extensiones), "marcado" (tablas creadas
+    sin Alembic: create_all de lo que falte + stamp) o "migrado".
+    """
+    revision = current_revision(engine)
+    if revision == head_revision():
+        return "al día"
+
+    from alembic import command
+
+    if revision is None:
+        if not inspect(engine).has_table("vehicles"):
+            command.upgrade(_alembic_config(), "head")
+            return "creado"
+
+        from database.db import init_db
+
+        init_db()
+        command.stamp(_alembic_config(), "head")
+        return "marcado"
+
+    command.upgrade(_alembic_config(), "head")
+    return "migrado"
+
+def main():
+    from database.db import engine
+
+    start = time.perf_counter()
+    try:
+        result = ensure_schema(engine)
+    finally:
+        engine.dispose()
+    print(f"✅ Esquema {result} (revisión {head_revision()}, {time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Configuración de gunicorn para producción (varios procesos con uvicorn).
+
+    gunicorn main:app -c gunicorn.conf.py
+
+La app se importa una sola vez en el proceso maestro (preload) y cada worker
+se crea con fork, compartiendo el socket. Los workers se reciclan después de
+WORKER_MAX_REQUESTS peticiones (con jitter para no reiniciarse todos juntos).
+"""
+import os
+import tempfile
+from core.config import settings
+
+# /metrics suma las métricas de todos los workers (ver core/metrics.py); el
+# directorio se define antes de importar la app, que crea el registro
+if not settings.METRICS_MULTIPROC_DIR:
+    settings.METRICS_MULTIPROC_DIR = tempfile.mkdtemp(prefix="vehiculos-metrics-")
+
+def _available_cpus() -> int:
+    """CPUs disponibles para el proceso (respeta límites de afinidad/cgroups)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1
+
+def _connections_per_worker() -> int:
+    """Conexiones que puede abrir un worker: pool + overflow por engine."""
+    per_engine = settings.DB_POOL_SIZE + max(settings.DB_MAX_OVERFLOW, 0)
+    return per_engine * (2 if settings.DB_ASYNC else 1)
+
+def recommended_workers() -> int:
+    """
+    Un worker por CPU (los workers uvicorn son asíncronos: más procesos que
+    CPUs solo compiten entre sí), acotado para no superar DB_MAX_CONNECTIONS.
+    """
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    workers = _available_cpus()
+    if settings.DB_MAX_CONNECTIONS:
+        workers = min(workers, settings.DB_MAX_CONNECTIONS // _connections_per_worker())
+    return max(workers, 1)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = recommended_workers()
+preload_app = True
+
+# Reciclado de workers (acota fugas de memoria y fragmentación)
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+def on_starting(server):
+    """
+    Verificar el esquema una sola vez, en el maestro, antes de crear los
+    workers, y descartar las métricas de una ejecución anterior.
+    """
+    from core.metrics import registry
+
+    registry.clear_multiprocess_dir()
+    if not settings.SCHEMA_CHECK_ON_STARTUP:
+        return
+    from core.instrumentation import record_startup
+    from database.db import engine
+    from database.schema import ensure_schema, head_revision
+
+    try:
+        result = ensure_schema(engine)
+    finally:
+        engine.dispose()
+    server.log.info(
+        "Esquema %s (revisión %s) a %.2fs del inicio",
+        result, head_revision(), record_startup("schema_checked")
+    )
+
+def when_ready(server):
+    server.log.info(
+        "%d workers (CPUs: %d, conexiones por worker: %d)",
+        workers, _available_cpus(), _connections_per_worker()
+    )
+
+def post_fork(server, worker):
+    """Estado por proceso: engines, pool de bcrypt, hilo de miniaturas, feed de cambios y métricas nuevos en cada worker."""
+    from controllers.media_controller import media_controller
+    from core import security
+    from core.changefeed import change_feed
+    from core.instrumentation import startup_timings
+    from core.metrics import registry
+    from database.db import dispose_engines_after_fork
+
+    dispose_engines_after_fork()
+    security.reset_hash_executor_after_fork()
+    media_controller.reset_after_fork()
+    change_feed.reset_after_fork()
+    registry.reset_after_fork()
+    # Los tiempos de arranque del worker se miden desde su fork
+    startup_timings.clear()
+    # Repartir los CPUs entre los workers para el hashing de contraseñas
+    if settings.PASSWORD_HASH_WORKERS is None:
+        settings.PASSWORD_HASH_WORKERS = max(_available_cpus() // workers, 1)
+
+def child_exit(server, worker):
+    """Dejar de exponer los gauges de un worker que terminó (sus contadores siguen sumando)."""
+    from core.metrics import registry
+
+    registry.mark_process_dead(worker.pid)
@@ -1,15 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from core import security
+from core.admission import AdmissionMiddleware
 from core.config import settings
-from routes.user_routes import router as user_router
-from routes.vehicle_routes import router as vehicle_router
+from core.instrumentation import MetricsMiddleware, record_startup
+from core.serialization import FastJSONResponse
+from controllers.change_feed_controller import change_feed_controller
+from controllers.media_controller import media_controller
+from controllers.vehicle_controller import vehicle_controller
+from database.db import dispose_engines
+from routes import internal_router, media_router, metrics_router, user_router, vehicle_router
+
+# Tiempo hasta que el proceso queda listo para atender (app_startup_seconds en /metrics)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cada worker recibe también las escrituras de los demás (ver core/changefeed.py)
+    change_feed_controller.start()
+    record_startup("ready")
+    yield
+    # Al apagar: vaciar las altas agrupadas, detener los pools de hilos y
+    # cerrar las conexiones (con aiosqlite, sus hilos impiden que el proceso termine)
+    await vehicle_controller.shutdown_async()
+    await change_feed_controller.shutdown()
+    await run_in_threadpool(media_controller.shutdown)
+    await run_in_threadpool(security.shutdown_hash_executor)
+    await dispose_engines()
 
 app = FastAPI(
     title="Sistema de Gestión de Vehículos",
     description="API RESTful para gestión de vehículos con autenticación JWT",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Control de admisión: 503 rápido si el servicio está saturado (ver core/admission.py)
+app.add_middleware(AdmissionMiddleware)
+
 # Configuración CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,8 +46,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Métricas por ruta (latencia, estado, SQL por petición)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Rutas principales
 @app.get("/")
 async def root():
@@ -32,6 +66,12 @@ async def root():
 # Incluir routers
 app.include_router(user_router)
 app.include_router(vehicle_router)
+app.include_router(internal_router)
+app.include_router(media_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
+
+record_startup("app_loaded")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,9 +1,26 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import DDL, BigInteger, Column, Index, Integer, Sequence, String, Float, event, text
 from database.db import Base
 
 class Vehicle(Base):
     """Modelo ORM para Vehículo."""
     __tablename__ = "vehicles"
+    __table_args__ = (
+        # Índices de trigramas (solo PostgreSQL, como la migración a71e4c0b9d23):
+        # create_all genera el mismo esquema que `alembic upgrade head`.
+        # La expresión debe coincidir con _search_document() en vehicle_controller
+        Index(
+            "ix_vehicles_search_trgm",
+            text("(marca || ' ' || modelo || ' ' || tipo) gin_trgm_ops"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        # Permite usar índice en el filtro ILIKE '%tipo%' del listado
+        Index(
+            "ix_vehicles_tipo_trgm",
+            "tipo",
+            postgresql_using="gin",
+            postgresql_ops={"tipo": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     marca = Column(String(50), nullable=False)
@@ -12,7 +29,20 @@ class Vehicle(Base):
     tipo = Column(String(30), nullable=False, index=True)
     kilometraje = Column(Float, nullable=False)
     imagen_url = Column(String(500), nullable=True)
+    # Se incrementa con cada UPDATE; valida la caché de GET /vehiculos/{id}
+    version = Column(BigInteger, nullable=False, default=1, server_default="1")
     
     # Si quisieras agregar ownership:
     # owner_id = Column(Integer, ForeignKey("users.id"))
     # owner = relationship("User", back_populates="vehicles")
+
+# Los índices de trigramas necesitan la extensión antes de crear la tabla
+event.listen(
+    Vehicle.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+# IDs del feed de cambios compartidos por todos los workers (solo PostgreSQL;
+# ver database/change_notify.py). create_all la omite en otros motores
+vehicle_change_seq = Sequence("vehicle_change_seq", metadata=Base.metadata)
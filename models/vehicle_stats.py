@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, Integer, String, Float
+from database.db import Base
+
+class VehicleTypeStats(Base):
+    """Resumen incremental de vehículos por tipo (cantidad y suma de kilometraje)."""
+    __tablename__ = "vehicle_type_stats"
+    
+    tipo = Column(String(30), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    kilometraje_total = Column(Float, nullable=False, default=0.0)
+    # Se incrementa en cada escritura que toca el tipo: la suma es la versión de la tabla vehicles
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
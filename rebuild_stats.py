@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir/reconciliar el resumen de estadísticas de vehículos
+(tabla vehicle_type_stats) a partir de la tabla vehicles.
+
+Uso:
+    python rebuild_stats.py          # reconstruir el resumen
+    python rebuild_stats.py --check  # solo reportar diferencias
+"""
+import sys
+from database.db import SessionLocal
+from controllers.vehicle_controller import vehicle_controller
+
+def rebuild_stats(apply: bool = True):
+    """Reconciliar el resumen de estadísticas y reportar diferencias."""
+    db = SessionLocal()
+    try:
+        differences = vehicle_controller.reconcile_stats(db, apply=apply)
+    finally:
+        db.close()
+    
+    for diff in differences:
+        print(f"⚠️  {diff['tipo']}: esperado {diff['esperado']}, actual {diff['actual']}")
+    if not differences:
+        print("✅ El resumen de estadísticas está al día")
+    elif apply:
+        print(f"✅ Resumen reconstruido ({len(differences)} tipos corregidos)")
+    return differences
+
+if __name__ == "__main__":
+    check_only = "--check" in sys.argv
+    try:
+        differences = rebuild_stats(apply=not check_only)
+    except Exception as e:
+        print(f"❌ Error al reconstruir estadísticas: {e}")
+        sys.exit(1)
+    sys.exit(1 if check_only and differences else 0)
@@ -1,2 +1,5 @@
 from .user_routes import router as user_router
 from .vehicle_routes import router as vehicle_router
+from .internal_routes import router as internal_router
+from .media_routes import router as media_router
+from .metrics_routes import router as metrics_router
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from controllers.user_controller import user_controller
+from database import db as database
+from database.pool_stats import pool_status
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["Interno"]
+)
+
+@router.get("/pool")
+async def estado_pool(current_user = Depends(user_controller.get_current_user)):
+    """
+    Estado de los pools de conexiones a la base de datos.
+    
+    Requiere autenticación.
+    
+    Por cada engine: conexiones en uso (`checked_out`), libres (`idle`),
+    `overflow`, contadores de eventos y el histograma de espera por una
+    conexión (`wait_seconds`).
+    """
+    return pool_status()
+
+@router.get("/replicas")
+async def estado_replicas(current_user = Depends(user_controller.get_current_user)):
+    """
+    Estado de las réplicas de lectura.
+    
+    Requiere autenticación.
+    
+    Por cada réplica: URL (sin contraseña), si está en la rotación y cuántos
+    segundos le quedan de exclusión tras un error de conexión.
+    """
+    return {
+        "sync": database.replicas.status() if database.replicas else [],
+        "async": database.async_replicas.status() if database.async_replicas else [],
+    }
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Header
+from typing import Optional
+from controllers.media_controller import media_controller
+
+router = APIRouter(
+    prefix="/media",
+    tags=["Imágenes"]
+)
+
+@router.api_route("/miniaturas/{nombre}", methods=["GET", "HEAD"])
+async def obtener_miniatura(
+    nombre: str,
+    range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Obtener la miniatura de una imagen.
+    
+    Pública (las imágenes se referencian desde `<img>`); el nombre es el hash
+    del contenido. Mientras la miniatura se genera se responde la original.
+    """
+    return await media_controller.serve_image_async(
+        nombre, thumbnail=True, range_header=range, if_none_match=if_none_match
+    )
+
+@router.api_route("/{nombre}", methods=["GET", "HEAD"])
+async def obtener_imagen(
+    nombre: str,
+    range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Obtener una imagen subida.
+    
+    Pública; admite `Range` (respuestas 206) y se cachea por un año
+    (`immutable`): si el contenido cambia, cambia el nombre.
+    """
+    return await media_controller.serve_image_async(nombre, range_header=range, if_none_match=if_none_match)
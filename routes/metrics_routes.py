@@ -0,0 +1,23 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from core.config import settings
+from core.metrics import registry
+
+router = APIRouter(tags=["Monitoreo"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Métricas de la aplicación en formato de texto de Prometheus."""
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Response(
+        content=registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,9 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from schemas.user import UserCreate, UserResponse, Token
 from controllers.user_controller import user_controller
-from database.db import get_db
+from database.db import get_session
 
 router = APIRouter(
     prefix="/auth",
@@ -11,7 +10,7 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db = Depends(get_session)):
     """
     Registrar un nuevo usuario.
     
@@ -19,17 +18,17 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     - **email**: Email del usuario
     - **password**: Contraseña del usuario
     """
-    return user_controller.register_user(user, db)
+    return await user_controller.register_user_async(user, db)
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_session)):
     """
     Login para obtener token de acceso.
     
     - **username**: Nombre de usuario
     - **password**: Contraseña
     """
-    return user_controller.login_user(form_data.username, form_data.password, db)
+    return await user_controller.login_user_async(form_data.username, form_data.password, db)
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(current_user = Depends(user_controller.get_current_user)):
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from schemas.vehicle import VehicleCreate, VehicleUpdate, VehicleResponse, VehicleStats
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, WebSocket, status
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+from core.config import settings
+from core.etag import etag_matches
+from core.ingest import detect_bulk_format
+from core.serialization import FastJSONResponse
+from schemas.vehicle import (
+    VehicleCreate, VehicleUpdate, VehiclePatch, VehicleResponse, VehicleStats, BulkInsertReport,
+    VehicleSearchPage, VehicleFacetedPage, VehicleImageUpload, VehicleBatchIds, VehicleBatchUpdate, VehicleBatchResult
+)
 from controllers.vehicle_controller import vehicle_controller
+from controllers.media_controller import media_controller
+from controllers.change_feed_controller import change_feed_controller
 from controllers.user_controller import user_controller
-from database.db import get_db
+from database.db import get_read_session, get_session
 
 router = APIRouter(
     prefix="/vehiculos",
@@ -14,7 +23,7 @@ router = APIRouter(
 @router.post("", response_model=VehicleResponse, status_code=201)
 async def crear_vehiculo(
     vehiculo: VehicleCreate,
-    db: Session = Depends(get_db),
+    db = Depends(get_session),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
@@ -28,26 +37,227 @@ async def crear_vehiculo(
     - **tipo**: Tipo de vehículo (sedán, SUV, etc.)
     - **kilometraje**: Kilometraje actual del vehículo
     """
-    return vehicle_controller.create_vehicle(vehiculo, db)
+    return await vehicle_controller.create_vehicle_async(vehiculo, db)
+
+@router.post("/bulk", response_model=BulkInsertReport)
+async def carga_masiva_vehiculos(
+    request: Request,
+    db = Depends(get_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Cargar vehículos de forma masiva desde CSV o NDJSON.
+    
+    Requiere autenticación.
+    
+    El cuerpo se procesa en streaming y se inserta por lotes. Enviar con
+    `Content-Type: text/csv` (primera línea con encabezado
+    `marca,modelo,año,tipo,kilometraje,imagen_url`) o `application/x-ndjson`
+    (un objeto JSON por línea). Retorna los errores por número de línea.
+    """
+    formato = detect_bulk_format(request.headers.get("content-type"))
+    if formato is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Formato no soportado, use text/csv o application/x-ndjson"
+        )
+    return await vehicle_controller.bulk_ingest_async(request.stream(), formato, db)
+
+@router.post("/batch-get", response_model=VehicleBatchResult)
+async def obtener_vehiculos_lote(
+    lote: VehicleBatchIds,
+    db = Depends(get_read_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Obtener varios vehículos por ID en una sola consulta.
+    
+    Requiere autenticación.
+    
+    - **ids**: IDs a obtener (hasta VEHICLES_BATCH_MAX_ITEMS)
+    
+    Retorna un resultado por ID en el orden pedido, con `status` 200 o 404.
+    """
+    return await vehicle_controller.batch_get_vehicles_async(lote.ids, db)
+
+@router.post("/batch-update", response_model=VehicleBatchResult)
+async def actualizar_vehiculos_lote(
+    lote: VehicleBatchUpdate,
+    db = Depends(get_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Actualizar varios vehículos en una sola transacción.
+    
+    Requiere autenticación.
+    
+    - **items**: Un objeto por vehículo con `id` y los campos a modificar
+      (como en `PATCH /vehiculos/{id}`); cada ID una sola vez
+    
+    Retorna un resultado por ítem, con `status` 200 o 404.
+    """
+    return await vehicle_controller.batch_update_vehicles_async(lote.items, db)
+
+@router.post("/batch-delete", response_model=VehicleBatchResult)
+async def eliminar_vehiculos_lote(
+    lote: VehicleBatchIds,
+    db = Depends(get_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Eliminar varios vehículos en una sola transacción.
+    
+    Requiere autenticación.
+    
+    - **ids**: IDs a eliminar (hasta VEHICLES_BATCH_MAX_ITEMS)
+    
+    Retorna un resultado por ID, con `status` 200 o 404.
+    """
+    return await vehicle_controller.batch_delete_vehicles_async(lote.ids, db)
+
+@router.get("/cambios")
+async def cambios_vehiculos(
+    tipo: Optional[str] = Query(None, description="Solo cambios de este tipo de vehículo"),
+    desde: Optional[str] = Query(None, description="Retomar después de este ID de evento"),
+    last_event_id: Optional[str] = Header(None),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Suscribirse a los cambios de vehículos por Server-Sent Events.
+    
+    Requiere autenticación.
+    
+    - **tipo**: Mismo filtro que el listado; incluye los vehículos que dejan
+      de ser de ese tipo (campo `tipo_anterior`)
+    - **desde**: ID del último evento recibido (o cabecera `Last-Event-ID`)
+    
+    Eventos `creado`, `actualizado` (con el vehículo) y `eliminado`. Un evento
+    `recargar` indica que el cliente debe volver a pedir el listado y seguir
+    desde el ID de ese evento.
+    """
+    return change_feed_controller.sse_response(tipo, desde or last_event_id)
 
-@router.get("", response_model=List[VehicleResponse])
+@router.websocket("/cambios/ws")
+async def cambios_vehiculos_ws(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    tipo: Optional[str] = Query(None),
+    desde: Optional[str] = Query(None)
+):
+    """Cambios de vehículos por WebSocket (mismos eventos que GET /vehiculos/cambios)."""
+    await change_feed_controller.serve_websocket(websocket, token, tipo, desde)
+
+@router.get("", response_model=Union[List[VehicleResponse], VehicleFacetedPage])
 async def listar_vehiculos(
     tipo: Optional[str] = Query(None, description="Filtrar por tipo de vehículo"),
-    db: Session = Depends(get_db),
+    limit: int = Query(
+        settings.VEHICLES_PAGE_SIZE,
+        ge=1,
+        le=settings.VEHICLES_MAX_PAGE_SIZE,
+        description="Cantidad máxima de vehículos por página"
+    ),
+    after: Optional[str] = Query(None, description="Cursor de la página siguiente (header X-Next-Cursor)"),
+    stream: bool = Query(False, description="Transmitir todos los resultados como NDJSON"),
+    facetas: bool = Query(False, description="Incluir conteos por tipo, marca y rango de años"),
+    accept_encoding: Optional[str] = Header(None),
+    db = Depends(get_read_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Listar vehículos con paginación por cursor.
+    
+    Requiere autenticación.
+    
+    - **tipo** (opcional): Filtrar por tipo de vehículo
+    - **limit** (opcional): Tamaño de página
+    - **after** (opcional): Cursor devuelto en el header `X-Next-Cursor`
+    - **stream** (opcional): Devolver todos los resultados como NDJSON (`application/x-ndjson`)
+    - **facetas** (opcional): Responder `{"items": [...], "facetas": {...}}` con los
+      conteos del filtro actual (cacheados unos segundos)
+    
+    Las páginas se sirven desde una caché en memoria mientras no haya
+    escrituras de vehículos, comprimidas con gzip si el cliente envía
+    `Accept-Encoding: gzip`.
+    """
+    if stream:
+        return StreamingResponse(
+            vehicle_controller.stream_vehicles(tipo=tipo, after=after),
+            media_type="application/x-ndjson"
+        )
+    
+    if facetas:
+        # Las filas ya vienen proyectadas a dicts: se serializan directo, sin validar de nuevo con response_model
+        vehicles, next_cursor = await vehicle_controller.get_vehicles_page_async(db, tipo=tipo, limit=limit, after=after)
+        facets = await vehicle_controller.get_vehicle_facets_async(db, tipo=tipo)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return FastJSONResponse({"items": vehicles, "facetas": facets}, headers=headers)
+    
+    # Cuerpo ya serializado (y comprimido) desde la caché por versión de la tabla
+    body, next_cursor, compressed = await vehicle_controller.get_vehicles_page_body_async(
+        db, tipo=tipo, limit=limit, after=after, accept_gzip="gzip" in (accept_encoding or "")
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/buscar", response_model=VehicleSearchPage)
+async def buscar_vehiculos(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar en marca, modelo y tipo"),
+    limit: int = Query(
+        settings.VEHICLES_PAGE_SIZE,
+        ge=1,
+        le=settings.VEHICLES_MAX_PAGE_SIZE,
+        description="Cantidad máxima de resultados"
+    ),
+    offset: int = Query(0, ge=0, description="Desplazamiento (ver next_offset)"),
+    db = Depends(get_read_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Buscar vehículos por marca, modelo o tipo.
+    
+    Requiere autenticación.
+    
+    - **q**: Texto a buscar (subcadena, tolera errores de tipeo)
+    - **limit** (opcional): Tamaño de página
+    - **offset** (opcional): Desplazamiento devuelto en `next_offset`
+    """
+    return await vehicle_controller.search_vehicles_async(q, db, limit=limit, offset=offset)
+
+@router.get("/export")
+async def exportar_vehiculos(
+    formato: Literal["csv", "ndjson"] = Query("csv", description="Formato de exportación"),
+    tipo: Optional[str] = Query(None, description="Filtrar por tipo de vehículo"),
+    año: Optional[int] = Query(None, description="Filtrar por año de fabricación"),
+    gzip: bool = Query(False, description="Comprimir la respuesta con gzip"),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
-    Listar todos los vehículos.
+    Exportar vehículos como CSV o NDJSON en streaming.
     
     Requiere autenticación.
     
+    - **formato**: `csv` o `ndjson`
     - **tipo** (opcional): Filtrar por tipo de vehículo
+    - **año** (opcional): Filtrar por año de fabricación
+    - **gzip** (opcional): Enviar el contenido comprimido (`Content-Encoding: gzip`)
     """
-    return vehicle_controller.get_all_vehicles(db, tipo=tipo)
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="vehiculos.{formato}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        vehicle_controller.export_vehicles(formato=formato, tipo=tipo, año=año, compress=gzip),
+        media_type=media_type,
+        headers=headers
+    )
 
 @router.get("/promedio-km", response_model=VehicleStats)
 async def promedio_kilometraje(
-    db: Session = Depends(get_db),
+    db = Depends(get_read_session),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
@@ -57,12 +267,13 @@ async def promedio_kilometraje(
     
     Retorna el promedio de kilometraje y el total de vehículos.
     """
-    return vehicle_controller.get_vehicle_stats(db)
+    return await vehicle_controller.get_vehicle_stats_async(db)
 
 @router.get("/{vehiculo_id}", response_model=VehicleResponse)
 async def obtener_vehiculo(
     vehiculo_id: int,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_read_session),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
@@ -71,14 +282,21 @@ async def obtener_vehiculo(
     Requiere autenticación.
     
     - **vehiculo_id**: ID del vehículo
+    
+    La respuesta incluye un `ETag`; si se envía en `If-None-Match` y el
+    vehículo no cambió, se responde `304 Not Modified` sin cuerpo.
     """
-    return vehicle_controller.get_vehicle_by_id(vehiculo_id, db)
+    body, etag = await vehicle_controller.get_vehicle_payload_async(vehiculo_id, db)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.put("/{vehiculo_id}", response_model=VehicleResponse)
 async def actualizar_vehiculo(
     vehiculo_id: int,
     vehiculo: VehicleUpdate,
-    db: Session = Depends(get_db),
+    db = Depends(get_session),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
@@ -89,12 +307,50 @@ async def actualizar_vehiculo(
     - **vehiculo_id**: ID del vehículo a actualizar
     - **vehiculo**: Datos actualizados del vehículo
     """
-    return vehicle_controller.update_vehicle(vehiculo_id, vehiculo, db)
+    return await vehicle_controller.update_vehicle_async(vehiculo_id, vehiculo, db)
+
+@router.patch("/{vehiculo_id}", response_model=VehicleResponse)
+async def actualizar_vehiculo_parcial(
+    vehiculo_id: int,
+    vehiculo: VehiclePatch,
+    db = Depends(get_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Actualizar solo los campos enviados de un vehículo.
+    
+    Requiere autenticación.
+    
+    - **vehiculo_id**: ID del vehículo a actualizar
+    - **vehiculo**: Campos a modificar (p. ej. solo `kilometraje`)
+    """
+    return await vehicle_controller.patch_vehicle_async(vehiculo_id, vehiculo, db)
+
+@router.post("/{vehiculo_id}/imagen", response_model=VehicleImageUpload)
+async def subir_imagen_vehiculo(
+    vehiculo_id: int,
+    imagen: UploadFile = File(..., description="Imagen JPEG, PNG, GIF o WebP"),
+    db = Depends(get_session),
+    current_user = Depends(user_controller.get_current_user)
+):
+    """
+    Subir la imagen de un vehículo.
+    
+    Requiere autenticación.
+    
+    - **vehiculo_id**: ID del vehículo
+    - **imagen**: Archivo (multipart/form-data)
+    
+    La imagen se guarda en el servidor (una sola copia por contenido) y
+    `imagen_url` pasa a apuntar a `/media/...`. La miniatura queda disponible
+    en `miniatura_url` una vez generada.
+    """
+    return await media_controller.upload_vehicle_image_async(vehiculo_id, imagen, db)
 
 @router.delete("/{vehiculo_id}")
 async def eliminar_vehiculo(
     vehiculo_id: int,
-    db: Session = Depends(get_db),
+    db = Depends(get_session),
     current_user = Depends(user_controller.get_current_user)
 ):
     """
@@ -104,4 +360,4 @@ async def eliminar_vehiculo(
     
     - **vehiculo_id**: ID del vehículo a eliminar
     """
-    return vehicle_controller.delete_vehicle(vehiculo_id, db)
+    return await vehicle_controller.delete_vehicle_async(vehiculo_id, db)
@@ -1,2 +1,2 @@
 from .user import UserCreate, UserResponse, Token
-from .vehicle import VehicleCreate, VehicleResponse, VehicleStats
+from .vehicle import VehicleCreate, VehicleResponse, VehicleStats, VehicleTypeStat
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional
+from pydantic import BaseModel, Field, HttpUrl, computed_field, field_validator
+from typing import List, Optional
+from core.config import settings
+from core.media import thumbnail_url
 
 class VehicleBase(BaseModel):
     """Schema base para vehículo."""
@@ -18,14 +20,135 @@ class VehicleUpdate(VehicleBase):
     """Schema para actualizar vehículo."""
     pass
 
+class VehiclePatch(BaseModel):
+    """Schema para actualización parcial: solo se modifican los campos enviados."""
+    marca: Optional[str] = Field(None, description="Marca del vehículo")
+    modelo: Optional[str] = Field(None, description="Modelo del vehículo")
+    año: Optional[int] = Field(None, gt=1900, lt=2100, description="Año de fabricación")
+    tipo: Optional[str] = Field(None, description="Tipo de vehículo (sedán, SUV, etc.)")
+    kilometraje: Optional[float] = Field(None, ge=0, description="Kilometraje del vehículo")
+    imagen_url: Optional[str] = Field(None, description="URL de la imagen del vehículo")
+    
+    @field_validator("marca", "modelo", "año", "tipo", "kilometraje")
+    @classmethod
+    def _not_null(cls, value):
+        """Solo imagen_url admite null; el resto se omite si no cambia."""
+        if value is None:
+            raise ValueError("no puede ser nulo")
+        return value
+
 class VehicleResponse(VehicleBase):
     """Schema de respuesta para vehículo."""
     id: int = Field(..., description="ID único del vehículo")
     
+    @computed_field(description="URL de la miniatura (solo imágenes subidas a la API)")
+    @property
+    def miniatura_url(self) -> Optional[str]:
+        return thumbnail_url(self.imagen_url)
+    
     class Config:
         from_attributes = True
 
+class VehicleBatchIds(BaseModel):
+    """IDs de vehículos para una operación por lote (los repetidos se procesan una vez)."""
+    ids: List[int] = Field(
+        ..., min_length=1, max_length=settings.VEHICLES_BATCH_MAX_ITEMS, description="IDs de vehículos"
+    )
+
+class VehicleBatchUpdateItem(VehiclePatch):
+    """Cambios de un vehículo dentro de un lote (solo se modifican los campos enviados)."""
+    id: int = Field(..., description="ID del vehículo")
+
+class VehicleBatchUpdate(BaseModel):
+    """Cambios de varios vehículos aplicados en una sola transacción."""
+    items: List[VehicleBatchUpdateItem] = Field(
+        ..., min_length=1, max_length=settings.VEHICLES_BATCH_MAX_ITEMS, description="Cambios por vehículo"
+    )
+    
+    @field_validator("items")
+    @classmethod
+    def _unique_ids(cls, items):
+        """Un vehículo solo puede aparecer una vez por lote."""
+        seen = set()
+        for item in items:
+            if item.id in seen:
+                raise ValueError(f"ID repetido en el lote: {item.id}")
+            seen.add(item.id)
+        return items
+
+class VehicleBatchItemResult(BaseModel):
+    """Resultado de un vehículo dentro de una operación por lote."""
+    id: int = Field(..., description="ID del vehículo")
+    status: int = Field(..., description="Código HTTP del ítem (200 o 404)")
+    vehiculo: Optional[VehicleResponse] = Field(None, description="Vehículo (lecturas y actualizaciones)")
+    error: Optional[str] = Field(None, description="Motivo si el ítem falló")
+
+class VehicleBatchResult(BaseModel):
+    """Resultado por ítem de una operación por lote, en el orden pedido."""
+    items: List[VehicleBatchItemResult] = Field(default_factory=list, description="Resultados por ítem")
+
+class VehicleImageUpload(BaseModel):
+    """Resultado de subir la imagen de un vehículo."""
+    vehiculo: VehicleResponse = Field(..., description="Vehículo con imagen_url actualizada")
+    imagen_url: str = Field(..., description="URL de la imagen")
+    miniatura_url: str = Field(..., description="URL de la miniatura")
+    duplicada: bool = Field(..., description="La imagen ya estaba guardada y se reutilizó")
+
+class VehicleFacetCount(BaseModel):
+    """Cantidad de vehículos con un valor de faceta."""
+    valor: str = Field(..., description="Valor (tipo o marca)")
+    total: int = Field(..., description="Vehículos con ese valor")
+
+class VehicleYearFacetCount(BaseModel):
+    """Cantidad de vehículos en un rango de años."""
+    desde: int = Field(..., description="Primer año del rango")
+    hasta: int = Field(..., description="Último año del rango")
+    total: int = Field(..., description="Vehículos en el rango")
+
+class VehicleFacets(BaseModel):
+    """Conteos por faceta de los vehículos que cumplen el filtro."""
+    total: int = Field(..., description="Vehículos que cumplen el filtro")
+    tipo: List[VehicleFacetCount] = Field(default_factory=list, description="Conteo por tipo")
+    marca: List[VehicleFacetCount] = Field(default_factory=list, description="Conteo por marca")
+    año: List[VehicleYearFacetCount] = Field(default_factory=list, description="Conteo por rango de años")
+
+class VehicleFacetedPage(BaseModel):
+    """Página del listado junto con los conteos por faceta del filtro."""
+    items: List[VehicleResponse] = Field(default_factory=list, description="Vehículos de la página")
+    facetas: VehicleFacets = Field(..., description="Conteos por faceta")
+
+class VehicleSearchHit(VehicleResponse):
+    """Schema de un resultado de búsqueda de vehículos."""
+    score: float = Field(..., description="Relevancia del resultado (mayor es mejor)")
+
+class VehicleSearchPage(BaseModel):
+    """Página de resultados de búsqueda ordenados por relevancia."""
+    items: List[VehicleSearchHit] = Field(default_factory=list, description="Resultados")
+    limit: int = Field(..., description="Tamaño de página")
+    offset: int = Field(..., description="Desplazamiento de esta página")
+    next_offset: Optional[int] = Field(None, description="Desplazamiento de la página siguiente")
+
+class VehicleTypeStat(BaseModel):
+    """Schema para estadísticas de un tipo de vehículo."""
+    tipo: str = Field(..., description="Tipo de vehículo")
+    promedio_kilometraje: float = Field(..., description="Promedio de kilometraje")
+    total_vehiculos: int = Field(..., description="Total de vehículos del tipo")
+
 class VehicleStats(BaseModel):
     """Schema para estadísticas de vehículos."""
     promedio_kilometraje: float = Field(..., description="Promedio de kilometraje")
     total_vehiculos: int = Field(..., description="Total de vehículos")
+    por_tipo: List[VehicleTypeStat] = Field(default_factory=list, description="Estadísticas por tipo")
+
+class BulkRowError(BaseModel):
+    """Error de validación o inserción de una fila en la carga masiva."""
+    fila: int = Field(..., description="Número de línea en el archivo enviado")
+    error: str = Field(..., description="Descripción del error")
+
+class BulkInsertReport(BaseModel):
+    """Resultado de una carga masiva de vehículos."""
+    insertados: int = Field(..., description="Filas insertadas")
+    rechazados: int = Field(..., description="Filas con errores")
+    errores: List[BulkRowError] = Field(default_factory=list, description="Detalle de errores (acotado)")
+    segundos: float = Field(..., description="Duración de la carga")
+    filas_por_segundo: float = Field(..., description="Throughput de inserción")
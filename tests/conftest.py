@@ -0,0 +1,58 @@
+"""
+Configuración común de las pruebas.
+
+Se usan bases SQLite en un directorio temporal y DB_ASYNC activo, para
+ejercitar también el camino AsyncSession (run_sync). Las variables de entorno
+se fijan antes de importar la aplicación porque Settings se lee al importar.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+
+TEST_DIR = tempfile.mkdtemp(prefix="vehiculos-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/primary.db"
+os.environ["DB_ASYNC"] = "true"
+os.environ["MEDIA_ROOT"] = os.path.join(TEST_DIR, "media")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from database.db import dispose_engines, init_db
+
+init_db()
+
+def run(coro):
+    """Ejecutar una corrutina en un loop propio y cerrar luego las conexiones async."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await dispose_engines()
+    return asyncio.run(main())
+
+@asynccontextmanager
+async def api_client():
+    """Cliente HTTP contra la aplicación (ASGI, sin red)."""
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+async def auth_headers(client: httpx.AsyncClient) -> dict:
+    """Registrar un usuario nuevo y retornar su cabecera Authorization."""
+    username = f"u{uuid.uuid4().hex[:12]}"
+    response = await client.post(
+        "/auth/register",
+        json={"username": username, "email": f"{username}@example.com", "password": "secreta123"}
+    )
+    assert response.status_code == 201, response.text
+    response = await client.post("/auth/token", data={"username": username, "password": "secreta123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def test_dir() -> str:
+    return TEST_DIR
@@ -0,0 +1,33 @@
+"""
+Límite por cliente (TokenBucketLimiter) con pocas ranuras, para forzar
+colisiones de hash.
+"""
+import os
+from core.admission import TokenBucketLimiter
+
+def test_clients_in_the_same_slot_do_not_share_quota():
+    limiter = TokenBucketLimiter(rate=0.001, burst=2, slots=1)
+    assert limiter.acquire("cliente-a") == 0
+    assert limiter.acquire("cliente-a") == 0
+    assert limiter.acquire("cliente-a") > 0
+    # Misma (única) ranura: el otro cliente empieza con su bucket lleno
+    assert limiter.acquire("cliente-b") == 0
+    assert limiter.acquire("cliente-b") == 0
+    assert limiter.acquire("cliente-b") > 0
+
+def test_colliding_clients_keep_their_own_buckets_with_probing():
+    limiter = TokenBucketLimiter(rate=0.001, burst=1, slots=4)
+    clients = [f"cliente-{index}" for index in range(4)]
+    for client in clients:
+        assert limiter.acquire(client) == 0
+    for client in clients:
+        assert limiter.acquire(client) > 0
+
+def test_quota_is_shared_across_forked_workers():
+    limiter = TokenBucketLimiter(rate=0.001, burst=1, slots=16)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if limiter.acquire("cliente") == 0 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert limiter.acquire("cliente") > 0
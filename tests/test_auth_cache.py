@@ -0,0 +1,47 @@
+"""
+Caché del usuario autenticado: un cambio hecho en otro worker (un proceso
+creado con fork) la invalida sin esperar a AUTH_CACHE_TTL_SECONDS.
+"""
+import os
+from conftest import api_client, auth_headers, run
+from database.db import SessionLocal, engine
+from models.user import User
+
+async def _login():
+    async with api_client() as client:
+        headers = await auth_headers(client)
+        response = await client.get("/auth/me", headers=headers)
+        assert response.status_code == 200
+        return headers, response.json()
+
+async def _me(headers: dict):
+    async with api_client() as client:
+        return await client.get("/auth/me", headers=headers)
+
+def _change_email_in_another_worker(username: str, email: str) -> None:
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            # Conexiones propias, como hace post_fork en cada worker
+            engine.dispose(close=False)
+            with SessionLocal() as db:
+                db.query(User).filter(User.username == username).one().email = email
+                db.commit()
+            status = 0
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+def test_change_in_another_worker_invalidates_cached_principal():
+    headers, me = run(_login())
+    # Cacheado en este proceso: no cambia sin una invalidación
+    assert run(_me(headers)).json() == me
+    _change_email_in_another_worker(me["username"], f"nuevo-{me['email']}")
+    assert run(_me(headers)).json()["email"] == f"nuevo-{me['email']}"
+
+def test_invalid_token_is_rejected():
+    response = run(_me({"Authorization": "Bearer no-es-un-jwt"}))
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
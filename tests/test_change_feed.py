@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from core.changefeed import RELOAD, ChangeBroadcaster
+from database.change_notify import ChangeListener, NotifyPublisher, encode_change
+
+def _workers(count: int = 2):
+    """Broadcaster y listener por worker, ya alineados con la secuencia en 0."""
+    workers = []
+    for _ in range(count):
+        broadcaster = ChangeBroadcaster(buffer_size=100, queue_size=10)
+        listener = ChangeListener(None, broadcaster)
+        broadcaster.reset_stream(0, "listener")
+        listener._last_seq = 0
+        workers.append((broadcaster, listener))
+    return workers
+
+def _notify(workers, seq: int, op: str, data: dict, tipos=("SUV",)) -> None:
+    """El mismo aviso llega a todos los workers, como hace PostgreSQL."""
+    payload = f"{seq} {encode_change(op, data, tipos)}"
+    for _, listener in workers:
+        listener._handle(payload)
+
+def _updated(vehicle_id: int, version: int, km: float) -> dict:
+    return {"id": vehicle_id, "tipo": "SUV", "version": version, "vehiculo": {"id": vehicle_id, "kilometraje": km}}
+
+def _collect(broadcaster: ChangeBroadcaster, last_event_id=None, during=None) -> list:
+    """Eventos que recibe un suscriptor hasta que el feed queda en silencio."""
+    async def run():
+        events = []
+        pending = during
+        subscription = broadcaster.subscribe(None, last_event_id, heartbeat=0.05)
+        async for event in subscription:
+            if event is None:
+                if pending is None:
+                    break
+                pending()
+                pending = None
+                continue
+            events.append(event)
+        await subscription.aclose()
+        return events
+    return asyncio.run(run())
+
+def test_event_ids_are_shared_and_resume_on_another_worker():
+    workers = _workers()
+    for seq in range(1, 4):
+        _notify(workers, seq, "actualizado", _updated(seq, 2, seq))
+    (worker_a, _), (worker_b, _) = workers
+    assert [e.id for e in worker_a._buffer] == [e.id for e in worker_b._buffer] == ["1", "2", "3"]
+    
+    # El cliente vio el evento 1 en el worker A y reconecta contra el B
+    events = _collect(worker_b, "1")
+    assert [(e.id, e.op) for e in events] == [("2", "actualizado"), ("3", "actualizado")]
+
+def test_stale_events_are_dropped_per_vehicle():
+    workers = _workers(1)
+    broadcaster, _ = workers[0]
+    _notify(workers, 1, "actualizado", _updated(7, 3, 30.0))
+    # Escritura anterior avisada después (publicada tras el commit, fuera de orden)
+    _notify(workers, 2, "actualizado", _updated(7, 2, 20.0))
+    _notify(workers, 3, "eliminado", {"id": 7, "tipo": "SUV", "version": 3})
+    _notify(workers, 4, "actualizado", _updated(7, 3, 30.0))
+    assert [(e.id, e.op) for e in broadcaster._buffer] == [("1", "actualizado"), ("3", "eliminado")]
+
+def test_gap_in_sequence_sends_reload_and_breaks_older_resumes():
+    workers = _workers(1)
+    broadcaster, _ = workers[0]
+    _notify(workers, 1, "creado", _updated(1, 1, 0.0))
+    
+    events = _collect(broadcaster, "1", during=lambda: _notify(workers, 4, "creado", _updated(2, 1, 0.0)))
+    assert [(e.id, e.op) for e in events][:2] == [("3", RELOAD), ("4", "creado")]
+    # Quien vio el 1 no puede retomar: faltan el 2 y el 3
+    assert [e.op for e in _collect(broadcaster, "1")] == [RELOAD]
+    assert _collect(broadcaster, "3")[0].id == "4"
+
+def test_client_ahead_of_this_worker_waits_for_newer_events():
+    workers = _workers(1)
+    broadcaster, _ = workers[0]
+    _notify(workers, 1, "creado", _updated(1, 1, 0.0))
+    # Otro worker ya le entregó el 2; aquí todavía no llegó
+    events = _collect(broadcaster, "2", during=lambda: _notify(workers, 2, "creado", _updated(2, 1, 0.0)))
+    assert events == []
+
+class _FakeEngine:
+    """Engine que registra los lotes enviados por el publicador."""
+    
+    def __init__(self):
+        self.batches = []
+        self.sent = threading.Event()
+    
+    @contextmanager
+    def begin(self):
+        engine = self
+        
+        class Connection:
+            def execute(self, stmt, params=None):
+                if params and "payloads" in params:
+                    engine.batches.append(params["payloads"])
+                    engine.sent.set()
+        yield Connection()
+
+def test_publisher_sends_after_commit_in_submission_order():
+    engine = _FakeEngine()
+    publisher = NotifyPublisher(engine)
+    for vehicle_id in range(1, 4):
+        publisher.submit([("creado", {"id": vehicle_id, "version": 1}, ("SUV",))])
+    publisher.close()
+    sent = [payload for batch in engine.batches for payload in batch]
+    assert sent == [encode_change("creado", {"id": i, "version": 1}, ("SUV",)) for i in range(1, 4)]
@@ -0,0 +1,54 @@
+import io
+import uuid
+from PIL import Image
+from conftest import api_client, auth_headers, run
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_uploaded_image_thumbnail_is_exposed_in_list_and_detail():
+    async def scenario():
+        async with api_client() as client:
+            headers = await auth_headers(client)
+            tipo = f"T{uuid.uuid4().hex[:8]}"
+            data = {"marca": "Fiat", "modelo": "Uno", "año": 2010, "tipo": tipo, "kilometraje": 5.0}
+            vehicle = (await client.post("/vehiculos", json=data, headers=headers)).json()
+            assert vehicle["miniatura_url"] is None
+
+            upload = await client.post(
+                f"/vehiculos/{vehicle['id']}/imagen",
+                files={"imagen": ("auto.png", _png(), "image/png")},
+                headers=headers
+            )
+            assert upload.status_code == 200, upload.text
+            thumbnail = upload.json()["miniatura_url"]
+            assert thumbnail.startswith("/media/miniaturas/")
+
+            detail = (await client.get(f"/vehiculos/{vehicle['id']}", headers=headers)).json()
+            listed = (await client.get("/vehiculos", params={"tipo": tipo}, headers=headers)).json()
+            assert detail["miniatura_url"] == thumbnail
+            assert [item["miniatura_url"] for item in listed] == [thumbnail]
+
+            # La ruta de la miniatura está registrada (mientras se genera responde la original)
+            response = await client.get(thumbnail)
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "image/png"
+
+    run(scenario())
+
+def test_external_image_url_has_no_thumbnail():
+    async def scenario():
+        async with api_client() as client:
+            headers = await auth_headers(client)
+            data = {
+                "marca": "Fiat", "modelo": "Uno", "año": 2010, "tipo": "Sedan", "kilometraje": 5.0,
+                "imagen_url": "https://example.com/auto.png",
+            }
+            vehicle = (await client.post("/vehiculos", json=data, headers=headers)).json()
+            detail = (await client.get(f"/vehiculos/{vehicle['id']}", headers=headers)).json()
+            assert vehicle["miniatura_url"] is None
+            assert detail["miniatura_url"] is None
+
+    run(scenario())
@@ -0,0 +1,61 @@
+"""
+Registro de métricas en modo multiproceso: un worker creado con fork
+escribe sus métricas y el proceso que atiende /metrics las suma.
+"""
+import os
+from core.metrics import MetricsRegistry
+
+def _fork(child) -> int:
+    """Ejecutar `child` en otro proceso (como un worker de gunicorn) y esperarlo."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            child()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+def _registry(test_dir: str, name: str):
+    registry = MetricsRegistry(os.path.join(test_dir, name))
+    requests = registry.counter("requests_total", "Peticiones", ("route",))
+    latency = registry.histogram("latency_seconds", "Latencia", ("route",), buckets=(0.1, 1.0))
+    in_flight = {"value": 0}
+    registry.callback("in_flight", "En curso", "gauge", lambda: [f"in_flight {in_flight['value']}"])
+    return registry, requests, latency, in_flight
+
+def test_counters_and_histograms_are_summed_across_workers(test_dir):
+    registry, requests, latency, _ = _registry(test_dir, "metrics-sum")
+    requests.inc("/a")
+    latency.observe("/a", value=0.05)
+
+    def worker():
+        for _ in range(3):
+            requests.inc("/a")
+        requests.inc("/b")
+        latency.observe("/a", value=0.5)
+
+    _fork(worker)
+    lines = registry.render().splitlines()
+    assert 'requests_total{route="/a"} 4.0' in lines
+    assert 'requests_total{route="/b"} 1.0' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_count{route="/a"} 2' in lines
+    assert 'latency_seconds_sum{route="/a"} 0.55' in lines
+
+def test_gauges_are_exposed_per_worker(test_dir):
+    registry, _, _, in_flight = _registry(test_dir, "metrics-gauges")
+    in_flight["value"] = 2
+
+    def worker():
+        in_flight["value"] = 7
+        registry.write_worker_snapshot()
+
+    pid = _fork(worker)
+    lines = registry.render().splitlines()
+    assert f'in_flight{{worker="{os.getpid()}"}} 2' in lines
+    assert f'in_flight{{worker="{pid}"}} 7' in lines
+    # Un worker que terminó deja de exponer sus gauges
+    registry.mark_process_dead(pid)
+    assert f'in_flight{{worker="{pid}"}} 7' not in registry.render().splitlines()
@@ -0,0 +1,89 @@
+"""
+Réplicas de lectura con dos bases SQLite: el primario de las pruebas y un
+archivo aparte como réplica, con una fila que solo existe en cada una para
+saber de dónde leyó cada sesión.
+"""
+import os
+import uuid
+import pytest
+from sqlalchemy import create_engine, text
+from database import db as db_module
+from database.db import Base, engine
+from database.replicas import ReplicaSet, mark_recent_write, wrote_recently
+
+def _insert_marker(target, marca: str) -> None:
+    with target.begin() as connection:
+        connection.execute(
+            text("INSERT INTO vehicles (marca, modelo, año, tipo, kilometraje, version) "
+                 "VALUES (:marca, 'M', 2020, 'SUV', 0, 1)"),
+            {"marca": marca},
+        )
+
+def _read_source(principal=None) -> str:
+    """De qué base leyó una sesión de get_read_db: 'replica' o 'primario'."""
+    session = db_module.get_read_db(principal)
+    db = next(session)
+    try:
+        marcas = set(db.execute(text("SELECT marca FROM vehicles WHERE marca IN ('SoloReplica', 'SoloPrimario')")).scalars())
+        assert len(marcas) == 1
+        source = "replica" if marcas == {"SoloReplica"} else "primario"
+        assert db_module.is_replica_session(db) == (source == "replica")
+        return source
+    finally:
+        session.close()
+
+@pytest.fixture(scope="module")
+def replica_engine(test_dir):
+    replica = create_engine(f"sqlite:///{test_dir}/replica.db")
+    Base.metadata.create_all(bind=replica)
+    _insert_marker(replica, "SoloReplica")
+    _insert_marker(engine, "SoloPrimario")
+    yield replica
+    replica.dispose()
+
+@pytest.fixture
+def replica_set(monkeypatch, replica_engine):
+    replica_set = ReplicaSet([replica_engine], eject_seconds=30.0)
+    monkeypatch.setattr(db_module, "replicas", replica_set)
+    return replica_set
+
+def test_reads_go_to_the_replica(replica_set):
+    assert _read_source() == "replica"
+    assert _read_source(f"lector-{uuid.uuid4().hex}") == "replica"
+
+def test_client_that_wrote_reads_from_the_primary(replica_set):
+    principal = f"escritor-{uuid.uuid4().hex}"
+    mark_recent_write(principal)
+    assert _read_source(principal) == "primario"
+    assert _read_source(f"otro-{uuid.uuid4().hex}") == "replica"
+
+def test_failing_replica_is_ejected_by_handle_error(monkeypatch, test_dir, replica_engine):
+    broken = create_engine(f"sqlite:///{test_dir}/no-existe/replica.db")
+    replica_set = ReplicaSet([broken, replica_engine], eject_seconds=30.0)
+    monkeypatch.setattr(db_module, "replicas", replica_set)
+    # Primera lectura en la réplica rota: el error de conexión la excluye
+    with pytest.raises(Exception):
+        _read_source()
+    assert [replica["disponible"] for replica in replica_set.status()] == [False, True]
+    assert {_read_source() for _ in range(4)} == {"replica"}
+
+def test_all_replicas_ejected_falls_back_to_the_primary(replica_set):
+    replica_set.eject(0)
+    assert replica_set.choose() is None
+    assert _read_source() == "primario"
+    replica_set.eject_seconds = 0.0
+    replica_set.eject(0)
+    assert _read_source() == "replica"
+
+def test_read_your_writes_mark_is_shared_across_forked_workers(replica_set):
+    principal = f"escritor-{uuid.uuid4().hex}"
+    assert not wrote_recently(principal)
+    pid = os.fork()
+    if pid == 0:
+        # "Otro worker": escribe y termina sin pasar por pytest
+        mark_recent_write(principal)
+        os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert wrote_recently(principal)
+    assert _read_source(principal) == "primario"
@@ -0,0 +1,43 @@
+import asyncio
+import sys
+import threading
+from conftest import api_client, auth_headers, run
+from controllers.vehicle_controller import vehicle_controller
+from database.db import SessionLocal
+
+# El paquete controllers expone la instancia con el mismo nombre que el módulo
+vehicle_module = sys.modules["controllers.vehicle_controller"]
+
+def _load_vehicles(count: int) -> None:
+    rows = [
+        {"marca": f"Marca{i % 50}", "modelo": f"Modelo{i % 200}", "año": 2000 + i % 20,
+         "tipo": ("SUV", "Sedan", "Pickup")[i % 3], "kilometraje": float(i), "imagen_url": None}
+        for i in range(count)
+    ]
+    with SessionLocal() as db:
+        vehicle_controller.bulk_insert_vehicles(rows, db)
+
+def test_concurrent_async_searches_rebuild_index_without_blocking_loop():
+    """Varias búsquedas con el índice vencido no deben trabar el event loop (DB_ASYNC)."""
+    _load_vehicles(30000)
+    vehicle_module._search_index.invalidate()
+    results = {}
+    
+    async def searches():
+        async with api_client() as client:
+            headers = await auth_headers(client)
+            vehicle_module._search_index.invalidate()
+            responses = await asyncio.wait_for(asyncio.gather(*(
+                client.get("/vehiculos/buscar", params={"q": "modelo1"}, headers=headers)
+                for _ in range(4)
+            )), 20)
+            results["status"] = [r.status_code for r in responses]
+            results["items"] = [len(r.json()["items"]) for r in responses]
+    
+    # En un hilo aparte: si el loop se bloquea, la prueba falla en lugar de colgarse
+    thread = threading.Thread(target=run, args=(searches(),), daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "las búsquedas concurrentes bloquearon el event loop"
+    assert results["status"] == [200] * 4
+    assert all(items > 0 for items in results["items"])
@@ -0,0 +1,98 @@
+from sqlalchemy import event, text
+from conftest import api_client, auth_headers, run
+from core.config import settings
+from database.db import async_engine, engine
+
+def _new_vehicle(client, headers, **fields):
+    data = {"marca": "Toyota", "modelo": "Hilux", "año": 2020, "tipo": "Pickup", "kilometraje": 100.0, **fields}
+    return client.post("/vehiculos", json=data, headers=headers)
+
+class _StatementLog(list):
+    """Sentencias SQL ejecutadas por el engine async mientras está activo."""
+    
+    def __enter__(self):
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._record)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._record)
+    
+    def _record(self, conn, cursor, statement, *args):
+        self.append(statement)
+
+def test_cache_hit_within_revalidate_window_runs_no_query():
+    async def scenario():
+        async with api_client() as client:
+            headers = await auth_headers(client)
+            vehicle = (await _new_vehicle(client, headers)).json()
+            # Otro cliente (sin escrituras recientes) lee el vehículo
+            reader = await auth_headers(client)
+            first = await client.get(f"/vehiculos/{vehicle['id']}", headers=reader)
+            with _StatementLog() as log:
+                second = await client.get(f"/vehiculos/{vehicle['id']}", headers=reader)
+            assert first.status_code == second.status_code == 200
+            assert first.headers["etag"] == second.headers["etag"]
+            assert not [s for s in log if "vehicles" in s]
+            
+            cached = await client.get(
+                f"/vehiculos/{vehicle['id']}", headers={**reader, "If-None-Match": first.headers["etag"]}
+            )
+            assert cached.status_code == 304
+    run(scenario())
+
+def test_write_to_same_tipo_does_not_invalidate_other_vehicles(monkeypatch):
+    monkeypatch.setattr(settings, "VEHICLE_CACHE_REVALIDATE_SECONDS", 0.0)
+    
+    async def scenario():
+        async with api_client() as client:
+            writer = await auth_headers(client)
+            kept = (await _new_vehicle(client, writer, tipo="Furgon")).json()
+            other = (await _new_vehicle(client, writer, tipo="Furgon")).json()
+            reader = await auth_headers(client)
+            await client.get(f"/vehiculos/{kept['id']}", headers=reader)
+            
+            response = await client.patch(f"/vehiculos/{other['id']}", json={"kilometraje": 5.0}, headers=writer)
+            assert response.status_code == 200
+            with _StatementLog() as log:
+                response = await client.get(f"/vehiculos/{kept['id']}", headers=reader)
+            assert response.status_code == 200
+            # Solo se revalida la versión de la fila: ni se relee ni se serializa
+            vehicle_reads = [s for s in log if "FROM vehicles" in s]
+            assert len(vehicle_reads) == 1 and "marca" not in vehicle_reads[0]
+    run(scenario())
+
+def test_write_from_another_worker_is_seen_after_revalidate_window(monkeypatch):
+    async def scenario():
+        async with api_client() as client:
+            writer = await auth_headers(client)
+            vehicle = (await _new_vehicle(client, writer)).json()
+            reader = await auth_headers(client)
+            before = await client.get(f"/vehiculos/{vehicle['id']}", headers=reader)
+            
+            # Escritura hecha "en otro worker": no pasa por la caché de este proceso
+            with engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE vehicles SET kilometraje = 999, version = version + 1 WHERE id = :id"),
+                    {"id": vehicle["id"]}
+                )
+            monkeypatch.setattr(settings, "VEHICLE_CACHE_REVALIDATE_SECONDS", 0.0)
+            after = await client.get(f"/vehiculos/{vehicle['id']}", headers=reader)
+            assert after.json()["kilometraje"] == 999
+            assert after.headers["etag"] != before.headers["etag"]
+            
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM vehicles WHERE id = :id"), {"id": vehicle["id"]})
+            gone = await client.get(f"/vehiculos/{vehicle['id']}", headers=reader)
+            assert gone.status_code == 404
+    run(scenario())
+
+def test_local_update_invalidates_immediately():
+    async def scenario():
+        async with api_client() as client:
+            headers = await auth_headers(client)
+            vehicle = (await _new_vehicle(client, headers)).json()
+            await client.get(f"/vehiculos/{vehicle['id']}", headers=headers)
+            await client.patch(f"/vehiculos/{vehicle['id']}", json={"kilometraje": 7.0}, headers=headers)
+            response = await client.get(f"/vehiculos/{vehicle['id']}", headers=headers)
+            assert response.json()["kilometraje"] == 7.0
+    run(scenario())